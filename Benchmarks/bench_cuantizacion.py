@@ -0,0 +1,111 @@
+# Benchmarks/bench_cuantizacion.py
+"""
+Precisión, memoria y latencia de la galería con plantillas float32 e int8.
+
+Para cada modo se informa el recall@1 contra la búsqueda exacta en float32 (sin reordenar
+y reordenando los --reordenar mejores candidatos con los vectores float32), los bytes por
+plantilla de la copia que se recorre entera, la memoria residente total de la galería
+(GaleriaVectores.bytes_residentes: códigos, escalas, ids, números de fila y cualquier copia
+float32) y la latencia: por consulta buscando las --consultas en un lote y de una consulta
+suelta (el caso de una cámara). Como en la aplicación, los modos cuantizados adoptan
+la matriz float32 de un AlmacenVectores (np.memmap) y sólo leen de ella las filas a
+reordenar; la referencia float32 la tiene entera en memoria. Usa los mismos embeddings
+sintéticos agrupados que bench_indices.py.
+
+    python Benchmarks/bench_cuantizacion.py --tamanos 10000 100000 --dim 128 512
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Nucleo.AlmacenVectores import AlmacenVectores  # noqa: E402
+from Nucleo.Galeria import GaleriaVectores  # noqa: E402
+from Nucleo.Indices import IndiceCuantizado  # noqa: E402
+from bench_indices import generar_galeria  # noqa: E402
+
+
+def medir(galeria, consultas, repeticiones=3, individuales=20):
+    """
+    Devuelve (filas top-1, ms por consulta buscando todas en un lote, ms de una consulta
+    suelta). Se toma el mejor de las repeticiones.
+    """
+    filas, _ = galeria.buscar(consultas, k=1)
+    mejor = np.inf
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        galeria.buscar(consultas, k=1)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    sueltas = consultas[:individuales]
+    mejor_suelta = np.inf
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for q in sueltas:
+            galeria.buscar(q, k=1)
+        mejor_suelta = min(mejor_suelta, time.perf_counter() - inicio)
+    return filas[:, 0], 1000.0 * mejor / len(consultas), 1000.0 * mejor_suelta / len(sueltas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, nargs="+", default=[128, 512])
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--reordenar", type=int, default=32)
+    parser.add_argument("--json", help="Ruta donde escribir los resultados en JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    directorio = tempfile.TemporaryDirectory(prefix="bench_cuantizacion_")
+    for dim in args.dim:
+        for n in args.tamanos:
+            vectores, centros, etiquetas = generar_galeria(n, dim)
+            rng = np.random.default_rng(1)
+            consultas = centros[rng.integers(len(centros), size=args.consultas)]
+            consultas = consultas + 0.35 * rng.normal(size=consultas.shape).astype(np.float32)
+            nombres = [str(e) for e in etiquetas]
+
+            galeria = GaleriaVectores()
+            galeria.agregar(vectores, nombres)
+            referencia, lat, lat_suelta = medir(galeria, consultas)
+            print(f"\n📊 Galería de {n} plantillas (dim={dim})")
+            print(f"   {'modo':<19}{'recall@1':>9}{'bytes/plantilla':>17}{'MiB resid.':>12}"
+                  f"{'ms/consulta (lote)':>20}{'ms (suelta)':>13}")
+            filas = [("float32", 1.0, 4 * dim, galeria.bytes_residentes(), lat, lat_suelta)]
+
+            almacen = AlmacenVectores(os.path.join(directorio.name, f"galeria_{n}_{dim}"))
+            almacen.escribir(galeria.matriz, nombres, nombres)
+            del galeria
+            for modo in IndiceCuantizado.MODOS:
+                for reordenar in (0, args.reordenar):
+                    matriz, ids, nombres_almacen = almacen.cargar(verificar=False)
+                    indice = IndiceCuantizado(modo=modo, reordenar=reordenar)
+                    galeria = GaleriaVectores(indice=indice)
+                    galeria.adoptar(matriz, nombres_almacen, ids)
+                    encontrados, lat, lat_suelta = medir(galeria, consultas)
+                    r1 = float(np.mean(encontrados == referencia))
+                    nombre = f"{modo}" + (f" +reord {reordenar}" if reordenar else "")
+                    filas.append((nombre, r1, indice.bytes_por_vector, galeria.bytes_residentes(), lat, lat_suelta))
+                    del galeria, matriz
+
+            for nombre, r1, bytes_vector, residentes, lat, lat_suelta in filas:
+                mib = residentes / (1024.0 * 1024.0)
+                print(f"   {nombre:<19}{r1:>9.3f}{bytes_vector:>17}{mib:>12.1f}{lat:>20.3f}{lat_suelta:>13.3f}")
+                resultados.append({"n": n, "dim": dim, "modo": nombre, "recall_1": r1,
+                                   "bytes_por_plantilla": bytes_vector, "bytes_residentes": residentes,
+                                   "mib_residentes": mib, "ms_consulta": lat, "ms_consulta_suelta": lat_suelta})
+    directorio.cleanup()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\n💾 Resultados guardados en: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
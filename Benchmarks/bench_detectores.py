@@ -0,0 +1,128 @@
+# Benchmarks/bench_detectores.py
+"""
+Latencia y recall de los detectores de rostros sobre un conjunto local etiquetado.
+
+La carpeta debe contener las imágenes y un anotaciones.json con las cajas reales (x, y, w, h):
+
+    {"persona1.jpg": [[120, 80, 110, 110]], "grupo.jpg": [[10, 20, 64, 64], [200, 40, 70, 70]]}
+
+Una detección cuenta como acierto si su IoU con una caja real sin emparejar es >= --iou.
+
+    python Benchmarks/bench_detectores.py Datos/deteccion --detectores haar lbp ssd yunet
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Nucleo.Detectores import DETECTORES, crear_detector  # noqa: E402
+
+
+def cargar_conjunto(carpeta):
+    """Devuelve [(nombre, imagen BGR, cajas reales (N, 4))]."""
+    with open(os.path.join(carpeta, "anotaciones.json"), "r", encoding="utf-8") as f:
+        anotaciones = json.load(f)
+    conjunto = []
+    for nombre, cajas in sorted(anotaciones.items()):
+        imagen = cv2.imread(os.path.join(carpeta, nombre))
+        if imagen is None:
+            print(f"⚠️ No se pudo leer {nombre}; se omite")
+            continue
+        conjunto.append((nombre, imagen, np.asarray(cajas, dtype=np.float32).reshape(-1, 4)))
+    return conjunto
+
+
+def iou_xywh(a, b):
+    """IoU entre cajas (x, y, w, h). a: (N, 4), b: (M, 4). Devuelve (N, M)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y1 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def emparejar(detectadas, reales, umbral_iou):
+    """Cantidad de cajas reales encontradas (emparejamiento voraz por IoU)."""
+    if len(detectadas) == 0 or len(reales) == 0:
+        return 0
+    ious = iou_xywh(detectadas, reales)
+    aciertos = 0
+    usadas_d, usadas_r = set(), set()
+    for idx in np.argsort(-ious, axis=None):
+        i, j = np.unravel_index(idx, ious.shape)
+        if ious[i, j] < umbral_iou:
+            break
+        if i in usadas_d or j in usadas_r:
+            continue
+        usadas_d.add(i)
+        usadas_r.add(j)
+        aciertos += 1
+    return aciertos
+
+
+def evaluar(detector, conjunto, umbral_iou, repeticiones):
+    latencias = []
+    reales = detectadas = aciertos = 0
+    for _, imagen, cajas in conjunto:
+        gray = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+        detector.detectar(imagen, gray)  # primera pasada fuera de la medición
+        mejor = np.inf
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            encontradas = detector.detectar(imagen, gray)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        latencias.append(1000.0 * mejor)
+        reales += len(cajas)
+        detectadas += len(encontradas)
+        aciertos += emparejar(encontradas, cajas, umbral_iou)
+    latencias = np.asarray(latencias)
+    return {
+        "ms_media": float(latencias.mean()),
+        "ms_p95": float(np.percentile(latencias, 95)),
+        "recall": aciertos / reales if reales else 0.0,
+        "precision": aciertos / detectadas if detectadas else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("carpeta", help="Carpeta con las imágenes y anotaciones.json")
+    parser.add_argument("--detectores", nargs="+", default=list(DETECTORES))
+    parser.add_argument("--tam-minimo", type=int, default=40)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--json", help="Ruta donde escribir los resultados en JSON")
+    args = parser.parse_args()
+
+    conjunto = cargar_conjunto(args.carpeta)
+    print(f"📊 {len(conjunto)} imágenes, {sum(len(c) for _, _, c in conjunto)} rostros (IoU >= {args.iou})")
+    print(f"   {'detector':<10}{'recall':>10}{'precisión':>12}{'ms medio':>12}{'ms p95':>10}")
+
+    resultados = []
+    for nombre in args.detectores:
+        try:
+            detector = crear_detector(nombre, tam_minimo=args.tam_minimo)
+        except Exception as e:
+            print(f"   {nombre:<10}⚠️ no disponible: {e}")
+            continue
+        r = evaluar(detector, conjunto, args.iou, args.repeticiones)
+        print(f"   {nombre:<10}{r['recall']:>10.3f}{r['precision']:>12.3f}{r['ms_media']:>12.2f}{r['ms_p95']:>10.2f}")
+        resultados.append({"detector": nombre, **r})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\n💾 Resultados guardados en: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
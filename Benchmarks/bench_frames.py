@@ -0,0 +1,88 @@
+# Benchmarks/bench_frames.py
+"""
+Reservas de memoria por frame en el camino caliente (detección + vista previa),
+antes y después de quitar conversiones de color y copias.
+
+    antes:   BGR→RGB (sin usar) + BGR→GRAY + copia para dibujar + BGR→RGB para el QImage
+    después: BGR→GRAY en buffer reutilizado + QImage desde BGR (sin copia en numpy)
+
+Usa tracemalloc (numpy registra ahí sus arreglos, también los que devuelve OpenCV), así que
+sólo cuenta memoria del lado de Python/numpy; el escalado que hace Qt no aparece en ninguno.
+
+    python Benchmarks/bench_frames.py --ancho 640 --alto 480 --frames 300
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def camino_antes(frame, estado):
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)   # calculado y nunca usado
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    copia = frame.copy()
+    cv2.rectangle(copia, (100, 100), (200, 200), (0, 255, 0), 2)
+    rgb_vista = cv2.cvtColor(copia, cv2.COLOR_BGR2RGB)
+    return rgb, gray, rgb_vista
+
+
+def camino_despues(frame, estado):
+    buffer = estado.get("gris")
+    if buffer is None or buffer.shape != frame.shape[:2]:
+        buffer = estado["gris"] = np.empty(frame.shape[:2], dtype=np.uint8)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffer)
+    # La vista previa envuelve frame.data con QImage.Format_BGR888: nada que reservar aquí
+    return gray
+
+
+def medir(nombre, camino, frames):
+    """
+    Memoria reservada por frame (pico de tracemalloc sobre la base, promediado) y ms por frame.
+    Los buffers persistentes se reservan en una llamada previa y no cuentan.
+    """
+    estado = {}
+    camino(frames[0], estado)
+    reservado = 0
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        camino(frame, estado)
+        _, pico = tracemalloc.get_traced_memory()
+        reservado += pico - base
+    tracemalloc.stop()
+
+    inicio = time.perf_counter()
+    for frame in frames:
+        camino(frame, estado)
+    ms = 1000.0 * (time.perf_counter() - inicio) / len(frames)
+    kib = reservado / len(frames) / 1024
+    print(f"   {nombre:<10}{kib:>18.1f}{ms:>12.3f}")
+    return {"camino": nombre, "kib_frame": kib, "ms_frame": ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ancho", type=int, default=640)
+    parser.add_argument("--alto", type=int, default=480)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, size=(args.alto, args.ancho, 3), dtype=np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+
+    print(f"📊 {args.frames} frames de {args.ancho}x{args.alto}")
+    print(f"   {'camino':<10}{'KiB/frame':>18}{'ms/frame':>12}")
+    medir("antes", camino_antes, frames)
+    medir("después", camino_despues, frames)
+
+
+if __name__ == "__main__":
+    main()
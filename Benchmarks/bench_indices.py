@@ -0,0 +1,113 @@
+# Benchmarks/bench_indices.py
+"""
+Recall vs. latencia de los índices de la galería contra la búsqueda exacta.
+Usa embeddings sintéticos agrupados (varias plantillas por persona) de modo que no
+hace falta cámara ni modelo. Para el índice de prototipos (que devuelve una fila por
+persona) recall@1 es la fracción de consultas con la misma persona que la búsqueda exacta.
+
+    python Benchmarks/bench_indices.py --tamanos 10000 100000 --sondeos 1 4 8 16
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Nucleo.Indices import IndiceExacto, IndiceIVF, IndicePrototipos  # noqa: E402
+
+
+def generar_galeria(n, dim, por_persona=5, ruido=0.35, semilla=0):
+    """Plantillas sintéticas: n // por_persona identidades con ruido alrededor de cada una."""
+    rng = np.random.default_rng(semilla)
+    personas = max(1, n // por_persona)
+    centros = rng.normal(size=(personas, dim)).astype(np.float32)
+    etiquetas = rng.integers(personas, size=n)
+    vectores = centros[etiquetas] + ruido * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectores, centros, etiquetas
+
+
+def medir(indice, consultas, k, repeticiones=3):
+    """Devuelve (ids, latencia media por consulta en ms)."""
+    ids, _ = indice.buscar(consultas, k)
+    mejor = np.inf
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        indice.buscar(consultas, k)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return ids, 1000.0 * mejor / len(consultas)
+
+
+def recall(ids, referencia):
+    """Fracción de los k vecinos exactos recuperados por el índice."""
+    k = referencia.shape[1]
+    aciertos = sum(len(np.intersect1d(a[:k], b)) for a, b in zip(ids, referencia))
+    return aciertos / referencia.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sondeos", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--prototipos", type=int, nargs="+", default=[1, 3, 5],
+                        help="Prototipos por persona a evaluar con el índice de prototipos")
+    parser.add_argument("--json", help="Ruta donde escribir los resultados en JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    for n in args.tamanos:
+        vectores, centros, etiquetas = generar_galeria(n, args.dim)
+        rng = np.random.default_rng(1)
+        consultas = centros[rng.integers(len(centros), size=args.consultas)]
+        consultas = consultas + 0.35 * rng.normal(size=consultas.shape).astype(np.float32)
+        ids = np.arange(n)
+
+        exacto = IndiceExacto()
+        exacto.construir(vectores, ids)
+        referencia, lat_exacto = medir(exacto, consultas, args.k)
+        print(f"\n📊 Galería de {n} plantillas (dim={args.dim}, k={args.k})")
+        print(f"   {'índice':<14}{'recall@1':>10}{'recall@k':>10}{'ms/consulta':>14}{'construcción s':>16}")
+        print(f"   {'exacto':<14}{1.0:>10.3f}{1.0:>10.3f}{lat_exacto:>14.3f}{0.0:>16.2f}")
+        resultados.append({"n": n, "indice": "exacto", "recall_1": 1.0, "recall_k": 1.0,
+                           "ms_consulta": lat_exacto, "construccion_s": 0.0})
+
+        inicio = time.perf_counter()
+        ivf = IndiceIVF()
+        ivf.construir(vectores, ids)
+        t_construccion = time.perf_counter() - inicio
+        for sondeo in args.sondeos:
+            ivf.n_sondeo = sondeo
+            encontrados, lat = medir(ivf, consultas, args.k)
+            r1 = float(np.mean(encontrados[:, 0] == referencia[:, 0]))
+            rk = recall(encontrados, referencia)
+            nombre = f"ivf/{sondeo}"
+            print(f"   {nombre:<14}{r1:>10.3f}{rk:>10.3f}{lat:>14.3f}{t_construccion:>16.2f}")
+            resultados.append({"n": n, "indice": "ivf", "n_listas": len(ivf.centroides), "n_sondeo": sondeo,
+                               "recall_1": r1, "recall_k": rk, "ms_consulta": lat,
+                               "construccion_s": t_construccion})
+
+        for max_prototipos in args.prototipos:
+            inicio = time.perf_counter()
+            prototipos = IndicePrototipos(max_prototipos=max_prototipos)
+            prototipos.construir(vectores, ids, etiquetas=list(etiquetas))
+            t_construccion = time.perf_counter() - inicio
+            encontrados, lat = medir(prototipos, consultas, 1)
+            r1 = float(np.mean(etiquetas[encontrados[:, 0]] == etiquetas[referencia[:, 0]]))
+            nombre = f"proto/{max_prototipos}"
+            print(f"   {nombre:<14}{r1:>10.3f}{'-':>10}{lat:>14.3f}{t_construccion:>16.2f}")
+            resultados.append({"n": n, "indice": "prototipos", "max_prototipos": max_prototipos,
+                               "recall_1": r1, "ms_consulta": lat, "construccion_s": t_construccion})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\n💾 Resultados guardados en: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+# Benchmarks/bench_pipeline.py
+"""
+Latencia por etapa de la tubería de reconocimiento, reproducible entre ejecuciones.
+
+Etapas: decodificación del frame (JPEG), conversión a gris, detección Haar,
+DeepFace.represent (un recorte), representación por lotes, matching contra galerías
+de 10 a 100k plantillas y conversión a imagen Qt. Por etapa se informa p50/p95/p99,
+rendimiento (operaciones/s) y el pico de RSS del proceso al terminarla.
+
+Sin --imagenes se usan frames sintéticos generados con --semilla (siempre los mismos);
+con una carpeta local se usan sus imágenes. Las etapas cuyo módulo no está instalado
+(deepface, PySide6) se marcan como no disponibles en lugar de abortar.
+
+    python Benchmarks/bench_pipeline.py --json resultados/hoy.json
+    python Benchmarks/bench_pipeline.py --imagenes Datos/deteccion --comparar resultados/ayer.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Nucleo.Detectores import DetectorHaar  # noqa: E402
+from Nucleo.Galeria import GaleriaVectores  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# --------------------
+# Fixture
+# --------------------
+def frames_sinteticos(n, ancho, alto, semilla):
+    """Frames deterministas: fondo con gradiente y ruido, más elipses claras con rasgos oscuros."""
+    rng = np.random.default_rng(semilla)
+    frames = []
+    gradiente = np.linspace(40, 200, ancho, dtype=np.float32)[None, :, None]
+    for _ in range(n):
+        frame = np.clip(gradiente + rng.normal(0, 12, size=(alto, ancho, 3)), 0, 255).astype(np.uint8)
+        for _ in range(rng.integers(1, 4)):
+            r = int(rng.integers(40, min(ancho, alto) // 4))
+            cx, cy = int(rng.integers(r, ancho - r)), int(rng.integers(r, alto - r))
+            cv2.ellipse(frame, (cx, cy), (r, int(r * 1.25)), 0, 0, 360, (170, 190, 220), -1)
+            for dx in (-r // 3, r // 3):
+                cv2.circle(frame, (cx + dx, cy - r // 4), max(2, r // 8), (40, 40, 40), -1)
+            cv2.ellipse(frame, (cx, cy + r // 2), (r // 3, max(2, r // 10)), 0, 0, 360, (60, 60, 120), -1)
+        frames.append(frame)
+    return frames
+
+
+def frames_locales(carpeta, n):
+    nombres = sorted(f for f in os.listdir(carpeta) if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")))
+    frames = []
+    for nombre in nombres[:n]:
+        imagen = cv2.imdecode(np.fromfile(os.path.join(carpeta, nombre), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if imagen is not None:
+            frames.append(imagen)
+    if not frames:
+        raise SystemExit(f"❌ No hay imágenes legibles en {carpeta}")
+    return frames
+
+
+# --------------------
+# Medición
+# --------------------
+def _pico_windows():
+    """PeakWorkingSetSize en bytes (psutil si está instalado; si no, GetProcessMemoryInfo vía ctypes)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().peak_wset
+    import ctypes
+    from ctypes import wintypes
+
+    class ContadoresMemoria(ctypes.Structure):
+        # PROCESS_MEMORY_COUNTERS
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    contadores = ContadoresMemoria()
+    contadores.cb = ctypes.sizeof(contadores)
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    psapi = ctypes.WinDLL("psapi", use_last_error=True)
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(ContadoresMemoria), wintypes.DWORD]
+    psapi.GetProcessMemoryInfo.restype = wintypes.BOOL
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(contadores), contadores.cb):
+        return None
+    return contadores.PeakWorkingSetSize
+
+
+def rss_pico_mb():
+    """Pico de memoria residente del proceso en MiB (None si no se puede medir)."""
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa KiB; macOS, bytes
+        return pico / (1024.0 * 1024.0) if sys.platform == "darwin" else pico / 1024.0
+    if sys.platform == "win32":
+        try:
+            pico = _pico_windows()
+        except (OSError, AttributeError):
+            pico = None
+        return pico / (1024.0 * 1024.0) if pico is not None else None
+    return None
+
+
+def medir(fn, entradas, repeticiones, calentamiento=3):
+    """Ejecuta fn sobre cada entrada `repeticiones` veces; devuelve el resumen de latencias."""
+    for entrada in entradas[:calentamiento]:
+        fn(entrada)
+    tiempos = []
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for entrada in entradas:
+            t = time.perf_counter()
+            fn(entrada)
+            tiempos.append(time.perf_counter() - t)
+    total = time.perf_counter() - inicio
+    ms = 1000.0 * np.asarray(tiempos)
+    return {
+        "n": len(tiempos),
+        "ms_p50": float(np.percentile(ms, 50)),
+        "ms_p95": float(np.percentile(ms, 95)),
+        "ms_p99": float(np.percentile(ms, 99)),
+        "ms_media": float(ms.mean()),
+        "por_segundo": len(tiempos) / total if total > 0 else 0.0,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+
+def version_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# --------------------
+# Etapas
+# --------------------
+def etapas_frame(frames, repeticiones, calidad_jpeg):
+    codificados = [cv2.imencode(".jpg", f, [cv2.IMWRITE_JPEG_QUALITY, calidad_jpeg])[1] for f in frames]
+    resultados = {"decodificacion": medir(lambda b: cv2.imdecode(b, cv2.IMREAD_COLOR), codificados, repeticiones)}
+
+    buffers = {}
+
+    def gris(frame):
+        buffer = buffers.get(frame.shape)
+        if buffer is None:
+            buffer = buffers[frame.shape] = np.empty(frame.shape[:2], dtype=np.uint8)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffer)
+
+    resultados["gris"] = medir(gris, frames, repeticiones)
+
+    detector = DetectorHaar()
+    grises = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in frames]
+    resultados["deteccion_haar"] = medir(lambda i: detector.detectar(frames[i], grises[i]), list(range(len(frames))),
+                                         repeticiones)
+    cajas = [detector.detectar(f, g) for f, g in zip(frames, grises)]
+    resultados["deteccion_haar"]["rostros_por_frame"] = float(np.mean([len(c) for c in cajas]))
+    return resultados, cajas
+
+
+def recortes_de(frames, cajas, tam=160):
+    """Recortes detectados; si el fixture no tiene rostros detectables, recortes centrales."""
+    recortes = [f[y:y + h, x:x + w] for f, cs in zip(frames, cajas) for (x, y, w, h) in cs]
+    if recortes:
+        return recortes
+    return [f[(f.shape[0] - tam) // 2:(f.shape[0] + tam) // 2, (f.shape[1] - tam) // 2:(f.shape[1] + tam) // 2]
+            for f in frames]
+
+
+def etapas_modelo(recortes, modelo, repeticiones, tam_lote):
+    try:
+        from deepface import DeepFace
+        from Nucleo.Representacion import RepresentadorLotes
+    except ImportError as e:
+        return {"represent": {"no_disponible": str(e)}, "represent_lote": {"no_disponible": str(e)}}, None
+
+    resultados = {"represent": medir(
+        lambda r: DeepFace.represent(r, model_name=modelo, enforce_detection=False, detector_backend="skip"),
+        recortes, repeticiones,
+    )}
+    representador = RepresentadorLotes(modelo)
+    lotes = [recortes[i:i + tam_lote] for i in range(0, len(recortes), tam_lote)]
+    resultados["represent_lote"] = medir(representador.representar, lotes, repeticiones)
+    resultados["represent_lote"]["recortes_por_lote"] = float(np.mean([len(l) for l in lotes]))
+    return resultados, representador.representar(recortes[:1]).shape[1]
+
+
+def etapas_matching(tamanos, dim, consultas, repeticiones, semilla):
+    rng = np.random.default_rng(semilla)
+    resultados = {}
+    for n in tamanos:
+        galeria = GaleriaVectores()
+        galeria.agregar(rng.normal(size=(n, dim)).astype(np.float32), [f"persona{i % 1000}" for i in range(n)])
+        q = [rng.normal(size=(1, dim)).astype(np.float32) for _ in range(consultas)]
+        resultados[f"matching_{n}"] = medir(galeria.identificar, q, repeticiones)
+    return resultados
+
+
+def etapa_qt(frames, repeticiones, ancho, alto):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PySide6.QtGui import QGuiApplication
+        from Interfaz.vista_previa import pixmap_bgr
+    except ImportError as e:
+        return {"no_disponible": str(e)}
+    _app = QGuiApplication.instance() or QGuiApplication([])  # noqa: F841 (QPixmap requiere la aplicación)
+    return medir(lambda f: pixmap_bgr(f, ancho, alto), frames, repeticiones)
+
+
+# --------------------
+# Informe
+# --------------------
+def imprimir(etapas, anterior=None):
+    print(f"   {'etapa':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'op/s':>10}{'RSS MiB':>10}"
+          + (f"{'Δ p50':>10}" if anterior else ""))
+    for nombre, r in etapas.items():
+        if "no_disponible" in r:
+            print(f"   {nombre:<22}⚠️ no disponible: {r['no_disponible']}")
+            continue
+        rss = f"{r['rss_pico_mb']:>10.0f}" if r["rss_pico_mb"] is not None else f"{'-':>10}"
+        linea = f"   {nombre:<22}{r['ms_p50']:>10.3f}{r['ms_p95']:>10.3f}{r['ms_p99']:>10.3f}{r['por_segundo']:>10.1f}{rss}"
+        previo = (anterior or {}).get(nombre, {})
+        if anterior and previo.get("ms_p50"):
+            linea += f"{100.0 * (r['ms_p50'] / previo['ms_p50'] - 1.0):>+9.1f}%"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagenes", help="Carpeta de imágenes locales (por defecto, frames sintéticos)")
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--ancho", type=int, default=640)
+    parser.add_argument("--alto", type=int, default=480)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--modelo", default="Facenet")
+    parser.add_argument("--sin-modelo", action="store_true", help="Omitir las etapas de DeepFace")
+    parser.add_argument("--tam-lote", type=int, default=8)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=128, help="Dimensión para el matching si no se carga el modelo")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--json", help="Ruta donde escribir los resultados en JSON")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para mostrar la variación de p50")
+    args = parser.parse_args()
+
+    if args.imagenes:
+        frames = frames_locales(args.imagenes, args.frames)
+    else:
+        frames = frames_sinteticos(args.frames, args.ancho, args.alto, args.semilla)
+    print(f"📊 {len(frames)} frames ({'locales' if args.imagenes else f'sintéticos, semilla {args.semilla}'}), "
+          f"{args.repeticiones} repeticiones")
+
+    etapas, cajas = etapas_frame(frames, args.repeticiones, calidad_jpeg=90)
+    dim = args.dim
+    if not args.sin_modelo:
+        modelo, dim_modelo = etapas_modelo(recortes_de(frames, cajas), args.modelo, args.repeticiones, args.tam_lote)
+        etapas.update(modelo)
+        dim = dim_modelo or dim
+    etapas.update(etapas_matching(args.tamanos, dim, args.consultas, args.repeticiones, args.semilla))
+    etapas["imagen_qt"] = etapa_qt(frames, args.repeticiones, args.ancho // 2, args.alto // 2)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f).get("etapas")
+    imprimir(etapas, anterior)
+
+    if args.json:
+        informe = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": version_git(),
+            "entorno": {
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "procesador": platform.processor() or platform.machine(),
+                "nucleos": os.cpu_count(),
+                "numpy": np.__version__,
+                "opencv": cv2.__version__,
+            },
+            "parametros": vars(args),
+            "etapas": etapas,
+        }
+        carpeta = os.path.dirname(os.path.abspath(args.json))
+        os.makedirs(carpeta, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2)
+        print(f"\n💾 Resultados guardados en: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,22 @@
 # Ventana_Principal.py
-import cv2
-import json
 import os
-import numpy as np
 import sys
+import threading
 from PySide6.QtWidgets import (
     QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
     QWidget, QGridLayout, QMessageBox, QInputDialog
 )
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QImage, QPixmap, QFont
+from PySide6.QtCore import Qt, QObject, QTimer, Signal
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
 
 from Nucleo.Reconocimiento import ReconocimientoFacial
 from Nucleo.Camara import Camara  # asumo que tu Camara tiene métodos iniciar(), obtener_frame(), detener()
+from Nucleo.Pipeline import PipelineReconocimiento
+from Nucleo.Modelos import registro_modelos
+from Nucleo.BaseDatos import PROJECT_ROOT, UsuarioDuplicado, obtener_base_datos
+from Nucleo.Metricas import metricas
+
+from Interfaz.vista_previa import dibujar_cajas, pixmap_bgr
 
 # Import de la ventana de registro (robusto)
 try:
@@ -28,6 +32,13 @@ except Exception:
         VentanaRegistro = None
 
 
+class PuenteReconocimiento(QObject):
+    """Reenvía al hilo de la interfaz los frames y resultados producidos por los hilos del pipeline."""
+    frame_listo = Signal(object)
+    resultado_listo = Signal(object)
+    modelo_listo = Signal(object)
+
+
 class VentanaPrincipal(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -36,38 +47,60 @@ class VentanaPrincipal(QMainWindow):
         self.setStyleSheet("background-color: #0d0d0d; color: white;")
 
         # ---------- Instancias de módulos ----------
+        # Ligero: deepface/TensorFlow no se importan hasta cargar el modelo (en segundo plano)
         self.reconocimiento = ReconocimientoFacial(modelo="Facenet")
-        self.camara = Camara()
+        # Dos consumidores retienen frames del anillo: la detección y el repintado
+        self.camara = Camara(en_hilo=True, consumidores=2)
 
         # ---------- UI ----------
         self.setup_ui()
 
         # ---------- Sistema de reconocimiento ----------
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.actualizar_frame)
+        # Captura, detección, embedding y matching corren fuera del hilo de la interfaz;
+        # los resultados vuelven por señales Qt.
+        self.puente = PuenteReconocimiento()
+        self.puente.frame_listo.connect(self.actualizar_frame)
+        self.puente.resultado_listo.connect(self.aplicar_resultado)
+        self.puente.modelo_listo.connect(self.aplicar_modelo_listo)
+        self._frame_pendiente = threading.Event()
+        self._ultimas_cajas = []
+        self._ultimos_nombres = []
+        self.pipeline = PipelineReconocimiento(
+            self.reconocimiento, self.camara,
+            al_frame=self._entregar_frame,
+            al_resultado=self.puente.resultado_listo.emit,
+            umbral_coseno=0.45,
+        )
         self.boton_detener.setEnabled(False)
 
         # Variables UI/estado
         self.nombre_detectado = QLabel("Desconocido")  # ya definido en setup_ui; redefinir por si acaso
         # ---------- Datos de usuarios ----------
-        self.ruta_json = os.path.join("Datos", "usuarios.json")
-        os.makedirs("Datos", exist_ok=True)
-
-        # ---------- Embeddings dir ----------
-        self.embeddings_dir = os.path.join("Datos", "embeddings")
-        os.makedirs(self.embeddings_dir, exist_ok=True)
+        # SQLite (la primera vez importa usuarios.json) y plantillas del repositorio se abren en
+        # segundo plano, en paralelo con el modelo: con una galería grande la ventana no espera
+        self._carga_datos = threading.Thread(target=self._cargar_datos, name="carga-datos", daemon=True)
+        self._carga_datos.start()
 
-        # Cargar vectores/usuarios
-        # Primero intento cargar vectores preguardados (Datos/embeddings)
-        self.reconocimiento.cargar_vectores()  # mantiene compatibilidad; puede cargar desde su propia ubicación
-        # Luego intento cargar desde Datos/embeddings (si recon no lo hizo)
-        self.cargar_rostros()
+        # Cargar y calentar Facenet en segundo plano: la ventana se muestra ya y el primer
+        # rostro no espera a la carga. Hasta entonces no se puede iniciar la cámara.
+        self.boton_iniciar.setEnabled(False)
+        self.label_video.setText("⏳ Cargando modelo...")
+        registro_modelos.calentar_en_segundo_plano(["Facenet"], al_terminar=self._preparar_datos)
 
         # ---------- Eventos ----------
         self.boton_iniciar.clicked.connect(self.iniciar_camara)
         self.boton_detener.clicked.connect(self.detener_camara)
         self.boton_registro.clicked.connect(self.registrar_usuario)
 
+        # ---------- Métricas ----------
+        # F3: superposición FPS/latencia (y volcado en Datos/metricas.prom); F9: captura de perfil
+        QShortcut(QKeySequence("F3"), self, activated=self.alternar_metricas)
+        QShortcut(QKeySequence("F9"), self, activated=self.alternar_perfil)
+        self.temporizador_metricas = QTimer(self)
+        self.temporizador_metricas.timeout.connect(self.actualizar_metricas)
+        if metricas.habilitado:
+            self.alternar_metricas(True)
+
     def setup_ui(self):
         """Configura la interfaz de usuario"""
         # ---------- Encabezado ----------
@@ -90,6 +123,12 @@ class VentanaPrincipal(QMainWindow):
             background-color: #1a1a1a;
             border-radius: 12px;
         """)
+        # Superposición de métricas (hija del video, oculta salvo con F3)
+        self.label_metricas = QLabel(self.label_video)
+        self.label_metricas.setFont(QFont("Consolas", 8))
+        self.label_metricas.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: #00ff88; padding: 2px;")
+        self.label_metricas.move(6, 6)
+        self.label_metricas.hide()
 
         # ---------- Información del rostro detectado ----------
         self.label_nombres = QLabel("USUARIO DETECTADO")
@@ -158,68 +197,37 @@ class VentanaPrincipal(QMainWindow):
 
     def cargar_rostros(self):
         """
-        Carga embeddings desde Datos/embeddings si existen.
-        Si no existen, intenta extraer embeddings desde Datos/usuarios.json usando DeepFace,
-        y guarda los embeddings extraídos en Datos/embeddings para futuras ejecuciones.
+        Si el repositorio de plantillas está vacío, extrae embeddings de las fotos de los usuarios
+        de la base de datos
+        usando DeepFace y los guarda en el repositorio para futuras ejecuciones.
         """
         print("=" * 50)
         print("🔄 INICIANDO CARGA DE ROSTROS/EMBEDDINGS...")
 
-        emb_path = os.path.join(self.embeddings_dir, "embeddings.npy")
-        names_path = os.path.join(self.embeddings_dir, "nombres.json")
-
         # Si ya cargamos vectores previamente, no hacemos trabajo extra.
-        if len(self.reconocimiento.known_face_encodings) > 0:
-            print(f"ℹ️ Ya existen {len(self.reconocimiento.known_face_encodings)} embeddings cargados. Omitiendo re-extracción.")
-            print("=" * 50)
-            return
-
-        # 1) Intentar cargar embeddings guardados
-        try:
-            if os.path.exists(emb_path) and os.path.exists(names_path):
-                print("ℹ️ Cargando embeddings guardados desde Datos/embeddings/ ...")
-                embs = np.load(emb_path, allow_pickle=True)
-                with open(names_path, "r", encoding="utf-8") as f:
-                    names = json.load(f)
-                if embs.ndim == 1:
-                    embs = np.expand_dims(embs, 0)
-                for emb, name in zip(embs, names):
-                    try:
-                        self.reconocimiento.known_face_encodings.append(np.array(emb, dtype=np.float32))
-                        self.reconocimiento.known_face_names.append(name)
-                    except Exception:
-                        pass
-                print(f"✅ Cargados {len(names)} embeddings desde carpeta de embeddings.")
-                print("=" * 50)
-                return
-        except Exception as e:
-            print(f"⚠️ Error cargando embeddings guardados: {e}")
-
-        # 2) Si no hay embeddings guardados, intentar procesar usuarios.json (compatibilidad backward)
-        if not os.path.exists(self.ruta_json):
-            print("❌ No existe el archivo de usuarios; se crea vacío.")
-            with open(self.ruta_json, "w", encoding="utf-8") as f:
-                json.dump([], f)
+        if len(self.reconocimiento.galeria) > 0:
+            print(f"ℹ️ Ya existen {len(self.reconocimiento.galeria)} embeddings cargados. Omitiendo re-extracción.")
             print("=" * 50)
             return
 
+        # Si no hay embeddings guardados, extraerlos de las fotos registradas (compatibilidad backward)
         try:
-            with open(self.ruta_json, "r", encoding="utf-8") as f:
-                usuarios = json.load(f)
+            usuarios = self.base_datos.usuarios()
         except Exception as e:
-            print(f"❌ Error leyendo JSON usuarios: {e}")
+            print(f"❌ Error leyendo usuarios: {e}")
             usuarios = []
 
         count = 0
         for usuario in usuarios:
             ruta_rostro = usuario.get("rostro")
             nombre = usuario.get("nombre", usuario.get("usuario", "Anonimo"))
+            id_usuario = usuario.get("usuario", nombre)
             if not ruta_rostro:
                 continue
 
             # Resolver ruta absoluta posible
             if not os.path.exists(ruta_rostro):
-                alt = os.path.abspath(os.path.join(os.path.dirname(__file__), ruta_rostro))
+                alt = os.path.abspath(os.path.join(PROJECT_ROOT, ruta_rostro))
                 if os.path.exists(alt):
                     ruta_rostro = alt
                 else:
@@ -227,32 +235,50 @@ class VentanaPrincipal(QMainWindow):
                     continue
 
             try:
-                # Importar DeepFace localmente (si está instalado)
-                from deepface import DeepFace
-                rep = DeepFace.represent(ruta_rostro, model_name=self.reconocimiento.modelo, enforce_detection=True)
-                if isinstance(rep, list) and len(rep) > 0:
-                    emb = np.array(rep[0]["embedding"], dtype=np.float32)
-                    self.reconocimiento.known_face_encodings.append(emb)
-                    self.reconocimiento.known_face_names.append(nombre)
+                # Sólo se llama al modelo si la foto no está ya en la caché de embeddings
+                emb = self.reconocimiento.embeber_imagen(ruta_rostro)
+                if emb is not None:
+                    # Se anexa al repositorio: queda guardado para futuras ejecuciones
+                    self.reconocimiento.registrar_usuario(id_usuario, nombre, emb)
                     count += 1
                     print(f"   ✅ Embedding añadido para {nombre}")
             except Exception as e:
                 print(f"   ⚠️ No se pudo procesar {ruta_rostro}: {e}")
 
-        # Guardar vectores extraídos en carpeta embeddings para uso futuro
+        print(f"🗃️ Caché de embeddings: {self.reconocimiento.cache.estadisticas()}")
+        print(f"🎯 Finalizado. Embeddings extraídos de usuarios registrados: {count}")
+        print("=" * 50)
+
+    @property
+    def base_datos(self):
+        """SQLite compartida (Datos/base_datos.db); bloquea sólo si aún se está abriendo."""
+        return obtener_base_datos()
+
+    def _cargar_datos(self):
+        """Hilo de carga: base de datos de usuarios y plantillas (np.memmap del repositorio)."""
         try:
-            if count > 0:
-                os.makedirs(self.embeddings_dir, exist_ok=True)
-                embs = np.array(self.reconocimiento.known_face_encodings, dtype=np.float32)
-                np.save(os.path.join(self.embeddings_dir, "embeddings.npy"), embs)
-                with open(os.path.join(self.embeddings_dir, "nombres.json"), "w", encoding="utf-8") as f:
-                    json.dump(self.reconocimiento.known_face_names, f, indent=4, ensure_ascii=False)
-                print("🔄 Embeddings guardados en Datos/embeddings/")
+            obtener_base_datos()
         except Exception as e:
-            print(f"⚠️ No se pudieron guardar embeddings extraídos: {e}")
-
-        print(f"🎯 Finalizado. Embeddings cargados desde JSON: {count}")
-        print("=" * 50)
+            print(f"❌ Error abriendo la base de datos: {e}")
+        # Todas las plantillas viven en el repositorio único (Nucleo/RepositorioPlantillas.py)
+        self.reconocimiento.cargar_vectores()
+
+    def _preparar_datos(self, error):
+        """Hilo de carga: tras el modelo y los datos, extraer embeddings pendientes y avisar a la interfaz."""
+        self._carga_datos.join()
+        if error is None:
+            # Si el repositorio está vacío, extraer desde las fotos de los usuarios registrados
+            self.cargar_rostros()
+        self.puente.modelo_listo.emit(error)
+
+    def aplicar_modelo_listo(self, error):
+        """Hilo de la interfaz: fin de la carga del modelo"""
+        if error is None:
+            self.label_video.setText("✅ Modelo listo")
+        else:
+            # La detección sigue funcionando; el reconocimiento recurre a DeepFace.represent
+            self.label_video.setText("⚠️ No se pudo cargar el modelo")
+        self.boton_iniciar.setEnabled(True)
 
     def iniciar_camara(self):
         """Inicia la cámara"""
@@ -263,7 +289,7 @@ class VentanaPrincipal(QMainWindow):
             ok = False
 
         if ok:
-            self.timer.start(30)
+            self.pipeline.iniciar()
             self.boton_iniciar.setEnabled(False)
             self.boton_detener.setEnabled(True)
             print("📹 CÁMARA INICIADA")
@@ -271,59 +297,122 @@ class VentanaPrincipal(QMainWindow):
             self.label_video.setText("❌ No se pudo acceder a la cámara")
             print("❌ ERROR AL INICIAR CÁMARA")
 
-    def actualizar_frame(self):
-        """Obtiene frame, detecta y reconoce con embeddings cargados"""
-        frame = self.camara.obtener_frame()
-        if frame is None:
+    def _entregar_frame(self, frame, secuencia, marca_tiempo):
+        """
+        Llamado desde el hilo de captura. Sólo emite si la interfaz ya pintó el frame anterior,
+        así los frames viejos se descartan en lugar de encolarse en el bucle de eventos.
+        """
+        if self._frame_pendiente.is_set():
             return
-
-        # Usar detector Haar para detección y luego embeddings para reconocimiento
-        boxes, names = self.reconocimiento.reconocer_rostro(frame, umbral_coseno=0.45, usar_detector_haar=True)
-
+        self._frame_pendiente.set()
+        # El repintado ocurre después, en el hilo de la interfaz: fijar el buffer hasta entonces
+        self.pipeline.fijar_frame(frame)
+        self.puente.frame_listo.emit(frame)
+
+    def aplicar_resultado(self, resultado):
+        """Recibe en el hilo de la interfaz el resultado del reconocimiento y actualiza el estado"""
+        boxes = resultado["boxes"]
+        names = resultado["names"]
+        self._ultimas_cajas = boxes
+        self._ultimos_nombres = names
+
+        decisiones = resultado.get("decisiones") or [None] * len(names)
+
+        # La decisión es por pista y ya acumula evidencia de varios frames (Nucleo/Decision.py):
+        # mientras una pista no decide se muestra VERIFICANDO en lugar de alternar el estado
         nombre_mostrar = "Desconocido"
-        color_acceso = "red"
         rol = "VISITANTE"
-        confianza_txt = ""
-
-        for (top, right, bottom, left), name in zip(boxes, names):
-            if name != "Desconocido":
+        estado, color_acceso = "DENEGADO", "red"
+        if any(d is None for d in decisiones):
+            estado, color_acceso = "VERIFICANDO", "orange"
+        for name, decision in zip(names, decisiones):
+            if decision == "PERMITIDO":
                 nombre_mostrar = name
                 rol = "USUARIO REGISTRADO"
-                color_acceso = "green"
-                confianza_txt = ""
-            else:
-                nombre_mostrar = "Desconocido"
-                rol = "VISITANTE"
-                color_acceso = "red"
-
-            color = (0, 255, 0) if color_acceso == "green" else (0, 0, 255)
-            try:
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                cv2.putText(frame, f"{nombre_mostrar}", (left, top-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            except Exception:
-                pass
+                estado, color_acceso = "PERMITIDO", "green"
+                break
 
         # Actualizar UI
         self.nombre_detectado.setText(nombre_mostrar)
         self.lbl_rol.setText(rol)
-        estado = "PERMITIDO" if color_acceso == "green" else "DENEGADO"
         self.lbl_estado.setText(estado)
         self.lbl_estado.setStyleSheet(f"color: {color_acceso};")
 
-        # Mostrar frame en QLabel
+    def actualizar_frame(self, frame):
+        """Pinta el frame más reciente con las últimas cajas reconocidas"""
+        if not self.pipeline.activo:
+            # Señal que llegó después de detener la cámara
+            self.pipeline.liberar_frame(frame)
+            self._frame_pendiente.clear()
+            return
         try:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_frame.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.label_video.setPixmap(QPixmap.fromImage(qt_image.scaled(
-                self.label_video.width(), self.label_video.height(), Qt.KeepAspectRatio)))
+            # El mismo frame lo está leyendo el hilo de detección: no se modifica. El pixmap
+            # se construye directamente desde BGR y las cajas se pintan sobre el reducido.
+            cajas = [(left, top, right - left, bottom - top)
+                     for (top, right, bottom, left) in self._ultimas_cajas]
+            with metricas.tramo("pintado"):
+                pixmap, factor = pixmap_bgr(frame, self.label_video.width(), self.label_video.height())
+                self.label_video.setPixmap(dibujar_cajas(pixmap, cajas, self._ultimos_nombres, factor))
         except Exception as e:
             print(f"❌ Error mostrando frame en UI: {e}")
+        finally:
+            self.pipeline.liberar_frame(frame)
+            self._frame_pendiente.clear()
+
+    # --------------------
+    # Métricas
+    # --------------------
+    def alternar_metricas(self, activar=None):
+        """Activa o desactiva la medición por etapa y su superposición sobre el video."""
+        activar = not self.label_metricas.isVisible() if activar is None else activar
+        metricas.habilitado = activar or metricas.perfilando
+        if activar:
+            metricas.reiniciar()
+            self.label_metricas.setText("⏱️ midiendo...")
+            self.label_metricas.adjustSize()
+            self.label_metricas.show()
+            self.temporizador_metricas.start(1000)
+        else:
+            self.temporizador_metricas.stop()
+            self.label_metricas.hide()
+
+    def actualizar_metricas(self):
+        resumen = metricas.resumen()
+        lineas = []
+        camara = resumen.get("camara")
+        if camara:
+            lineas.append(f"FPS cámara {camara['por_segundo']:.1f}")
+        pintado = resumen.get("pintado")
+        if pintado:
+            lineas.append(f"FPS vista  {pintado['por_segundo']:.1f}")
+        for etapa in ("deteccion", "representacion", "matching", "pintado", "latencia_total"):
+            r = resumen.get(etapa)
+            if r and r["p50_ms"] is not None:
+                lineas.append(f"{etapa[:10]:<10} {r['p50_ms']:6.1f} / {r['p95_ms']:6.1f} ms")
+        self.label_metricas.setText("\n".join(lineas) or "⏱️ sin datos")
+        self.label_metricas.adjustSize()
+        try:
+            metricas.volcar(os.path.join(PROJECT_ROOT, "Datos", "metricas.prom"))
+        except OSError as e:
+            print(f"⚠️ No se pudieron volcar las métricas: {e}")
+
+    def alternar_perfil(self):
+        """Inicia o termina una captura de cProfile + tracemalloc (Datos/perfiles)."""
+        if not metricas.perfilando:
+            metricas.iniciar_perfil(memoria=True)
+            print("🔬 Perfilado iniciado (F9 para terminar)")
+            return
+        rutas = metricas.detener_perfil(os.path.join(PROJECT_ROOT, "Datos", "perfiles"))
+        metricas.habilitado = self.label_metricas.isVisible()
+        for ruta in rutas:
+            print(f"💾 Perfil guardado en: {ruta}")
 
     def detener_camara(self):
         """Detiene la cámara"""
-        self.timer.stop()
+        self.pipeline.detener()
+        self._frame_pendiente.clear()
+        self._ultimas_cajas = []
+        self._ultimos_nombres = []
         try:
             self.camara.detener()
         except Exception:
@@ -381,34 +470,12 @@ class VentanaPrincipal(QMainWindow):
         return nombre.strip(), usuario.strip(), contrasena.strip()
 
     def guardar_usuario_json(self, nombre, usuario, contrasena, ruta_rostro):
-        """Guarda el usuario en el archivo JSON"""
-        ruta_json = self.ruta_json
-
-        if os.path.exists(ruta_json):
-            with open(ruta_json, "r", encoding="utf-8") as f:
-                try:
-                    datos = json.load(f)
-                except:
-                    datos = []
-        else:
-            datos = []
-
-        # Verificar si el usuario ya existe
-        for user in datos:
-            if user.get("usuario") == usuario:
-                QMessageBox.warning(self, "Error", "El usuario ya existe")
-                return
-
-        nuevo_usuario = {
-            "nombre": nombre,
-            "usuario": usuario,
-            "contrasena": contrasena,
-            "rostro": ruta_rostro
-        }
-        datos.append(nuevo_usuario)
-
-        with open(ruta_json, "w", encoding="utf-8") as f:
-            json.dump(datos, f, indent=4, ensure_ascii=False)
+        """Guarda el usuario en la base de datos (se conserva el nombre por compatibilidad)"""
+        try:
+            self.base_datos.agregar_usuario(usuario, nombre, contrasena, rostro=ruta_rostro)
+        except UsuarioDuplicado:
+            QMessageBox.warning(self, "Error", "El usuario ya existe")
+            return
 
         print(f"✅ USUARIO GUARDADO: {usuario}")
 
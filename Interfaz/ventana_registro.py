@@ -1,8 +1,8 @@
 import os
 import sys
-import json
+from collections import deque
+
 import cv2
-import numpy as np
 
 from PySide6.QtWidgets import (
     QMainWindow, QLabel, QLineEdit, QPushButton,
@@ -15,22 +15,25 @@ from PySide6.QtCore import QTimer, Qt
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATOS_DIR = os.path.join(PROJECT_ROOT, "Datos")
 ROSTROS_DIR = os.path.join(DATOS_DIR, "rostros")
-EMBEDDINGS_DIR = os.path.join(DATOS_DIR, "embeddings")
-USUARIOS_JSON = os.path.join(DATOS_DIR, "usuarios.json")
 UI_PATH = os.path.join(os.path.dirname(__file__), "Registro_Alumno_o.ui")
 
-os.makedirs(DATOS_DIR, exist_ok=True)
-os.makedirs(ROSTROS_DIR, exist_ok=True)
-os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
-
 # === IMPORTAR CAMARA Y RECONOCIMIENTO ===
 try:
+    from Nucleo.Calidad import EvaluadorCalidad
     from Nucleo.Camara import Camara
     from Nucleo.Reconocimiento import ReconocimientoFacial
+    from Nucleo.BaseDatos import UsuarioDuplicado, obtener_base_datos
 except Exception:
     sys.path.append(os.path.join(PROJECT_ROOT, "Nucleo"))
+    from Calidad import EvaluadorCalidad
     from Camara import Camara
     from Reconocimiento import ReconocimientoFacial
+    from BaseDatos import UsuarioDuplicado, obtener_base_datos
+
+try:
+    from Interfaz.vista_previa import dibujar_cajas, pixmap_bgr
+except Exception:
+    from vista_previa import dibujar_cajas, pixmap_bgr
 
 
 class VentanaRegistro(QMainWindow):
@@ -50,12 +53,19 @@ class VentanaRegistro(QMainWindow):
         else:
             self._build_ui_fallback()
 
+        os.makedirs(ROSTROS_DIR, exist_ok=True)
+
         # --- Instancias ---
         self.camara = Camara()
         self.recon = ReconocimientoFacial()
+        # El registro siempre filtra por calidad, aunque el reconocimiento lo tenga desactivado
+        self.calidad = self.recon.calidad if self.recon.calidad is not None else EvaluadorCalidad()
+        self.base_datos = obtener_base_datos()
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.actualizar_preview)
         self.ruta_rostro = None
+        # Mejor recorte aceptable de cada uno de los últimos frames: (puntaje, recorte)
+        self.rafaga = deque(maxlen=15)
 
         # --- Mapeo widgets ---
         self._map_widgets()
@@ -128,16 +138,20 @@ class VentanaRegistro(QMainWindow):
         if frame is None:
             return
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.recon.detector.detectMultiScale(gray, 1.1, 5, minSize=(80, 80))
-        for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        faces = self.recon.detector_rostros.detectar(frame, tam_minimo=80)
+        self._acumular_rafaga(frame, faces)
+        # Sin conversión a RGB ni dibujo sobre el frame: pixmap desde BGR y cajas sobre el reducido
+        pixmap, factor = pixmap_bgr(frame, self.label_preview.width(), self.label_preview.height())
+        self.label_preview.setPixmap(dibujar_cajas(pixmap, faces, None, factor))
 
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        image = QtGui.QImage(rgb.data, w, h, ch * w, QtGui.QImage.Format_RGB888)
-        pixmap = QtGui.QPixmap.fromImage(image).scaled(self.label_preview.width(), self.label_preview.height(), Qt.KeepAspectRatio)
-        self.label_preview.setPixmap(pixmap)
+    def _acumular_rafaga(self, frame, faces):
+        """Guarda en la ráfaga el mejor recorte del frame si pasa el filtro de calidad."""
+        if len(faces) == 0:
+            return
+        recortes = [frame[y:y + h, x:x + w] for x, y, w, h in faces]
+        idx, puntaje = self.calidad.mejor(recortes)
+        if idx is not None:
+            self.rafaga.append((puntaje, recortes[idx].copy()))
 
     def capturar_rostro(self):
         frame = self.camara.obtener_frame()
@@ -145,14 +159,20 @@ class VentanaRegistro(QMainWindow):
             QMessageBox.warning(self, "Error", "No se obtuvo imagen de la cámara.")
             return
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.recon.detector.detectMultiScale(gray, 1.1, 5, minSize=(80, 80))
-        if len(faces) == 0:
+        faces = self.recon.detector_rostros.detectar(frame, tam_minimo=80)
+        if len(faces) == 0 and not self.rafaga:
             QMessageBox.warning(self, "Sin rostro", "No se detectó ningún rostro.")
             return
 
-        x, y, w, h = faces[0]
-        rostro = frame[y:y + h, x:x + w]
+        # La plantilla de registro es el mejor recorte de los últimos frames, no el del clic
+        self._acumular_rafaga(frame, faces)
+        if not self.rafaga:
+            QMessageBox.warning(
+                self, "Calidad insuficiente",
+                "El rostro no tiene calidad suficiente. Mira de frente a la cámara con buena iluminación."
+            )
+            return
+        _, rostro = max(self.rafaga, key=lambda entrada: entrada[0])
         usuario = self.input_usuario.text().strip()
         if not usuario:
             QMessageBox.warning(self, "Error", "Debes ingresar un nombre de usuario antes de capturar.")
@@ -161,6 +181,7 @@ class VentanaRegistro(QMainWindow):
         ruta = os.path.join(ROSTROS_DIR, f"{usuario}.jpg")
         cv2.imwrite(ruta, rostro)
         self.ruta_rostro = ruta
+        self.rafaga.clear()
 
         QMessageBox.information(self, "Captura", "✅ Rostro guardado correctamente.")
 
@@ -173,66 +194,21 @@ class VentanaRegistro(QMainWindow):
             QMessageBox.warning(self, "Error", "Completa todos los campos y captura el rostro.")
             return
 
-        # Cargar usuarios existentes
-        if os.path.exists(USUARIOS_JSON):
-            with open(USUARIOS_JSON, "r", encoding="utf-8") as f:
-                try:
-                    datos = json.load(f)
-                except:
-                    datos = []
-        else:
-            datos = []
-
-        # Validar duplicados
-        for u in datos:
-            if u.get("usuario") == usuario:
-                QMessageBox.warning(self, "Error", "El usuario ya existe.")
-                return
-
-        nuevo = {
-            "nombre": nombre,
-            "usuario": usuario,
-            "contrasena": contrasena,
-            "rostro": os.path.relpath(self.ruta_rostro, PROJECT_ROOT)
-        }
-        datos.append(nuevo)
-
-        with open(USUARIOS_JSON, "w", encoding="utf-8") as f:
-            json.dump(datos, f, indent=4, ensure_ascii=False)
-
-        # Extraer embedding y guardarlo en carpeta embeddings
+        # Alta en la base de datos (el índice único sobre usuario detecta duplicados)
+        try:
+            self.base_datos.agregar_usuario(
+                usuario, nombre, contrasena,
+                rostro=os.path.relpath(self.ruta_rostro, PROJECT_ROOT),
+            )
+        except UsuarioDuplicado:
+            QMessageBox.warning(self, "Error", "El usuario ya existe.")
+            return
+
+        # Extraer embedding y anexarlo al repositorio de plantillas (sin reescribir lo existente)
         try:
-            from deepface import DeepFace
-            rep = DeepFace.represent(self.ruta_rostro, model_name=self.recon.modelo, enforce_detection=True)
-            if isinstance(rep, list) and len(rep) > 0:
-                emb = np.array(rep[0]["embedding"], dtype=np.float32)
-
-                # Archivo donde guardaremos todos los embeddings y nombres
-                emb_path = os.path.join(EMBEDDINGS_DIR, "embeddings.npy")
-                names_path = os.path.join(EMBEDDINGS_DIR, "nombres.json")
-
-                # Cargar existentes si hay
-                if os.path.exists(emb_path):
-                    existing_embs = np.load(emb_path)
-                else:
-                    existing_embs = np.empty((0, len(emb)), dtype=np.float32)
-
-                # Concatenar nuevo embedding
-                new_embs = np.vstack([existing_embs, emb])
-
-                # Guardar embeddings actualizados
-                np.save(emb_path, new_embs)
-
-                # Guardar nombres asociados
-                if os.path.exists(names_path):
-                    with open(names_path, "r", encoding="utf-8") as f:
-                        names = json.load(f)
-                else:
-                    names = []
-
-                names.append(nombre)
-                with open(names_path, "w", encoding="utf-8") as f:
-                    json.dump(names, f, indent=4, ensure_ascii=False)
+            emb = self.recon.embeber_imagen(self.ruta_rostro)
+            if emb is not None:
+                self.recon.registrar_usuario(usuario, nombre, emb)
 
         except Exception as e:
             print(f"⚠️ No se pudo extraer o guardar embedding: {e}")
@@ -0,0 +1,43 @@
+# vista_previa.py
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor, QFont, QImage, QPainter, QPen, QPixmap
+
+COLOR_CONOCIDO = QColor(0, 255, 0)
+COLOR_DESCONOCIDO = QColor(255, 0, 0)
+
+
+def pixmap_bgr(frame, ancho, alto):
+    """
+    QPixmap escalado a (ancho, alto) manteniendo proporción, construido directamente
+    desde el buffer BGR del frame: sin conversión de color ni copia intermedia en numpy.
+    Devuelve (pixmap, factor de escala aplicado).
+    """
+    h, w = frame.shape[:2]
+    # QImage envuelve la memoria del frame; scaled() produce ya la imagen final pequeña
+    imagen = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+    escalada = imagen.scaled(ancho, alto, Qt.KeepAspectRatio, Qt.FastTransformation)
+    factor = escalada.width() / w if w else 1.0
+    return QPixmap.fromImage(escalada), factor
+
+
+def dibujar_cajas(pixmap, cajas, nombres, factor):
+    """
+    Dibuja sobre el pixmap ya escalado las cajas (x, y, w, h) en coordenadas del frame.
+    nombres: lista paralela (o None para no rotular). Se pinta sobre la imagen pequeña
+    en lugar de sobre una copia del frame completo.
+    """
+    if not cajas:
+        return pixmap
+    pintor = QPainter(pixmap)
+    try:
+        pintor.setFont(QFont("Arial", 9, QFont.Bold))
+        for i, (x, y, w, h) in enumerate(cajas):
+            nombre = nombres[i] if nombres is not None else None
+            color = COLOR_DESCONOCIDO if nombre == "Desconocido" else COLOR_CONOCIDO
+            pintor.setPen(QPen(color, 2))
+            pintor.drawRect(int(x * factor), int(y * factor), int(w * factor), int(h * factor))
+            if nombre:
+                pintor.drawText(int(x * factor), max(10, int(y * factor) - 4), nombre)
+    finally:
+        pintor.end()
+    return pixmap
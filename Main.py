@@ -1,12 +1,46 @@
 # Main.py
 import sys
-from PySide6.QtWidgets import QApplication
-from Interfaz.Ventana_Principal import VentanaPrincipal
+import time
+
+_inicio = time.perf_counter()
+_fases = []
+_marca_mostrar = None
+
+
+def _fase(nombre, desde):
+    """Anota la duración de una fase del arranque y devuelve el instante actual."""
+    ahora = time.perf_counter()
+    _fases.append((nombre, ahora - desde))
+    return ahora
+
+
+def reportar_arranque():
+    """Imprime el tiempo por fase hasta que la ventana está en pantalla."""
+    _fase("primer pintado", _marca_mostrar)
+    total = time.perf_counter() - _inicio
+    detalle = " | ".join(f"{nombre} {seg:.2f} s" for nombre, seg in _fases)
+    print(f"⏱️ Arranque en {total:.2f} s: {detalle}")
+
 
 def main():
+    global _marca_mostrar
+    t = time.perf_counter()
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    t = _fase("import PySide6", t)
+
     app = QApplication(sys.argv)
+    t = _fase("QApplication", t)
+
+    # Sólo módulos ligeros: deepface/TensorFlow se cargan después, en segundo plano
+    from Interfaz.Ventana_Principal import VentanaPrincipal
+    t = _fase("import interfaz", t)
+
     ventana = VentanaPrincipal()
+    t = _fase("ventana", t)
     ventana.show()
+    _marca_mostrar = t
+    QTimer.singleShot(0, reportar_arranque)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
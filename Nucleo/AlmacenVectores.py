@@ -0,0 +1,279 @@
+# Nucleo/AlmacenVectores.py
+
+import json
+import os
+import pickle
+import struct
+import zlib
+
+import numpy as np
+
+# Cabecera fija de 64 bytes:
+#   magic (4s) | versión (H) | tipo de dato (H) | dimensión (I) | cantidad (Q) | crc32 de la matriz (I)
+#   | crc32 de las líneas de la tabla de ids (I, desde la versión 2)
+MAGIC = b"RFVT"
+VERSION = 2
+VERSIONES_LEGIBLES = (1, 2)
+TIPO_FLOAT32 = 0
+FORMATO_CABECERA_V1 = "<4sHHIQI"
+FORMATO_CABECERA = "<4sHHIQII"
+TAM_CABECERA = 64
+
+
+class ErrorAlmacen(Exception):
+    """Archivo de plantillas inválido o corrupto."""
+
+
+class AlmacenVectores:
+    """
+    Almacén binario versionado de plantillas faciales:
+
+      <base>.rfv        cabecera + matriz float32 (N, D) contigua, legible con np.memmap
+      <base>.ids.jsonl  una línea {"id", "nombre"} por fila, en el mismo orden
+
+    Las altas son sólo de anexado: se escriben las filas nuevas al final, luego sus líneas
+    de ids y por último se actualiza la cabecera (cantidad y crc32 incrementales de la matriz
+    y de la tabla de ids). La cabecera es la fuente de verdad, así que un corte a mitad de
+    escritura deja el almacén en el último estado confirmado, y una tabla de ids que no es
+    la de esa matriz se detecta al cargar en lugar de asignar nombres a vectores ajenos.
+    """
+
+    def __init__(self, ruta_base):
+        self.ruta_base = ruta_base
+        self.ruta_matriz = ruta_base + ".rfv"
+        self.ruta_ids = ruta_base + ".ids.jsonl"
+
+    # --------------------
+    # Cabecera
+    # --------------------
+    def existe(self):
+        return os.path.exists(self.ruta_matriz)
+
+    @staticmethod
+    def _empaquetar(dimension, cantidad, crc, crc_ids):
+        cabecera = struct.pack(FORMATO_CABECERA, MAGIC, VERSION, TIPO_FLOAT32, dimension, cantidad, crc, crc_ids)
+        return cabecera.ljust(TAM_CABECERA, b"\0")
+
+    def leer_cabecera(self):
+        """Devuelve (dimension, cantidad, crc, crc_ids); crc_ids es None en archivos de la versión 1."""
+        with open(self.ruta_matriz, "rb") as f:
+            crudo = f.read(TAM_CABECERA)
+        if len(crudo) < TAM_CABECERA:
+            raise ErrorAlmacen(f"Cabecera incompleta en {self.ruta_matriz}")
+        magic, version, tipo, dimension, cantidad, crc = struct.unpack_from(FORMATO_CABECERA_V1, crudo)
+        if magic != MAGIC:
+            raise ErrorAlmacen(f"{self.ruta_matriz} no es un almacén de plantillas")
+        if version not in VERSIONES_LEGIBLES or tipo != TIPO_FLOAT32:
+            raise ErrorAlmacen(f"Versión {version} / tipo {tipo} no soportados")
+        crc_ids = struct.unpack_from(FORMATO_CABECERA, crudo)[6] if version >= 2 else None
+        return dimension, cantidad, crc, crc_ids
+
+    # --------------------
+    # Tabla de ids
+    # --------------------
+    @staticmethod
+    def _lineas_ids(ids, nombres):
+        """Líneas de la tabla de ids tal como quedan en disco (bytes, siempre con \\n)."""
+        return b"".join(
+            (json.dumps({"id": id_, "nombre": nombre}, ensure_ascii=False) + "\n").encode("utf-8")
+            for id_, nombre in zip(ids, nombres)
+        )
+
+    @staticmethod
+    def _leer_ids(ruta, cantidad):
+        """Devuelve (ids, nombres, crc32) de las primeras `cantidad` líneas de `ruta`."""
+        ids, nombres, crc = [], [], 0
+        if os.path.exists(ruta):
+            with open(ruta, "rb") as f:
+                for linea in f:
+                    if len(ids) >= cantidad:
+                        break  # líneas de una escritura no confirmada
+                    crc = zlib.crc32(linea, crc)
+                    fila = json.loads(linea)
+                    ids.append(fila["id"])
+                    nombres.append(fila["nombre"])
+        return ids, nombres, crc
+
+    # --------------------
+    # Lectura
+    # --------------------
+    def cargar(self, verificar=True):
+        """
+        Carga sin copiar: devuelve (matriz, ids, nombres), con matriz un np.memmap de sólo lectura.
+        Si verificar=True se comprueba el crc32 (una lectura secuencial, sin reservar memoria).
+        """
+        dimension, cantidad, crc, crc_ids = self.leer_cabecera()
+        if cantidad == 0:
+            matriz = np.empty((0, dimension), dtype=np.float32)
+        else:
+            matriz = np.memmap(self.ruta_matriz, dtype=np.float32, mode="r",
+                               offset=TAM_CABECERA, shape=(cantidad, dimension))
+            if verificar and zlib.crc32(memoryview(matriz).cast("B")) != crc:
+                raise ErrorAlmacen(f"Checksum inválido en {self.ruta_matriz}")
+
+        ids, nombres, crc_leido = self._leer_ids(self.ruta_ids, cantidad)
+        if crc_ids is not None and (len(ids) < cantidad or crc_leido != crc_ids):
+            # escribir() reemplaza la matriz antes que la tabla de ids: si el corte ocurrió
+            # entre ambos reemplazos, la tabla que corresponde sigue en el temporal
+            tmp_ids = self.ruta_ids + ".tmp"
+            ids, nombres, crc_leido = self._leer_ids(tmp_ids, cantidad)
+            if len(ids) < cantidad or crc_leido != crc_ids:
+                raise ErrorAlmacen(f"La tabla de ids no corresponde a la matriz de {self.ruta_matriz}")
+            os.replace(tmp_ids, self.ruta_ids)
+        if len(ids) < cantidad:
+            raise ErrorAlmacen(f"Tabla de ids incompleta: {len(ids)} de {cantidad} filas")
+        return matriz, ids, nombres
+
+    # --------------------
+    # Escritura
+    # --------------------
+    @staticmethod
+    def _sincronizar(f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def escribir(self, matriz, ids, nombres):
+        """
+        Reescribe el almacén completo (archivos temporales + os.replace). La cabecera de la
+        matriz lleva el crc32 de su tabla de ids, así que la pareja se valida al cargar.
+        """
+        matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+        if matriz.ndim != 2 or len(ids) != len(matriz) or len(nombres) != len(matriz):
+            raise ValueError("matriz, ids y nombres deben tener la misma cantidad de filas")
+        os.makedirs(os.path.dirname(os.path.abspath(self.ruta_base)), exist_ok=True)
+
+        lineas = self._lineas_ids(ids, nombres)
+        tmp_ids = self.ruta_ids + ".tmp"
+        with open(tmp_ids, "wb") as f:
+            f.write(lineas)
+            self._sincronizar(f)
+
+        tmp_matriz = self.ruta_matriz + ".tmp"
+        with open(tmp_matriz, "wb") as f:
+            f.write(self._empaquetar(matriz.shape[1], len(matriz), zlib.crc32(matriz.data), zlib.crc32(lineas)))
+            f.write(matriz.data)
+            self._sincronizar(f)
+
+        # Primero la matriz (que confirma): un corte antes del segundo reemplazo deja la tabla
+        # nueva en el temporal y cargar() termina el reemplazo al ver que el crc no coincide
+        os.replace(tmp_matriz, self.ruta_matriz)
+        os.replace(tmp_ids, self.ruta_ids)
+
+    def anexar(self, vectores, ids, nombres):
+        """Añade filas al final sin reescribir las existentes."""
+        vectores = np.ascontiguousarray(vectores, dtype=np.float32)
+        if vectores.ndim == 1:
+            vectores = vectores[np.newaxis, :]
+        if len(ids) != len(vectores) or len(nombres) != len(vectores):
+            raise ValueError("vectores, ids y nombres deben tener la misma cantidad de filas")
+        if not self.existe():
+            self.escribir(vectores, ids, nombres)
+            return
+
+        dimension, cantidad, crc, crc_ids = self.leer_cabecera()
+        if cantidad == 0:
+            # Almacén vacío (aún sin dimensión fija): escribir desde cero
+            self.escribir(vectores, ids, nombres)
+            return
+        if vectores.shape[1] != dimension:
+            raise ValueError(f"Dimensión {vectores.shape[1]} distinta a la del almacén ({dimension})")
+
+        with open(self.ruta_matriz, "r+b") as f:
+            # Descartar cualquier resto de una escritura no confirmada
+            f.truncate(TAM_CABECERA + cantidad * dimension * 4)
+            f.seek(0, os.SEEK_END)
+            f.write(vectores.data)
+            self._sincronizar(f)
+
+            self._recortar_ids(cantidad)
+            if crc_ids is None:
+                # Archivo de la versión 1: el crc de la tabla se calcula una vez al migrarlo
+                crc_ids = self._leer_ids(self.ruta_ids, cantidad)[2]
+            lineas = self._lineas_ids(ids, nombres)
+            with open(self.ruta_ids, "ab") as g:
+                g.write(lineas)
+                self._sincronizar(g)
+
+            # Confirmar: nueva cantidad y crc32 incrementales
+            f.seek(0)
+            f.write(self._empaquetar(dimension, cantidad + len(vectores), zlib.crc32(vectores.data, crc),
+                                     zlib.crc32(lineas, crc_ids)))
+            self._sincronizar(f)
+
+    def _recortar_ids(self, cantidad):
+        """Deja la tabla de ids con exactamente `cantidad` líneas (descarta restos no confirmados)."""
+        if not os.path.exists(self.ruta_ids):
+            if cantidad:
+                raise ErrorAlmacen("Falta la tabla de ids")
+            open(self.ruta_ids, "w").close()
+            return
+        with open(self.ruta_ids, "r+b") as f:
+            for _ in range(cantidad):
+                if not f.readline():
+                    raise ErrorAlmacen("Tabla de ids más corta que la matriz")
+            f.truncate()
+
+
+# --------------------
+# Migración desde formatos anteriores
+# --------------------
+def migrar_legado(almacen, ruta_pkl=None, ruta_npy=None, ruta_nombres=None):
+    """
+    Importa una única vez los formatos anteriores (vectores_deepface.pkl y
+    embeddings.npy + nombres.json) si el almacén todavía no existe.
+    Devuelve la cantidad de filas migradas.
+    """
+    if almacen.existe():
+        return 0
+
+    vectores, nombres = [], []
+    if ruta_pkl and os.path.exists(ruta_pkl):
+        try:
+            with open(ruta_pkl, "rb") as f:
+                data = pickle.load(f)
+            encs = data.get("encodings", [])
+            names = data.get("names", [])
+            n = min(len(encs), len(names))
+            if n:
+                vectores.append(np.asarray(encs[:n], dtype=np.float32))
+                nombres.extend(names[:n])
+        except Exception as e:
+            print(f"⚠️ No se pudo migrar {ruta_pkl}: {e}")
+
+    if ruta_npy and ruta_nombres and os.path.exists(ruta_npy) and os.path.exists(ruta_nombres):
+        try:
+            embs = np.load(ruta_npy, allow_pickle=True)
+            with open(ruta_nombres, "r", encoding="utf-8") as f:
+                names = json.load(f)
+            if embs.ndim == 1:
+                embs = np.expand_dims(embs, 0)
+            n = min(len(embs), len(names))
+            if n:
+                vectores.append(np.asarray(embs[:n], dtype=np.float32))
+                nombres.extend(names[:n])
+        except Exception as e:
+            print(f"⚠️ No se pudo migrar {ruta_npy}: {e}")
+
+    if not vectores:
+        return 0
+    dimensiones = {v.shape[1] for v in vectores}
+    if len(dimensiones) > 1:
+        print(f"⚠️ Dimensiones incompatibles en los archivos antiguos: {sorted(dimensiones)}; se conserva la primera")
+        d = vectores[0].shape[1]
+        pares = [(v, nombres_) for v, nombres_ in _dividir(vectores, nombres) if v.shape[1] == d]
+        vectores = [v for v, _ in pares]
+        nombres = [n for _, ns in pares for n in ns]
+
+    matriz = np.concatenate(vectores)
+    matriz /= np.maximum(np.linalg.norm(matriz, axis=1, keepdims=True), 1e-10)
+    # Los formatos antiguos sólo guardaban el nombre: se usa también como id
+    almacen.escribir(matriz, list(nombres), list(nombres))
+    print(f"🔄 Migradas {len(matriz)} plantillas a {almacen.ruta_matriz}")
+    return len(matriz)
+
+
+def _dividir(vectores, nombres):
+    inicio = 0
+    for v in vectores:
+        yield v, nombres[inicio:inicio + len(v)]
+        inicio += len(v)
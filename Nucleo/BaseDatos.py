@@ -0,0 +1,209 @@
+# Nucleo/BaseDatos.py
+
+import json
+import os
+import sqlite3
+import threading
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RUTA_DATOS = os.path.join(PROJECT_ROOT, "Datos")
+RUTA_BASE_DATOS = os.path.join(RUTA_DATOS, "base_datos.db")
+RUTA_USUARIOS_JSON = os.path.join(RUTA_DATOS, "usuarios.json")        # formato antiguo (sólo importación)
+
+ROL_POR_DEFECTO = "USUARIO REGISTRADO"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS roles (
+    id      INTEGER PRIMARY KEY,
+    nombre  TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS usuarios (
+    id          INTEGER PRIMARY KEY,
+    usuario     TEXT NOT NULL,
+    nombre      TEXT NOT NULL,
+    contrasena  TEXT NOT NULL DEFAULT '',
+    rostro      TEXT,
+    rol_id      INTEGER REFERENCES roles(id),
+    creado      TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_usuarios_usuario ON usuarios(usuario);
+"""
+
+
+class UsuarioDuplicado(Exception):
+    """Ya existe un usuario con ese nombre de usuario."""
+
+
+class BaseDatos:
+    """
+    Base de datos local (SQLite) de usuarios y roles.
+
+    Cada hilo usa su propia conexión (creada al primer uso y reutilizada después), en modo
+    WAL para que las lecturas del hilo de la interfaz no esperen a las escrituras. La
+    búsqueda y el control de duplicados por nombre de usuario usan un índice único, así que
+    registrar o consultar un usuario no depende de cuántos haya.
+
+    Las plantillas no se guardan aquí: el repositorio de plantillas
+    (Nucleo/RepositorioPlantillas.py) es su única fuente, y sus filas se enlazan con la
+    columna `usuario` (el id_usuario del repositorio). Altas y bajas de plantillas pasan
+    por ReconocimientoFacial.registrar_usuario / eliminar_usuario.
+    """
+
+    def __init__(self, ruta=RUTA_BASE_DATOS):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self.conexion().executescript(ESQUEMA)
+
+    # --------------------
+    # Conexiones
+    # --------------------
+    def conexion(self):
+        """Conexión del hilo actual (una por hilo, reutilizada)."""
+        con = getattr(self._local, "conexion", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10.0)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA foreign_keys=ON")
+            self._local.conexion = con
+            with self._lock:
+                self._conexiones.append(con)
+        return con
+
+    def cerrar(self):
+        with self._lock:
+            for con in self._conexiones:
+                try:
+                    con.close()
+                except sqlite3.Error:
+                    pass
+            self._conexiones = []
+        self._local = threading.local()
+
+    # --------------------
+    # Roles
+    # --------------------
+    def _id_rol(self, con, rol):
+        con.execute("INSERT OR IGNORE INTO roles (nombre) VALUES (?)", (rol,))
+        return con.execute("SELECT id FROM roles WHERE nombre = ?", (rol,)).fetchone()[0]
+
+    # --------------------
+    # Usuarios
+    # --------------------
+    def agregar_usuario(self, usuario, nombre, contrasena="", rostro=None, rol=ROL_POR_DEFECTO):
+        """
+        Inserta un usuario. Lanza UsuarioDuplicado si el nombre de usuario ya existe.
+        Devuelve el id interno.
+        """
+        con = self.conexion()
+        try:
+            with con:
+                rol_id = self._id_rol(con, rol)
+                cursor = con.execute(
+                    "INSERT INTO usuarios (usuario, nombre, contrasena, rostro, rol_id) VALUES (?, ?, ?, ?, ?)",
+                    (usuario, nombre, contrasena, rostro, rol_id),
+                )
+        except sqlite3.IntegrityError as e:
+            raise UsuarioDuplicado(usuario) from e
+        return cursor.lastrowid
+
+    def existe_usuario(self, usuario):
+        fila = self.conexion().execute("SELECT 1 FROM usuarios WHERE usuario = ?", (usuario,)).fetchone()
+        return fila is not None
+
+    def buscar_usuario(self, usuario):
+        """Devuelve un dict con los datos del usuario (incluido su rol) o None."""
+        fila = self.conexion().execute(
+            "SELECT u.id, u.usuario, u.nombre, u.contrasena, u.rostro, r.nombre AS rol "
+            "FROM usuarios u LEFT JOIN roles r ON r.id = u.rol_id WHERE u.usuario = ?",
+            (usuario,),
+        ).fetchone()
+        return dict(fila) if fila is not None else None
+
+    def usuarios(self):
+        """Lista de dicts de todos los usuarios, en orden de alta."""
+        filas = self.conexion().execute(
+            "SELECT u.id, u.usuario, u.nombre, u.contrasena, u.rostro, r.nombre AS rol "
+            "FROM usuarios u LEFT JOIN roles r ON r.id = u.rol_id ORDER BY u.id"
+        ).fetchall()
+        return [dict(f) for f in filas]
+
+    def contar_usuarios(self):
+        return self.conexion().execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]
+
+    def eliminar_usuario(self, usuario):
+        """
+        Borra sólo la fila del usuario. Devuelve True si existía. Para dar de baja a una
+        persona (también sus plantillas) usar ReconocimientoFacial.eliminar_usuario.
+        """
+        con = self.conexion()
+        with con:
+            cursor = con.execute("DELETE FROM usuarios WHERE usuario = ?", (usuario,))
+        return cursor.rowcount > 0
+
+    # --------------------
+    # Importación desde los archivos antiguos
+    # --------------------
+    def importar_legado(self, ruta_usuarios=RUTA_USUARIOS_JSON):
+        """
+        Importa usuarios.json; los usuarios ya existentes se omiten. Todo va en una
+        transacción con inserciones por lotes. Devuelve cuántos usuarios se importaron.
+        (Los embeddings antiguos los importa el repositorio de plantillas al crearse.)
+        """
+        if not os.path.exists(ruta_usuarios):
+            return 0
+        try:
+            with open(ruta_usuarios, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except Exception as e:
+            print(f"⚠️ No se pudo leer {ruta_usuarios}: {e}")
+            return 0
+
+        con = self.conexion()
+        with con:
+            rol_id = self._id_rol(con, ROL_POR_DEFECTO)
+            filas = [
+                (u["usuario"], u.get("nombre", u["usuario"]), u.get("contrasena", ""), u.get("rostro"), rol_id)
+                for u in datos if u.get("usuario")
+            ]
+            antes = con.total_changes
+            con.executemany(
+                "INSERT OR IGNORE INTO usuarios (usuario, nombre, contrasena, rostro, rol_id) VALUES (?, ?, ?, ?, ?)",
+                filas,
+            )
+            importados = con.total_changes - antes
+
+        if importados:
+            print(f"🔄 Importados {importados} usuarios desde {ruta_usuarios}")
+        return importados
+
+
+# --------------------
+# Instancia compartida por proceso
+# --------------------
+_bases = {}
+_lock_bases = threading.Lock()
+
+
+def obtener_base_datos(ruta=RUTA_BASE_DATOS):
+    """
+    Devuelve la base de datos compartida para esa ruta. La primera vez que se crea el
+    archivo importa usuarios.json si existe.
+    """
+    ruta = os.path.abspath(ruta)
+    with _lock_bases:
+        base = _bases.get(ruta)
+        if base is None:
+            nueva = not os.path.exists(ruta)
+            base = BaseDatos(ruta)
+            if nueva:
+                try:
+                    base.importar_legado()
+                except Exception as e:
+                    print(f"⚠️ Error importando usuarios antiguos: {e}")
+            _bases[ruta] = base
+    return base
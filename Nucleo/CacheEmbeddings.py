@@ -0,0 +1,219 @@
+# Nucleo/CacheEmbeddings.py
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+try:
+    from Nucleo.Enrolamiento import hash_archivo
+except ImportError:
+    from Enrolamiento import hash_archivo
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RUTA_CACHE = os.path.join(PROJECT_ROOT, "Datos", "cache_embeddings.db")
+
+# Subir cuando cambie cómo se obtiene el embedding de una imagen (detector, alineado,
+# normalización...): las entradas anteriores dejan de coincidir y se desalojan por LRU.
+VERSION_PREPROCESADO = 1
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    hash        TEXT NOT NULL,
+    modelo      TEXT NOT NULL,
+    version     INTEGER NOT NULL,
+    dimension   INTEGER NOT NULL,
+    vector      BLOB NOT NULL,
+    ultimo_uso  REAL NOT NULL,
+    PRIMARY KEY (hash, modelo, version)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_uso ON embeddings(ultimo_uso);
+"""
+
+
+class CacheEmbeddings:
+    """
+    Caché en disco (SQLite) de (hash del contenido de la imagen, modelo, versión de
+    preprocesado) → embedding float32.
+
+    El tamaño está acotado a max_entradas; al superarlo se desalojan las entradas usadas
+    hace más tiempo (LRU por ultimo_uso) hasta bajar a holgura * max_entradas, así que el
+    recuento exacto y el desalojo se hacen una vez cada muchas altas y no en cada una.
+    Entre tanto la cantidad de entradas se lleva en memoria.
+
+    Un acierto no escribe en la base: su ultimo_uso queda pendiente y se escribe junto con
+    los demás cada lote_usos aciertos, en la siguiente alta o con sincronizar(). Perder los
+    pendientes (un corte) sólo envejece esas entradas en el LRU. Lleva la cuenta de
+    aciertos y fallos.
+    """
+
+    def __init__(self, ruta=RUTA_CACHE, max_entradas=100_000, version=VERSION_PREPROCESADO,
+                 lote_usos=256, holgura=0.9):
+        self.ruta = ruta
+        self.max_entradas = max(1, int(max_entradas))
+        self.version = version
+        self.lote_usos = max(1, int(lote_usos))
+        self.holgura = holgura
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._usos = {}            # (hash, modelo) -> ultimo_uso aún no escrito
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        con = self._conexion()
+        con.executescript(ESQUEMA)
+        self._entradas = con.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _conexion(self):
+        con = getattr(self._local, "conexion", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10.0)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = con
+        return con
+
+    # --------------------
+    # Consulta
+    # --------------------
+    def obtener(self, hash_, modelo):
+        """
+        Embedding (D,) guardado o None. Un acierto renueva su posición en el LRU (la
+        escritura se agrupa con las de otros aciertos).
+        """
+        fila = self._conexion().execute(
+            "SELECT dimension, vector FROM embeddings WHERE hash = ? AND modelo = ? AND version = ?",
+            (hash_, modelo, self.version),
+        ).fetchone()
+        with self._lock:
+            if fila is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self._usos[(hash_, modelo)] = time.time()
+            lleno = len(self._usos) >= self.lote_usos
+        if lleno:
+            self.sincronizar()
+        return np.frombuffer(fila[1], dtype=np.float32, count=fila[0]).copy()
+
+    def __len__(self):
+        with self._lock:
+            return self._entradas
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": self._entradas,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            }
+
+    # --------------------
+    # Escritura
+    # --------------------
+    def _tomar_usos(self):
+        with self._lock:
+            usos, self._usos = self._usos, {}
+        return [(uso, hash_, modelo, self.version) for (hash_, modelo), uso in usos.items()]
+
+    @staticmethod
+    def _escribir_usos(con, filas):
+        con.executemany(
+            "UPDATE embeddings SET ultimo_uso = ? WHERE hash = ? AND modelo = ? AND version = ?", filas
+        )
+
+    def sincronizar(self):
+        """Escribe en una transacción los ultimo_uso pendientes de los aciertos."""
+        filas = self._tomar_usos()
+        if filas:
+            con = self._conexion()
+            with con:
+                self._escribir_usos(con, filas)
+
+    def guardar(self, hash_, modelo, embedding):
+        self.guardar_lote([(hash_, modelo, embedding)])
+
+    def guardar_lote(self, entradas):
+        """
+        entradas: lista de (hash, modelo, embedding). Una sola transacción, que también
+        escribe los ultimo_uso pendientes para que el desalojo vea los usos recientes.
+        """
+        if not entradas:
+            return
+        ahora = time.time()
+        filas = []
+        for hash_, modelo, emb in entradas:
+            emb = np.ascontiguousarray(emb, dtype=np.float32).ravel()
+            filas.append((hash_, modelo, self.version, len(emb), emb.tobytes(), ahora))
+        usos = self._tomar_usos()
+        con = self._conexion()
+        desalojadas = 0
+        with con:
+            if usos:
+                self._escribir_usos(con, usos)
+            # Una entrada que ya existe tiene el mismo embedding (misma imagen, modelo y versión)
+            antes = con.total_changes
+            con.executemany(
+                "INSERT OR IGNORE INTO embeddings (hash, modelo, version, dimension, vector, ultimo_uso) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+            with self._lock:
+                self._entradas += con.total_changes - antes
+                excedido = self._entradas > self.max_entradas
+            if excedido:
+                # Recuento exacto (otro proceso puede compartir el archivo) y desalojo con holgura
+                entradas = con.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                desalojadas = max(0, entradas - max(1, int(self.holgura * self.max_entradas)))
+                if desalojadas:
+                    con.execute(
+                        "DELETE FROM embeddings WHERE rowid IN "
+                        "(SELECT rowid FROM embeddings ORDER BY ultimo_uso LIMIT ?)",
+                        (desalojadas,),
+                    )
+                with self._lock:
+                    self._entradas = entradas - desalojadas
+        if desalojadas:
+            with self._lock:
+                self.desalojos += desalojadas
+
+    # --------------------
+    # Uso directo con archivos
+    # --------------------
+    def embeber_archivo(self, ruta, modelo, calcular):
+        """
+        Devuelve el embedding de la imagen en `ruta`, desde la caché si su contenido ya se
+        embebió con ese modelo, o llamando a calcular(ruta) (y guardándolo) si no.
+        calcular devuelve el embedding o None.
+        """
+        hash_ = hash_archivo(ruta)
+        emb = self.obtener(hash_, modelo)
+        if emb is not None:
+            return emb
+        emb = calcular(ruta)
+        if emb is not None:
+            self.guardar(hash_, modelo, emb)
+        return emb
+
+
+# --------------------
+# Instancia compartida por proceso
+# --------------------
+_caches = {}
+_lock_caches = threading.Lock()
+
+
+def obtener_cache(ruta=RUTA_CACHE):
+    ruta = os.path.abspath(ruta)
+    with _lock_caches:
+        cache = _caches.get(ruta)
+        if cache is None:
+            cache = CacheEmbeddings(ruta)
+            _caches[ruta] = cache
+    return cache
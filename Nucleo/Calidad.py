@@ -0,0 +1,106 @@
+# Nucleo/Calidad.py
+
+import threading
+
+import cv2
+import numpy as np
+
+
+def _rampa(valor, minimo, ideal):
+    """0 por debajo de minimo; de 0.2 en minimo a 1.0 en ideal (o más)."""
+    progreso = np.clip((valor - minimo) / max(ideal - minimo, 1e-6), 0.0, 1.0)
+    return np.where(valor < minimo, 0.0, 0.2 + 0.8 * progreso)
+
+
+class EvaluadorCalidad:
+    """
+    Puntaje de calidad barato de los recortes de rostro, calculado antes del embedding para
+    no gastar inferencia en rostros que nunca van a coincidir. Criterios:
+
+      - tamaño: lado menor del recorte (tam_minimo → tam_ideal).
+      - nitidez: varianza del laplaciano sobre el recorte llevado a lado x lado en gris
+                 (independiente del tamaño original).
+      - brillo: media de gris dentro de [brillo_minimo, brillo_maximo].
+      - pose: simetría izquierda/derecha y proporción alto/ancho de la caja; un perfil
+              o un rostro muy girado es asimétrico.
+
+    Cada criterio da un valor en [0, 1] (0 = descartar sin más) y el puntaje es su media
+    geométrica. Todo se evalúa de una vez sobre los recortes de un frame: sólo el
+    redimensionado es por recorte.
+    """
+
+    def __init__(self, tam_minimo=60, tam_ideal=112, nitidez_minima=40.0, nitidez_ideal=200.0,
+                 brillo_minimo=50.0, brillo_maximo=210.0, asimetria_maxima=45.0, proporcion_maxima=1.6,
+                 umbral=0.45, lado=64):
+        self.tam_minimo = tam_minimo
+        self.tam_ideal = tam_ideal
+        self.nitidez_minima = nitidez_minima
+        self.nitidez_ideal = nitidez_ideal
+        self.brillo_minimo = brillo_minimo
+        self.brillo_maximo = brillo_maximo
+        self.asimetria_maxima = asimetria_maxima
+        self.proporcion_maxima = proporcion_maxima
+        self.umbral = umbral
+        self.lado = int(lado)
+        # Un buffer por hilo: el mismo evaluador lo usan varias cámaras/etapas a la vez
+        self._buffers = threading.local()
+
+    def _pila(self, recortes):
+        """Recortes en gris a lado x lado en un único arreglo (N, lado, lado) float32 reutilizado."""
+        n = len(recortes)
+        buffer = getattr(self._buffers, "pila", None)
+        if buffer is None or buffer.shape[0] < n:
+            buffer = self._buffers.pila = np.empty((max(n, 8), self.lado, self.lado), dtype=np.float32)
+        pila = buffer[:n]
+        for i, recorte in enumerate(recortes):
+            gris = recorte if recorte.ndim == 2 else cv2.cvtColor(recorte, cv2.COLOR_BGR2GRAY)
+            pila[i] = cv2.resize(gris, (self.lado, self.lado), interpolation=cv2.INTER_AREA)
+        return pila
+
+    def evaluar(self, recortes):
+        """
+        Devuelve un dict de arreglos (N,): tam, nitidez, brillo, asimetria, proporcion,
+        puntaje y aceptado.
+        """
+        n = len(recortes)
+        if n == 0:
+            vacio = np.empty(0, dtype=np.float32)
+            return {"tam": vacio, "nitidez": vacio, "brillo": vacio, "asimetria": vacio,
+                    "proporcion": vacio, "puntaje": vacio, "aceptado": np.empty(0, dtype=bool)}
+
+        formas = np.array([r.shape[:2] for r in recortes], dtype=np.float32)
+        tam = formas.min(axis=1)
+        proporcion = formas.max(axis=1) / np.maximum(tam, 1.0)
+
+        pila = self._pila(recortes)
+        centro = pila[:, 1:-1, 1:-1]
+        laplaciano = 4.0 * centro - pila[:, :-2, 1:-1] - pila[:, 2:, 1:-1] - pila[:, 1:-1, :-2] - pila[:, 1:-1, 2:]
+        nitidez = laplaciano.var(axis=(1, 2))
+        brillo = pila.mean(axis=(1, 2))
+        mitad = self.lado // 2
+        asimetria = np.abs(pila[:, :, :mitad] - pila[:, :, ::-1][:, :, :mitad]).mean(axis=(1, 2))
+
+        s_tam = _rampa(tam, self.tam_minimo, self.tam_ideal)
+        s_nitidez = _rampa(nitidez, self.nitidez_minima, self.nitidez_ideal)
+        fuera = np.maximum(self.brillo_minimo - brillo, 0.0) + np.maximum(brillo - self.brillo_maximo, 0.0)
+        s_brillo = np.clip(1.0 - fuera / 40.0, 0.0, 1.0)
+        s_pose = np.clip(1.0 - asimetria / self.asimetria_maxima, 0.0, 1.0) * (proporcion <= self.proporcion_maxima)
+
+        puntaje = (s_tam * s_nitidez * s_brillo * s_pose) ** 0.25
+        return {
+            "tam": tam, "nitidez": nitidez, "brillo": brillo, "asimetria": asimetria, "proporcion": proporcion,
+            "puntaje": puntaje, "aceptado": puntaje >= self.umbral,
+        }
+
+    def aceptables(self, recortes):
+        """Máscara (N,) de los recortes que vale la pena embeber."""
+        return self.evaluar(recortes)["aceptado"]
+
+    def mejor(self, recortes):
+        """(índice, puntaje) del mejor recorte aceptable, o (None, 0.0) si ninguno lo es."""
+        evaluacion = self.evaluar(recortes)
+        if not np.any(evaluacion["aceptado"]):
+            return None, 0.0
+        puntajes = np.where(evaluacion["aceptado"], evaluacion["puntaje"], -1.0)
+        i = int(np.argmax(puntajes))
+        return i, float(puntajes[i])
@@ -1,32 +1,288 @@
 # Camara.py
+import os
+import threading
+import time
+
 import cv2
+import numpy as np
+
+try:
+    from Nucleo.Metricas import metricas
+except ImportError:
+    from Metricas import metricas
+
+EXTENSIONES_IMAGEN = (".png", ".jpg", ".jpeg", ".bmp")
+
 
 class Camara:
-    def __init__(self, index=0):
+    def __init__(self, index=0, en_hilo=False, tam_anillo=None, repetir=True, fps_objetivo=None,
+                 consumidores=1):
+        """
+        index: índice de cámara (int), ruta a un archivo de video o a una carpeta de imágenes.
+        en_hilo: si es True, un hilo lee continuamente en un anillo de buffers preasignados.
+                 obtener_ultimo(fijar=True) entrega el frame más reciente sin copiarlo y el
+                 lector no vuelve a escribir ese buffer hasta que se libere con liberar(frame).
+        tam_anillo: cantidad de buffers del anillo. None = según consumidores.
+        consumidores: hilos que retienen frames a la vez. Cada uno puede tener uno en uso y otro
+                      en cola; con menos buffers libres el lector espera a que se libere alguno.
+        repetir: para archivos/carpetas, volver a empezar al llegar al final.
+        fps_objetivo: para archivos/carpetas, ritmo de lectura (None = lo más rápido posible).
+        """
         self.index = index
         self.captura = None
+        self.en_hilo = en_hilo
+        self.tam_anillo = max(2, int(tam_anillo)) if tam_anillo else max(4, 2 + 2 * int(consumidores))
+        self.repetir = repetir
+        self.fps_objetivo = fps_objetivo
+
+        # Fuente de imágenes sueltas (carpeta)
+        self._imagenes = None
+        self._pos_imagen = 0
+        self.agotada = False
+
+        # Estado del modo en hilo
+        self._anillo = None
+        self._marcas = None
+        self._secuencias = None
+        self._fijados = None
+        self._slot_actual = -1
+        self._secuencia = 0
+        self._ultima_entregada = 0
+        self._cond = threading.Condition()
+        self._activo = False
+        self._hilo = None
+
+        # Contadores
+        self.frames_leidos = 0
+        self.frames_descartados = 0
+        self.fallos_lectura = 0
+
+    # --------------------
+    # Fuente
+    # --------------------
+    def _es_carpeta(self):
+        return isinstance(self.index, str) and os.path.isdir(self.index)
+
+    def _es_archivo(self):
+        return isinstance(self.index, str) and os.path.isfile(self.index)
 
     def iniciar(self):
         """Inicia la captura con configuración optimizada"""
-        self.captura = cv2.VideoCapture(self.index)
-        if self.captura.isOpened():
-            # Configuración para máximo rendimiento
-            self.captura.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.captura.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.captura.set(cv2.CAP_PROP_FPS, 20)
-            self.captura.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reducir buffer
+        self.frames_leidos = 0
+        self.frames_descartados = 0
+        self.fallos_lectura = 0
+        self._secuencia = 0
+        self._ultima_entregada = 0
+        self._slot_actual = -1
+        self.agotada = False
+
+        if self._es_carpeta():
+            self._imagenes = sorted(
+                os.path.join(self.index, f) for f in os.listdir(self.index)
+                if f.lower().endswith(EXTENSIONES_IMAGEN)
+            )
+            self._pos_imagen = 0
+            if not self._imagenes:
+                return False
+        else:
+            self.captura = cv2.VideoCapture(self.index)
+            if not self.captura.isOpened():
+                return False
+            if isinstance(self.index, int):
+                # Configuración para máximo rendimiento
+                self.captura.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                self.captura.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                self.captura.set(cv2.CAP_PROP_FPS, 20)
+                self.captura.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reducir buffer
+
+        if self.en_hilo:
+            self._activo = True
+            self._hilo = threading.Thread(target=self._bucle_lectura, name="camara-lector", daemon=True)
+            self._hilo.start()
+        return True
+
+    def _leer(self, destino=None):
+        """Lee el siguiente frame de la fuente, reutilizando destino si es posible."""
+        if self._imagenes is not None:
+            if self._pos_imagen >= len(self._imagenes):
+                if not self.repetir:
+                    self.agotada = True
+                    return None
+                self._pos_imagen = 0
+            img = cv2.imread(self._imagenes[self._pos_imagen])
+            self._pos_imagen += 1
+            if img is None:
+                return None
+            if destino is not None and destino.shape == img.shape:
+                np.copyto(destino, img)
+                return destino
+            return img
+
+        if self.captura is None or not self.captura.isOpened():
+            return None
+        if destino is not None:
+            ret, frame = self.captura.read(destino)
+        else:
+            ret, frame = self.captura.read()
+        if not ret and self._es_archivo() and self.repetir:
+            self.captura.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.captura.read(destino) if destino is not None else self.captura.read()
+        if not ret and self._es_archivo():
+            self.agotada = True
+        return frame if ret else None
+
+    # --------------------
+    # Lectura en hilo (grab-ahead)
+    # --------------------
+    def _slot_libre(self):
+        """
+        Con el lock tomado: siguiente buffer que no es el publicado ni está fijado por un
+        consumidor. Si todos lo están, espera a que se libere alguno (None si se detiene).
+        """
+        if self._anillo is None:
+            return (self._slot_actual + 1) % self.tam_anillo
+        while self._activo:
+            for paso in range(1, self.tam_anillo):
+                slot = (self._slot_actual + paso) % self.tam_anillo
+                if not self._fijados[slot]:
+                    return slot
+            self._cond.wait(0.1)
+        return None
+
+    def _bucle_lectura(self):
+        periodo = 1.0 / self.fps_objetivo if (self.fps_objetivo and not isinstance(self.index, int)) else 0.0
+        siguiente = time.perf_counter()
+        while self._activo:
+            # Nadie puede fijar el buffer elegido mientras se escribe: sólo se fija el publicado
+            with self._cond:
+                slot = self._slot_libre()
+                if slot is None:
+                    break
+                destino = self._anillo[slot] if self._anillo is not None else None
+            frame = self._leer(destino)
+            if frame is None:
+                if self.agotada:
+                    with self._cond:
+                        self._cond.notify_all()
+                    break
+                self.fallos_lectura += 1
+                time.sleep(0.005)
+                continue
+
+            marca = time.perf_counter()
+            with self._cond:
+                if self._anillo is None or self._anillo[slot].shape != frame.shape:
+                    # Primer frame (o cambio de resolución): preasignar el anillo completo
+                    self._anillo = [np.empty_like(frame) for _ in range(self.tam_anillo)]
+                    self._marcas = [0.0] * self.tam_anillo
+                    self._secuencias = [0] * self.tam_anillo
+                    # Los frames fijados del anillo anterior siguen siendo de sus consumidores
+                    self._fijados = [0] * self.tam_anillo
+                if frame is not self._anillo[slot]:
+                    np.copyto(self._anillo[slot], frame)
+                self._secuencia += 1
+                self._marcas[slot] = marca
+                self._secuencias[slot] = self._secuencia
+                self._slot_actual = slot
+                self.frames_leidos += 1
+                self._cond.notify_all()
+
+            if periodo:
+                siguiente += periodo
+                espera = siguiente - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                else:
+                    siguiente = time.perf_counter()
+
+    def obtener_ultimo(self, timeout=0.5, fijar=False):
+        """
+        Modo en hilo: devuelve (frame, marca_tiempo, secuencia) del frame más reciente sin copiarlo,
+        esperando hasta timeout segundos a que llegue uno nuevo. (None, None, None) si no hay.
+        Sin fijar, el frame puede sobrescribirse en cuanto el lector dé la vuelta al anillo;
+        con fijar=True queda reservado hasta liberar(frame).
+        """
+        # La espera cuenta: es el tiempo que el consumidor pasa aguardando a la cámara
+        with metricas.tramo("camara"), self._cond:
+            if self._secuencia <= self._ultima_entregada and self._activo and not self.agotada:
+                self._cond.wait_for(
+                    lambda: self._secuencia > self._ultima_entregada or not self._activo or self.agotada, timeout
+                )
+            if self._slot_actual < 0 or self._secuencia <= self._ultima_entregada:
+                return None, None, None
+            slot = self._slot_actual
+            secuencia = self._secuencias[slot]
+            # Frames leídos que nadie llegó a consumir
+            self.frames_descartados += max(0, secuencia - self._ultima_entregada - 1)
+            self._ultima_entregada = secuencia
+            if fijar:
+                self._fijados[slot] += 1
+            return self._anillo[slot], self._marcas[slot], secuencia
+
+    def _slot_de(self, frame):
+        if self._anillo is not None:
+            for slot, buffer in enumerate(self._anillo):
+                if buffer is frame:
+                    return slot
+        return None
+
+    def fijar(self, frame):
+        """
+        Reserva otra vez un frame ya fijado, para entregarlo a un segundo consumidor
+        (cada fijar() requiere su liberar()). False si el frame no es del anillo.
+        """
+        with self._cond:
+            slot = self._slot_de(frame)
+            if slot is None:
+                return False
+            self._fijados[slot] += 1
             return True
-        return False
+
+    def liberar(self, frame):
+        """Devuelve al lector un frame fijado. Ignora frames ajenos al anillo actual."""
+        with self._cond:
+            slot = self._slot_de(frame)
+            if slot is not None and self._fijados[slot] > 0:
+                self._fijados[slot] -= 1
+                self._cond.notify_all()
 
     def obtener_frame(self):
         """Obtiene frame optimizado"""
-        if self.captura and self.captura.isOpened():
-            ret, frame = self.captura.read()
-            return frame if ret else None
+        if self.en_hilo:
+            # Sin un liberar() posterior no se puede fijar: se entrega una copia
+            frame, _, _ = self.obtener_ultimo(fijar=True)
+            if frame is None:
+                return None
+            copia = frame.copy()
+            self.liberar(frame)
+            return copia
+        if self._imagenes is not None or (self.captura and self.captura.isOpened()):
+            with metricas.tramo("camara"):
+                frame = self._leer()
+            if frame is not None:
+                self.frames_leidos += 1
+            return frame
         return None
 
+    def estadisticas(self):
+        return {
+            "leidos": self.frames_leidos,
+            "descartados": self.frames_descartados,
+            "fallos_lectura": self.fallos_lectura,
+            "secuencia": self._secuencia,
+        }
+
     def detener(self):
         """Detiene la captura"""
+        if self._hilo is not None:
+            self._activo = False
+            with self._cond:
+                self._cond.notify_all()
+            self._hilo.join(timeout=1.0)
+            self._hilo = None
         if self.captura:
             self.captura.release()
-            self.captura = None
\ No newline at end of file
+            self.captura = None
+        self._imagenes = None
+        self._anillo = None
+        self._fijados = None
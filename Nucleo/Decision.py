@@ -0,0 +1,72 @@
+# Nucleo/Decision.py
+
+import math
+
+PERMITIDO = "PERMITIDO"
+DENEGADO = "DENEGADO"
+
+
+class MotorDecision:
+    """
+    Decisión de acceso por pista con una prueba secuencial de razón de verosimilitud (SPRT).
+
+    Cada embedding de una pista aporta la distancia coseno d a su mejor candidato. Se modela
+    d ~ N(media_genuino, sigma) si es la persona y d ~ N(media_impostor, sigma) si no lo es;
+    el logaritmo de la razón de verosimilitud de la observación se acumula:
+
+      - por identidad: a favor de la identidad nombrada, en contra de las demás;
+      - en total: evidencia de que el rostro es de alguien registrado.
+
+    Se concede el acceso en cuanto una identidad supera log((1 - beta) / alfa) y se deniega
+    cuando la evidencia total cae bajo log(beta / (1 - alfa)) o tras max_observaciones sin
+    decidir. alfa es la tasa de aceptaciones falsas tolerada y beta la de rechazos falsos.
+    Una pista decidida deja de pedir embeddings (ver SeguidorRostros).
+
+    No guarda estado propio: todo vive en las pistas, así que una instancia puede compartirse
+    entre seguidores (p. ej. una por cámara en GestorCamaras).
+    """
+
+    def __init__(self, media_genuino=0.25, media_impostor=0.65, sigma=0.12, alfa=0.01, beta=0.05,
+                 max_observaciones=10):
+        self.media_genuino = media_genuino
+        self.media_impostor = media_impostor
+        self.sigma = sigma
+        self.umbral_aceptar = math.log((1.0 - beta) / alfa)
+        self.umbral_rechazar = math.log(beta / (1.0 - alfa))
+        self.max_observaciones = max_observaciones
+
+    def razon(self, distancia):
+        """log p(d | genuino) - log p(d | impostor) con varianzas iguales."""
+        g = distancia - self.media_genuino
+        i = distancia - self.media_impostor
+        return (i * i - g * g) / (2.0 * self.sigma * self.sigma)
+
+    def observar(self, pista, nombre, distancia):
+        """Incorpora a la pista el resultado de un embedding. Devuelve la decisión (o None si sigue abierta)."""
+        if pista.decision is not None or distancia is None:
+            return pista.decision
+        llr = self.razon(float(distancia))
+        pista.observaciones += 1
+        pista.evidencia_total += llr
+        conocido = nombre != "Desconocido"
+        for candidato in pista.evidencia:
+            if candidato != nombre:
+                # Evidencia de que es otra persona (o nadie) cuenta en contra de este candidato
+                pista.evidencia[candidato] -= abs(llr) if conocido else max(0.0, -llr)
+        if conocido:
+            pista.evidencia[nombre] = pista.evidencia.get(nombre, 0.0) + llr
+
+        if conocido and pista.evidencia[nombre] >= self.umbral_aceptar:
+            pista.decision, pista.identidad = PERMITIDO, nombre
+        elif pista.evidencia_total <= self.umbral_rechazar or pista.observaciones >= self.max_observaciones:
+            pista.decision, pista.identidad = DENEGADO, "Desconocido"
+        return pista.decision
+
+    @staticmethod
+    def reiniciar(pista):
+        """Descarta la evidencia de una pista (p. ej. si su apariencia cambió de golpe)."""
+        pista.evidencia = {}
+        pista.evidencia_total = 0.0
+        pista.observaciones = 0
+        pista.decision = None
+        pista.identidad = None
@@ -0,0 +1,251 @@
+# Nucleo/Detectores.py
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Modelos que no vienen con opencv-python (LBP, SSD, YuNet): se buscan aquí por defecto
+RUTA_MODELOS = os.path.join(PROJECT_ROOT, "Recursos", "modelos")
+
+
+class DetectorRostros:
+    """
+    Interfaz común de los detectores de rostros.
+    detectar() recibe un frame BGR (uint8) y devuelve una lista de cajas (x, y, w, h) en
+    coordenadas del frame. gray es opcional: si el llamador ya tiene la conversión a gris
+    se reutiliza en lugar de recalcularla.
+    """
+
+    nombre = "base"
+    usa_gris = False  # True si detectar() trabaja sobre la imagen en gris
+
+    def __init__(self, tam_minimo=60):
+        self.tam_minimo = int(tam_minimo)
+
+    def detectar(self, frame_bgr, gray=None, tam_minimo=None):
+        raise NotImplementedError
+
+    @staticmethod
+    def _gris(frame_bgr, gray):
+        if gray is not None:
+            return gray
+        if frame_bgr.ndim == 2:
+            return frame_bgr
+        return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+
+    @staticmethod
+    def _filtrar(cajas, ancho, alto, tam_minimo):
+        """Recorta las cajas al frame y descarta las menores que tam_minimo."""
+        salida = []
+        for x, y, w, h in cajas:
+            x0, y0 = max(0, int(x)), max(0, int(y))
+            x1, y1 = min(ancho, int(x + w)), min(alto, int(y + h))
+            if x1 - x0 >= tam_minimo and y1 - y0 >= tam_minimo:
+                salida.append((x0, y0, x1 - x0, y1 - y0))
+        return salida
+
+
+class DetectorCascada(DetectorRostros):
+    """Clasificador en cascada de OpenCV (Haar o LBP) con detectMultiScale."""
+
+    nombre = "cascada"
+    usa_gris = True
+
+    def __init__(self, ruta_modelo, factor_escala=1.1, vecinos_minimos=5, tam_minimo=60):
+        super().__init__(tam_minimo)
+        if not os.path.exists(ruta_modelo):
+            raise FileNotFoundError(f"No se encontró el modelo del detector: {ruta_modelo}")
+        self.clasificador = cv2.CascadeClassifier(ruta_modelo)
+        if self.clasificador.empty():
+            raise ValueError(f"No se pudo cargar la cascada: {ruta_modelo}")
+        self.factor_escala = factor_escala
+        self.vecinos_minimos = vecinos_minimos
+
+    def detectar(self, frame_bgr, gray=None, tam_minimo=None):
+        tam = self.tam_minimo if tam_minimo is None else int(tam_minimo)
+        rects = self.clasificador.detectMultiScale(
+            self._gris(frame_bgr, gray), scaleFactor=self.factor_escala,
+            minNeighbors=self.vecinos_minimos, minSize=(tam, tam),
+        )
+        return [tuple(int(v) for v in r) for r in rects]
+
+
+class DetectorHaar(DetectorCascada):
+    nombre = "haar"
+
+    def __init__(self, ruta_modelo=None, **opciones):
+        super().__init__(ruta_modelo or cv2.data.haarcascades + "haarcascade_frontalface_default.xml", **opciones)
+
+
+class DetectorLBP(DetectorCascada):
+    """Cascada LBP: menos precisa que Haar pero varias veces más rápida en CPU."""
+
+    nombre = "lbp"
+
+    def __init__(self, ruta_modelo=None, **opciones):
+        super().__init__(ruta_modelo or os.path.join(RUTA_MODELOS, "lbpcascade_frontalface_improved.xml"), **opciones)
+
+
+class DetectorSSD(DetectorRostros):
+    """
+    Red ResNet-10 SSD de OpenCV (res10_300x300_ssd_iter_140000.caffemodel + deploy.prototxt),
+    ejecutada con el módulo dnn en CPU.
+    """
+
+    nombre = "ssd"
+
+    def __init__(self, ruta_prototxt=None, ruta_pesos=None, confianza=0.6, tam_entrada=300, tam_minimo=60):
+        super().__init__(tam_minimo)
+        ruta_prototxt = ruta_prototxt or os.path.join(RUTA_MODELOS, "deploy.prototxt")
+        ruta_pesos = ruta_pesos or os.path.join(RUTA_MODELOS, "res10_300x300_ssd_iter_140000.caffemodel")
+        for ruta in (ruta_prototxt, ruta_pesos):
+            if not os.path.exists(ruta):
+                raise FileNotFoundError(f"No se encontró el modelo del detector: {ruta}")
+        self.red = cv2.dnn.readNetFromCaffe(ruta_prototxt, ruta_pesos)
+        self.red.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.red.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confianza = confianza
+        self.tam_entrada = int(tam_entrada)
+
+    def detectar(self, frame_bgr, gray=None, tam_minimo=None):
+        if frame_bgr.ndim == 2:
+            frame_bgr = cv2.cvtColor(frame_bgr, cv2.COLOR_GRAY2BGR)
+        alto, ancho = frame_bgr.shape[:2]
+        blob = cv2.dnn.blobFromImage(frame_bgr, 1.0, (self.tam_entrada, self.tam_entrada), (104.0, 177.0, 123.0))
+        self.red.setInput(blob)
+        salida = self.red.forward()[0, 0]          # (N, 7): _, clase, confianza, x0, y0, x1, y1
+        salida = salida[salida[:, 2] >= self.confianza]
+        escala = np.array([ancho, alto, ancho, alto], dtype=np.float32)
+        cajas = []
+        for x0, y0, x1, y1 in salida[:, 3:7] * escala:
+            cajas.append((x0, y0, x1 - x0, y1 - y0))
+        return self._filtrar(cajas, ancho, alto, self.tam_minimo if tam_minimo is None else int(tam_minimo))
+
+
+class DetectorYuNet(DetectorRostros):
+    """YuNet (face_detection_yunet_*.onnx) con cv2.FaceDetectorYN (OpenCV >= 4.5.4), en CPU."""
+
+    nombre = "yunet"
+
+    def __init__(self, ruta_modelo=None, confianza=0.8, umbral_nms=0.3, tam_minimo=60):
+        super().__init__(tam_minimo)
+        ruta_modelo = ruta_modelo or os.path.join(RUTA_MODELOS, "face_detection_yunet_2023mar.onnx")
+        if not os.path.exists(ruta_modelo):
+            raise FileNotFoundError(f"No se encontró el modelo del detector: {ruta_modelo}")
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError("YuNet requiere OpenCV >= 4.5.4 (cv2.FaceDetectorYN)")
+        self.red = cv2.FaceDetectorYN.create(ruta_modelo, "", (320, 320), confianza, umbral_nms)
+        self._tam = None
+
+    def detectar(self, frame_bgr, gray=None, tam_minimo=None):
+        if frame_bgr.ndim == 2:
+            frame_bgr = cv2.cvtColor(frame_bgr, cv2.COLOR_GRAY2BGR)
+        alto, ancho = frame_bgr.shape[:2]
+        if self._tam != (ancho, alto):
+            self.red.setInputSize((ancho, alto))
+            self._tam = (ancho, alto)
+        _, caras = self.red.detect(frame_bgr)
+        if caras is None:
+            return []
+        return self._filtrar(caras[:, :4], ancho, alto, self.tam_minimo if tam_minimo is None else int(tam_minimo))
+
+
+class DetectorMultiresolucion(DetectorRostros):
+    """
+    Envuelve otro detector para buscar sobre una imagen reducida y/o recortada y devolver
+    las cajas en coordenadas del frame original (el embedding se recorta a resolución completa).
+
+      escala: factor de reducción antes de detectar (0.5 = la mitad de ancho y alto).
+      roi: (x, y, w, h) fija donde buscar; None = todo el frame.
+      adaptativo: buscar sólo en una región alrededor de los últimos rostros (ampliada
+                  en `margen` veces su tamaño), con un barrido completo cada
+                  `barrido_completo_cada` frames o en cuanto la región no da resultados.
+
+    Guarda estado entre frames: usar una instancia por flujo de video.
+    No pide el gris del frame completo: convierte sólo la región que explora.
+    """
+
+    nombre = "multiresolucion"
+
+    def __init__(self, base, escala=0.5, roi=None, adaptativo=False, margen=0.5,
+                 barrido_completo_cada=10, tam_minimo=None):
+        super().__init__(base.tam_minimo if tam_minimo is None else tam_minimo)
+        self.base = base
+        self.escala = float(escala)
+        self.roi = roi
+        self.adaptativo = adaptativo
+        self.margen = margen
+        self.barrido_completo_cada = max(1, int(barrido_completo_cada))
+        self._ultimas = []
+        self._desde_completo = 0
+        self._lock = threading.Lock()
+
+    def reiniciar(self):
+        with self._lock:
+            self._ultimas = []
+            self._desde_completo = 0
+
+    def _region(self, ancho, alto):
+        """Región (x0, y0, x1, y1) a explorar en este frame y si es un barrido completo."""
+        x0, y0, x1, y1 = 0, 0, ancho, alto
+        if self.roi is not None:
+            rx, ry, rw, rh = self.roi
+            x0, y0, x1, y1 = max(0, rx), max(0, ry), min(ancho, rx + rw), min(alto, ry + rh)
+        if not self.adaptativo or not self._ultimas or self._desde_completo >= self.barrido_completo_cada:
+            return (x0, y0, x1, y1), True
+        cajas = np.asarray(self._ultimas, dtype=np.float32)
+        extra = self.margen * np.maximum(cajas[:, 2], cajas[:, 3])
+        ax0 = int(np.min(cajas[:, 0] - extra))
+        ay0 = int(np.min(cajas[:, 1] - extra))
+        ax1 = int(np.max(cajas[:, 0] + cajas[:, 2] + extra))
+        ay1 = int(np.max(cajas[:, 1] + cajas[:, 3] + extra))
+        return (max(x0, ax0), max(y0, ay0), min(x1, ax1), min(y1, ay1)), False
+
+    def detectar(self, frame_bgr, gray=None, tam_minimo=None):
+        tam = self.tam_minimo if tam_minimo is None else int(tam_minimo)
+        alto, ancho = frame_bgr.shape[:2]
+        with self._lock:
+            (x0, y0, x1, y1), completo = self._region(ancho, alto)
+            if x1 - x0 < tam or y1 - y0 < tam:
+                (x0, y0, x1, y1), completo = (0, 0, ancho, alto), True
+
+            # Recortar es una vista; sólo el redimensionado crea una imagen nueva (pequeña)
+            recorte = frame_bgr[y0:y1, x0:x1]
+            if isinstance(self.base, DetectorCascada):
+                # Las cascadas sólo usan el gris: convertir el recorte, no el frame entero
+                recorte = self._gris(recorte, gray[y0:y1, x0:x1] if gray is not None else None)
+            if self.escala != 1.0:
+                destino = (max(1, int((x1 - x0) * self.escala)), max(1, int((y1 - y0) * self.escala)))
+                recorte = cv2.resize(recorte, destino, interpolation=cv2.INTER_AREA)
+            recorte_gris = recorte if recorte.ndim == 2 else None
+
+            reducidas = self.base.detectar(recorte, recorte_gris, tam_minimo=max(8, int(tam * self.escala)))
+            cajas = [
+                (int(x / self.escala) + x0, int(y / self.escala) + y0, int(w / self.escala), int(h / self.escala))
+                for x, y, w, h in reducidas
+            ]
+            cajas = self._filtrar(cajas, ancho, alto, tam)
+
+            self._ultimas = cajas
+            # Región adaptativa vacía: forzar un barrido completo en el próximo frame
+            self._desde_completo = 0 if completo else (
+                self._desde_completo + 1 if cajas else self.barrido_completo_cada)
+            return cajas
+
+
+DETECTORES = {
+    DetectorHaar.nombre: DetectorHaar,
+    DetectorLBP.nombre: DetectorLBP,
+    DetectorSSD.nombre: DetectorSSD,
+    DetectorYuNet.nombre: DetectorYuNet,
+}
+
+
+def crear_detector(nombre="haar", **opciones):
+    """Crea un detector por nombre ("haar", "lbp", "ssd" o "yunet")."""
+    if nombre not in DETECTORES:
+        raise ValueError(f"Detector desconocido: {nombre}. Opciones: {', '.join(DETECTORES)}")
+    return DETECTORES[nombre](**opciones)
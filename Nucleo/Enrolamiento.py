@@ -0,0 +1,233 @@
+# Nucleo/Enrolamiento.py
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+EXTENSIONES_IMAGEN = (".png", ".jpg", ".jpeg")
+
+
+def hash_archivo(ruta, tam_bloque=1 << 20):
+    """sha256 del contenido del archivo (independiente del nombre o la ubicación)."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def listar_imagenes(carpeta):
+    """Lista (id_persona, ruta) de carpeta/persona/imagen.*, en orden estable."""
+    pares = []
+    for persona in sorted(os.listdir(carpeta)):
+        ruta_persona = os.path.join(carpeta, persona)
+        if not os.path.isdir(ruta_persona):
+            continue
+        for fname in sorted(os.listdir(ruta_persona)):
+            if fname.lower().endswith(EXTENSIONES_IMAGEN):
+                pares.append((persona, os.path.join(ruta_persona, fname)))
+    return pares
+
+
+# --------------------
+# Trabajo en los procesos hijos
+# --------------------
+_modelo_trabajador = None
+
+
+def _iniciar_trabajador(modelo):
+    """Se ejecuta una vez por proceso: construye el modelo, que DeepFace deja en caché."""
+    global _modelo_trabajador
+    from deepface import DeepFace
+
+    DeepFace.build_model(modelo)
+    _modelo_trabajador = modelo
+
+
+def _embeber_imagen(tarea):
+    """
+    tarea: (persona, ruta, hash). Decodifica y embebe una imagen.
+    Devuelve (persona, ruta, hash, embedding | None, error | None).
+    """
+    import cv2
+    from deepface import DeepFace
+
+    persona, ruta, hash_ = tarea
+    try:
+        # imdecode en lugar de imread: admite rutas con caracteres no ASCII en Windows
+        imagen = cv2.imdecode(np.fromfile(ruta, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if imagen is None:
+            return persona, ruta, hash_, None, "no se pudo decodificar la imagen"
+        # enforce_detection=True para asegurar que haya un rostro claro en las imágenes de entrenamiento
+        rep = DeepFace.represent(imagen, model_name=_modelo_trabajador, enforce_detection=True)
+        if isinstance(rep, list) and len(rep) > 0:
+            return persona, ruta, hash_, np.asarray(rep[0]["embedding"], dtype=np.float32), None
+        return persona, ruta, hash_, None, "sin rostro"
+    except Exception as e:
+        return persona, ruta, hash_, None, str(e)
+
+
+# --------------------
+# Registro de imágenes ya enroladas
+# --------------------
+class RegistroEnrolados:
+    """
+    Hashes de las imágenes ya embebidas (una línea JSON por imagen, sólo anexado).
+    Permite reanudar un enrolamiento interrumpido sin volver a embeber nada.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._hashes = set()
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        self._hashes.add(json.loads(linea)["hash"])
+                    except (ValueError, KeyError):
+                        continue  # línea truncada por un corte
+
+    def __contains__(self, hash_):
+        return hash_ in self._hashes
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def anotar(self, entradas):
+        """entradas: lista de (hash, persona, ruta)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            for hash_, persona, ruta in entradas:
+                f.write(json.dumps({"hash": hash_, "id": persona, "ruta": ruta}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._hashes.update(h for h, _, _ in entradas)
+
+
+class EnrolamientoMasivo:
+    """
+    Enrolamiento de carpeta/persona/imagen.jpg en paralelo.
+
+    La decodificación y el embedding se reparten en un pool de procesos (el modelo se carga
+    una vez por proceso). Los resultados se entregan por bloques a al_bloque(ids, nombres,
+    vectores) y, una vez guardados, sus hashes se anotan en el registro de enrolados; al
+    volver a ejecutar se omiten las imágenes cuyo contenido ya se embebió.
+    Con una CacheEmbeddings, las imágenes pendientes ya embebidas alguna vez (p. ej. antes
+    de borrar el repositorio) se toman de la caché sin pasar por el pool.
+    """
+
+    def __init__(self, modelo="Facenet", procesos=None, tam_bloque=64, ruta_registro=None, cache=None):
+        self.modelo = modelo
+        self.cache = cache
+        self.procesos = max(1, procesos or (os.cpu_count() or 2) - 1)
+        self.tam_bloque = max(1, int(tam_bloque))
+        self.registro = RegistroEnrolados(ruta_registro) if ruta_registro else None
+
+    def _pendientes(self, pares):
+        tareas, omitidas = [], 0
+        for persona, ruta in pares:
+            try:
+                hash_ = hash_archivo(ruta)
+            except OSError as e:
+                print(f"⚠️ Omitida imagen {ruta}: {e}")
+                continue
+            if self.registro is not None and hash_ in self.registro:
+                omitidas += 1
+                continue
+            tareas.append((persona, ruta, hash_))
+        return tareas, omitidas
+
+    def ejecutar(self, carpeta, al_bloque):
+        """
+        Enrola todas las imágenes nuevas de la carpeta. Devuelve un dict con
+        embebidas, fallidas, omitidas (ya enroladas), segundos e imagenes_por_segundo.
+        """
+        tareas, omitidas = self._pendientes(listar_imagenes(carpeta))
+        total = len(tareas)
+        print(f"📂 {total} imágenes por embeber ({omitidas} ya enroladas) con {self.procesos} procesos")
+
+        embebidas = fallidas = 0
+        bloque = []
+        nuevos_cache = []
+        inicio = time.perf_counter()
+
+        if self.cache is not None:
+            por_embeber = []
+            for persona, ruta, hash_ in tareas:
+                emb = self.cache.obtener(hash_, self.modelo)
+                if emb is None:
+                    por_embeber.append((persona, ruta, hash_))
+                else:
+                    embebidas += 1
+                    bloque.append((persona, ruta, hash_, emb))
+            # Los ultimo_uso de los aciertos se escriben juntos, no uno por imagen
+            self.cache.sincronizar()
+            if embebidas:
+                print(f"🗃️ {embebidas} embeddings tomados de la caché")
+            tareas = por_embeber
+
+        def vaciar():
+            if not bloque:
+                return
+            al_bloque([p for p, _, _, _ in bloque], [p for p, _, _, _ in bloque],
+                      np.stack([e for _, _, _, e in bloque]))
+            if self.registro is not None:
+                self.registro.anotar([(h, p, r) for p, r, h, _ in bloque])
+            if self.cache is not None:
+                self.cache.guardar_lote(nuevos_cache)
+            bloque.clear()
+            nuevos_cache.clear()
+
+        if tareas:
+            # "spawn": no heredar el estado de TensorFlow del proceso padre
+            contexto = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.procesos, mp_context=contexto,
+                                     initializer=_iniciar_trabajador, initargs=(self.modelo,)) as pool:
+                # Ventana acotada de tareas en vuelo para no encolar miles de futuros
+                restantes = iter(tareas)
+                en_vuelo = set()
+                for tarea in restantes:
+                    en_vuelo.add(pool.submit(_embeber_imagen, tarea))
+                    if len(en_vuelo) >= 4 * self.procesos:
+                        break
+                while en_vuelo:
+                    hechos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for futuro in hechos:
+                        persona, ruta, hash_, emb, error = futuro.result()
+                        if emb is None:
+                            fallidas += 1
+                            print(f"⚠️ Omitida imagen {ruta}: {error}")
+                        else:
+                            embebidas += 1
+                            bloque.append((persona, ruta, hash_, emb))
+                            nuevos_cache.append((hash_, self.modelo, emb))
+                        siguiente = next(restantes, None)
+                        if siguiente is not None:
+                            en_vuelo.add(pool.submit(_embeber_imagen, siguiente))
+                    if len(bloque) >= self.tam_bloque:
+                        vaciar()
+                        self._progreso(embebidas + fallidas, total, inicio)
+        vaciar()
+        if total:
+            self._progreso(embebidas + fallidas, total, inicio)
+
+        segundos = time.perf_counter() - inicio
+        return {
+            "embebidas": embebidas,
+            "fallidas": fallidas,
+            "omitidas": omitidas,
+            "segundos": segundos,
+            "imagenes_por_segundo": (embebidas + fallidas) / segundos if segundos > 0 else 0.0,
+        }
+
+    @staticmethod
+    def _progreso(hechas, total, inicio):
+        transcurrido = time.perf_counter() - inicio
+        ritmo = hechas / transcurrido if transcurrido > 0 else 0.0
+        restante = (total - hechas) / ritmo if ritmo > 0 else 0.0
+        print(f"⏳ {hechas}/{total} imágenes ({ritmo:.1f} img/s, ~{restante:.0f} s restantes)")
@@ -0,0 +1,399 @@
+# Nucleo/Galeria.py
+
+import mmap
+
+import numpy as np
+
+
+def _soltar_paginas(matriz):
+    """Con un np.memmap, devuelve al sistema las páginas ya leídas (se releen del archivo si hacen falta)."""
+    mapa = getattr(matriz, "_mmap", None)
+    if mapa is not None and hasattr(mapa, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        try:
+            mapa.madvise(mmap.MADV_DONTNEED)
+        except (OSError, ValueError):
+            pass
+
+
+class GaleriaVectores:
+    """
+    Galería de plantillas faciales en una sola matriz float32 contigua.
+    Cada fila se guarda ya normalizada (norma L2 = 1), de modo que la distancia
+    coseno contra un lote de consultas se resuelve con un único producto matricial.
+    Los nombres y los ids de usuario se mantienen en arreglos paralelos (misma fila = misma persona).
+
+    Opcionalmente la búsqueda se delega a un índice (ver Nucleo/Indices.py), por ejemplo
+    IVF para galerías muy grandes o prototipos por persona; el índice usa el número de fila como id.
+
+    Con un índice que declara filas_bajo_demanda (el cuantizado) la galería no guarda copia
+    float32: cada fila es un número de fila de la matriz adoptada (el np.memmap del
+    repositorio) o de una cola en memoria con las altas posteriores, y sólo se leen las
+    filas candidatas a reordenar. Borrar compacta esos números, no la matriz.
+    """
+
+    def __init__(self, dimension=None, capacidad_inicial=64, indice=None):
+        self.dimension = dimension
+        self._n = 0
+        self._matriz = None
+        self._nombres = np.empty(0, dtype=object)
+        self._ids = np.empty(0, dtype=object)
+        self._capacidad_inicial = max(1, int(capacidad_inicial))
+        # Filas bajo demanda: fila lógica -> fila de _matriz (sólo lectura) o, pasado su
+        # final, de _cola (altas en memoria). None cuando la galería guarda su propia matriz.
+        self._filas = None
+        self._cola = None
+        self._n_cola = 0
+        self.indice = indice
+        if self._bajo_demanda(indice):
+            self._filas = np.empty(0, dtype=np.int64)
+
+    # --------------------
+    # Utilidades
+    # --------------------
+    @staticmethod
+    def normalizar(vectores):
+        """Devuelve una copia float32 (N, D) con cada fila normalizada a norma 1."""
+        v = np.asarray(vectores, dtype=np.float32)
+        if v.ndim == 1:
+            v = v[np.newaxis, :]
+        normas = np.linalg.norm(v, axis=1, keepdims=True)
+        return v / np.maximum(normas, 1e-10)
+
+    @staticmethod
+    def _bajo_demanda(indice):
+        return indice is not None and getattr(indice, "filas_bajo_demanda", False)
+
+    def _asegurar_escritura(self):
+        """Si la matriz es de sólo lectura (p. ej. np.memmap adoptado), pasarla a memoria propia."""
+        if self._matriz is not None and not self._matriz.flags.writeable:
+            self._matriz = np.array(self._matriz, dtype=np.float32)
+
+    def _reservar(self, n_nuevos):
+        """Asegura capacidad para n_nuevos filas más (crecimiento geométrico)."""
+        requerido = self._n + n_nuevos
+        if self._matriz is not None and requerido <= self._matriz.shape[0]:
+            self._asegurar_escritura()
+            return
+        capacidad = self._capacidad_inicial if self._matriz is None else self._matriz.shape[0]
+        while capacidad < requerido:
+            capacidad *= 2
+        nueva = np.empty((capacidad, self.dimension), dtype=np.float32)
+        nombres = np.empty(capacidad, dtype=object)
+        ids = np.empty(capacidad, dtype=object)
+        if self._matriz is not None and self._n > 0:
+            nueva[:self._n] = self._matriz[:self._n]
+            nombres[:self._n] = self._nombres[:self._n]
+            ids[:self._n] = self._ids[:self._n]
+        self._matriz = nueva
+        self._nombres = nombres
+        self._ids = ids
+
+    def _reservar_filas(self, n_nuevos):
+        """Como _reservar(), pero con filas bajo demanda: crecen la cola y los números de fila."""
+        requerido = self._n + n_nuevos
+        if requerido > len(self._filas):
+            capacidad = max(self._capacidad_inicial, requerido, 2 * len(self._filas))
+            filas = np.empty(capacidad, dtype=np.int64)
+            nombres = np.empty(capacidad, dtype=object)
+            ids = np.empty(capacidad, dtype=object)
+            filas[:self._n] = self._filas[:self._n]
+            nombres[:self._n] = self._nombres[:self._n]
+            ids[:self._n] = self._ids[:self._n]
+            self._filas, self._nombres, self._ids = filas, nombres, ids
+        requerido_cola = self._n_cola + n_nuevos
+        if self._cola is None or requerido_cola > self._cola.shape[0]:
+            capacidad = max(self._capacidad_inicial, requerido_cola, 2 * (0 if self._cola is None else self._cola.shape[0]))
+            cola = np.empty((capacidad, self.dimension), dtype=np.float32)
+            if self._n_cola:
+                cola[:self._n_cola] = self._cola[:self._n_cola]
+            self._cola = cola
+
+    def _vectores(self, filas):
+        """Plantillas (len(filas), D) de esas filas lógicas; de la matriz adoptada sólo se leen esas."""
+        fisicas = self._filas[np.asarray(filas, dtype=np.int64)]
+        salida = np.empty((len(fisicas), self.dimension or 0), dtype=np.float32)
+        n_base = 0 if self._matriz is None else len(self._matriz)
+        en_base = fisicas < n_base
+        if np.any(en_base):
+            salida[en_base] = self._matriz[fisicas[en_base]]
+        if not np.all(en_base):
+            salida[~en_base] = self._cola[fisicas[~en_base] - n_base]
+        return salida
+
+    def _pasar_a_demanda(self):
+        """La matriz actual pasa a ser la base de sólo lectura, sin copiarla."""
+        if self._filas is not None:
+            return
+        self._matriz = None if self._matriz is None else self._matriz[:self._n]
+        self._filas = np.arange(self._n, dtype=np.int64)
+        self._cola, self._n_cola = None, 0
+        self._nombres = self._nombres[:self._n]
+        self._ids = self._ids[:self._n]
+
+    def _salir_de_demanda(self):
+        """Vuelve a una matriz propia contigua (la búsqueda exacta la recorre entera)."""
+        if self._filas is None:
+            return
+        identidad = (self._n_cola == 0 and self._matriz is not None and self._n == len(self._matriz)
+                     and np.array_equal(self._filas[:self._n], np.arange(self._n)))
+        if not identidad:
+            self._matriz = self._vectores(np.arange(self._n)) if self._n else None
+        self._filas = None
+        self._cola, self._n_cola = None, 0
+
+    # --------------------
+    # Consulta del contenido
+    # --------------------
+    def __len__(self):
+        return self._n
+
+    @property
+    def matriz(self):
+        """
+        Vista (N, D) de las plantillas normalizadas (sin copia). Con filas bajo demanda es
+        una copia de todas las filas: para contar plantillas usar len(galeria).
+        """
+        if self._filas is not None:
+            return self._vectores(np.arange(self._n))
+        if self._matriz is None:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._matriz[:self._n]
+
+    def bytes_residentes(self):
+        """
+        Bytes en memoria de las plantillas y del índice: la matriz float32 si es propia (un
+        np.memmap no cuenta), la cola de altas, los números de fila y lo que declare el índice.
+        """
+        total = 0
+        if self._matriz is not None and not isinstance(self._matriz, np.memmap):
+            total += self._matriz.nbytes
+        if self._cola is not None:
+            total += self._cola.nbytes
+        if self._filas is not None:
+            total += self._filas.nbytes
+        if self.indice is not None:
+            total += getattr(self.indice, "bytes_residentes", 0)
+        return total
+
+    @property
+    def nombres(self):
+        """Vista (N,) de los nombres asociados a cada fila."""
+        return self._nombres[:self._n]
+
+    @property
+    def ids(self):
+        """Vista (N,) de los ids de usuario de cada fila."""
+        return self._ids[:self._n]
+
+    # --------------------
+    # Actualización incremental
+    # --------------------
+    def agregar(self, vectores, nombres, ids=None):
+        """
+        Añade una o varias plantillas. vectores: (D,) o (N, D); nombres: str o lista de N.
+        ids: id de usuario por fila (por defecto, el nombre).
+        Coste amortizado O(N·D): no se recalcula nada de lo ya almacenado.
+        """
+        v = self.normalizar(vectores)
+        if isinstance(nombres, str):
+            nombres = [nombres] * v.shape[0]
+        if ids is None:
+            ids = nombres
+        elif isinstance(ids, str):
+            ids = [ids] * v.shape[0]
+        if len(nombres) != v.shape[0] or len(ids) != v.shape[0]:
+            raise ValueError("La cantidad de nombres no coincide con la de vectores")
+        if self.dimension is None:
+            self.dimension = v.shape[1]
+        elif v.shape[1] != self.dimension:
+            raise ValueError(f"Dimensión {v.shape[1]} distinta a la de la galería ({self.dimension})")
+
+        if self._filas is not None:
+            self._reservar_filas(v.shape[0])
+            self._cola[self._n_cola:self._n_cola + v.shape[0]] = v
+            n_base = 0 if self._matriz is None else len(self._matriz)
+            self._filas[self._n:self._n + v.shape[0]] = n_base + self._n_cola + np.arange(v.shape[0])
+            self._n_cola += v.shape[0]
+        else:
+            self._reservar(v.shape[0])
+            self._matriz[self._n:self._n + v.shape[0]] = v
+        self._nombres[self._n:self._n + v.shape[0]] = list(nombres)
+        self._ids[self._n:self._n + v.shape[0]] = list(ids)
+        if self.indice is not None:
+            filas = np.arange(self._n, self._n + v.shape[0])
+            if getattr(self.indice, "por_identidad", False):
+                self.indice.agregar(v, filas, etiquetas=list(ids))
+            else:
+                self.indice.agregar(v, filas)
+        self._n += v.shape[0]
+
+    def adoptar(self, matriz, nombres, ids=None, filas=None):
+        """
+        Reemplaza el contenido por una matriz ya normalizada sin copiarla (admite np.memmap
+        de sólo lectura). filas: qué filas de la matriz forman la galería (por defecto todas).
+        La primera modificación posterior la copia a memoria, salvo con filas bajo demanda:
+        entonces la matriz no se copia nunca.
+        """
+        if ids is None:
+            ids = nombres
+        n = len(matriz) if filas is None else len(filas)
+        if len(nombres) != n or len(ids) != n:
+            raise ValueError("La cantidad de nombres no coincide con la de vectores")
+        self._n = n
+        if self._bajo_demanda(self.indice):
+            self._matriz = matriz
+            self._filas = np.arange(n, dtype=np.int64) if filas is None else np.asarray(filas, dtype=np.int64)
+            self._cola, self._n_cola = None, 0
+        else:
+            self._filas, self._cola, self._n_cola = None, None, 0
+            self._matriz = matriz if filas is None else np.asarray(matriz[np.asarray(filas, dtype=np.int64)])
+        self._nombres = np.empty(self._n, dtype=object)
+        self._nombres[:] = list(nombres)
+        self._ids = np.empty(self._n, dtype=object)
+        self._ids[:] = list(ids)
+        if matriz.ndim == 2 and matriz.shape[1]:
+            self.dimension = matriz.shape[1]
+        self.reconstruir_indice()
+
+    def eliminar(self, nombre):
+        """
+        Elimina todas las plantillas de una persona compactando la matriz en sitio.
+        Devuelve la cantidad de filas eliminadas.
+        """
+        if self._n == 0:
+            return 0
+        return self._conservar(self.nombres != nombre)
+
+    def eliminar_usuario(self, id_usuario):
+        """Como eliminar(), pero por id de usuario."""
+        if self._n == 0:
+            return 0
+        return self._conservar(self.ids != id_usuario)
+
+    def _conservar(self, conservar):
+        n_conservar = int(np.count_nonzero(conservar))
+        eliminadas = self._n - n_conservar
+        if eliminadas:
+            if self.indice is not None:
+                mapa = np.full(self._n, -1, dtype=np.int64)
+                mapa[conservar] = np.arange(n_conservar)
+                self.indice.reindexar(mapa)
+            if self._filas is not None:
+                # Sólo se compactan los números de fila; la matriz adoptada no se toca
+                self._filas[:n_conservar] = self._filas[:self._n][conservar]
+            else:
+                self._asegurar_escritura()
+                self._matriz[:n_conservar] = self._matriz[:self._n][conservar]
+            self._nombres[:n_conservar] = self._nombres[:self._n][conservar]
+            self._ids[:n_conservar] = self._ids[:self._n][conservar]
+            self._nombres[n_conservar:self._n] = None
+            self._ids[n_conservar:self._n] = None
+            self._n = n_conservar
+        return eliminadas
+
+    def vaciar(self):
+        self._n = 0
+        self._matriz = None
+        self._nombres = np.empty(0, dtype=object)
+        self._ids = np.empty(0, dtype=object)
+        self._cola, self._n_cola = None, 0
+        if self._filas is not None:
+            self._filas = np.empty(0, dtype=np.int64)
+        if self.indice is not None:
+            self.indice.construir(np.empty((0, self.dimension or 0), dtype=np.float32), [])
+
+    # --------------------
+    # Índice de búsqueda
+    # --------------------
+    def usar_indice(self, indice):
+        """Conecta un índice (o None para volver a la búsqueda exacta) y lo construye con la galería actual."""
+        if self._bajo_demanda(indice):
+            self._pasar_a_demanda()
+        else:
+            self._salir_de_demanda()
+        self.indice = indice
+        self.reconstruir_indice()
+
+    def reconstruir_indice(self, bloque=16384):
+        """Reentrena el índice con el contenido actual (p. ej. tras muchas altas en un IVF)."""
+        if self.indice is not None and self._filas is not None:
+            # Filas bajo demanda: construir por bloques, sin reunir nunca la matriz float32
+            self.indice.construir(np.empty((0, self.dimension or 0), dtype=np.float32), [])
+            for inicio in range(0, self._n, bloque):
+                filas = np.arange(inicio, min(self._n, inicio + bloque))
+                self.indice.agregar(self._vectores(filas), filas)
+            _soltar_paginas(self._matriz)
+        elif self.indice is not None:
+            if getattr(self.indice, "por_identidad", False):
+                # Índices por persona (p. ej. prototipos): necesitan el id de usuario de cada fila
+                self.indice.construir(self.matriz, np.arange(self._n), etiquetas=list(self.ids))
+            else:
+                self.indice.construir(self.matriz, np.arange(self._n))
+
+    # --------------------
+    # Búsqueda por lotes
+    # --------------------
+    def buscar(self, consultas, k=1):
+        """
+        Busca las k plantillas más cercanas para cada consulta.
+        consultas: (D,) o (Q, D). Devuelve (indices, distancias), ambos (Q, k),
+        ordenados de menor a mayor distancia coseno (1 - similitud).
+        """
+        q = self.normalizar(consultas)
+        if self._n == 0:
+            vacio = np.empty((q.shape[0], 0))
+            return vacio.astype(np.int64), vacio.astype(np.float32)
+
+        k = max(1, min(int(k), self._n))
+        if self.indice is not None:
+            reordenar = getattr(self.indice, "reordenar", 0)
+            if reordenar:
+                # Índices aproximados (p. ej. cuantizados): reordenar sus candidatos en float32
+                candidatos, _ = self.indice.buscar(q, max(k, reordenar))
+                return self._reordenar(q, candidatos, k)
+            return self.indice.buscar(q, k)
+
+        similitudes = q @ self.matriz.T  # (Q, N)
+
+        if k == 1:
+            indices = np.argmax(similitudes, axis=1)[:, np.newaxis]
+        else:
+            # Selección parcial O(N) y luego orden sólo de los k candidatos
+            parcial = np.argpartition(-similitudes, k - 1, axis=1)[:, :k]
+            orden = np.argsort(-np.take_along_axis(similitudes, parcial, axis=1), axis=1)
+            indices = np.take_along_axis(parcial, orden, axis=1)
+
+        distancias = 1.0 - np.take_along_axis(similitudes, indices, axis=1)
+        return indices, distancias.astype(np.float32)
+
+    def _reordenar(self, q, candidatos, k):
+        """Distancias exactas de los candidatos (Q, C) de un índice y sus k mejores. Sólo lee esas filas."""
+        validos = candidatos >= 0
+        filas = np.where(validos, candidatos, 0)
+        if self._filas is not None:
+            vectores = self._vectores(filas.ravel()).reshape(filas.shape + (-1,))
+        else:
+            vectores = self.matriz[filas]
+        similitudes = np.einsum("qcd,qd->qc", vectores, q)
+        similitudes[~validos] = -np.inf
+        k = min(k, candidatos.shape[1])
+        orden = np.argsort(-similitudes, axis=1)[:, :k]
+        distancias = 1.0 - np.take_along_axis(similitudes, orden, axis=1)
+        indices = np.where(np.isfinite(distancias), np.take_along_axis(filas, orden, axis=1), -1)
+        return indices, distancias.astype(np.float32)
+
+    def identificar(self, consultas, umbral_coseno=0.45, desconocido="Desconocido"):
+        """
+        Devuelve (nombres, distancias) con el mejor candidato por consulta;
+        las consultas sobre el umbral se etiquetan como desconocido.
+        """
+        indices, distancias = self.buscar(consultas, k=1)
+        if indices.shape[1] == 0:
+            q = indices.shape[0]
+            return [desconocido] * q, np.full(q, np.inf, dtype=np.float32)
+        mejores = distancias[:, 0]
+        nombres = [
+            self._nombres[i] if d <= umbral_coseno else desconocido
+            for i, d in zip(indices[:, 0], mejores)
+        ]
+        return nombres, mejores
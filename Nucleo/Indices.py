@@ -0,0 +1,752 @@
+# Nucleo/Indices.py
+
+import numpy as np
+
+
+def _normalizar(v):
+    v = np.asarray(v, dtype=np.float32)
+    if v.ndim == 1:
+        v = v[np.newaxis, :]
+    return v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-10)
+
+
+def _top_k(similitudes, k, por_grupo=64):
+    """
+    Índices (por fila) de las k mayores similitudes, ordenados de mayor a menor.
+
+    Con filas largas no se particiona la fila entera: las columnas se reparten en grupos
+    de `por_grupo` (la columna c va al grupo c % n_grupos) y los k mejores están siempre
+    en los k grupos de mayor máximo, así que sólo se particionan esas k·por_grupo columnas.
+    El máximo por grupo es un máximo elemento a elemento entre tramos (vectorizado), también
+    sobre la vista traspuesta de una matriz (N, Q), donde argmax por filas copiaría todo.
+    """
+    n_consultas, n = similitudes.shape
+    k = min(k, n)
+    if k == 0:
+        return np.empty((n_consultas, 0), dtype=np.int64)
+    if k == 1 and similitudes.flags.c_contiguous:
+        return np.argmax(similitudes, axis=1)[:, np.newaxis]
+    n_grupos = n // por_grupo
+    if n_grupos >= 4 * k:
+        maximos = similitudes[:, :n_grupos * por_grupo].reshape(n_consultas, por_grupo, n_grupos).max(axis=1)
+        grupos = _top_k(maximos, k)
+        columnas = (grupos[:, :, np.newaxis] + n_grupos * np.arange(por_grupo)).reshape(n_consultas, -1)
+        resto = np.arange(n_grupos * por_grupo, n)
+        if len(resto):
+            columnas = np.concatenate([columnas, np.broadcast_to(resto, (n_consultas, len(resto)))], axis=1)
+        candidatas = np.take_along_axis(similitudes, columnas, axis=1)
+        return np.take_along_axis(columnas, _top_k(candidatas, k), axis=1)
+    if k == 1:
+        return np.argmax(similitudes, axis=1)[:, np.newaxis]
+    parcial = np.argpartition(-similitudes, k - 1, axis=1)[:, :k]
+    orden = np.argsort(-np.take_along_axis(similitudes, parcial, axis=1), axis=1)
+    return np.take_along_axis(parcial, orden, axis=1)
+
+
+class IndiceVectores:
+    """
+    Interfaz común de los índices de búsqueda de la galería.
+    Los vectores se identifican con ids enteros (en GaleriaVectores, el número de fila).
+    Las distancias devueltas son distancias coseno (1 - similitud).
+    """
+
+    nombre = "base"
+
+    def construir(self, vectores, ids):
+        raise NotImplementedError
+
+    def agregar(self, vectores, ids):
+        raise NotImplementedError
+
+    def eliminar(self, ids):
+        raise NotImplementedError
+
+    def reindexar(self, mapa):
+        """Renumera los ids: mapa[id_viejo] = id_nuevo, o -1 para eliminarlo."""
+        raise NotImplementedError
+
+    def buscar(self, consultas, k=1):
+        """Devuelve (ids, distancias), ambos (Q, k'), con k' = min(k, tamaño)."""
+        raise NotImplementedError
+
+    def guardar(self, ruta):
+        raise NotImplementedError
+
+    @classmethod
+    def cargar(cls, ruta):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class _AlmacenFilas:
+    """Arreglos (vectores, ids) con crecimiento geométrico y borrado por compactación."""
+
+    def __init__(self):
+        self.n = 0
+        self.vectores = None
+        self.ids = np.empty(0, dtype=np.int64)
+
+    def agregar(self, vectores, ids):
+        vectores = _normalizar(vectores)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        requerido = self.n + len(ids)
+        if self.vectores is None or requerido > self.vectores.shape[0]:
+            capacidad = max(64, requerido, 2 * (0 if self.vectores is None else self.vectores.shape[0]))
+            nuevos = np.empty((capacidad, vectores.shape[1]), dtype=np.float32)
+            nuevos_ids = np.empty(capacidad, dtype=np.int64)
+            if self.n:
+                nuevos[:self.n] = self.vectores[:self.n]
+                nuevos_ids[:self.n] = self.ids[:self.n]
+            self.vectores, self.ids = nuevos, nuevos_ids
+        self.vectores[self.n:requerido] = vectores
+        self.ids[self.n:requerido] = ids
+        self.n = requerido
+
+    def conservar(self, mascara):
+        n = int(np.count_nonzero(mascara))
+        self.vectores[:n] = self.vectores[:self.n][mascara]
+        self.ids[:n] = self.ids[:self.n][mascara]
+        self.n = n
+
+    def vista(self):
+        if self.vectores is None:
+            return np.empty((0, 0), dtype=np.float32), self.ids[:0]
+        return self.vectores[:self.n], self.ids[:self.n]
+
+
+class IndiceExacto(IndiceVectores):
+    """Búsqueda exhaustiva: un producto matricial contra todos los vectores (recall 1.0)."""
+
+    nombre = "exacto"
+
+    def __init__(self):
+        self._filas = _AlmacenFilas()
+
+    def __len__(self):
+        return self._filas.n
+
+    def construir(self, vectores, ids):
+        self._filas = _AlmacenFilas()
+        if len(ids):
+            self._filas.agregar(vectores, ids)
+
+    def agregar(self, vectores, ids):
+        self._filas.agregar(vectores, ids)
+
+    def eliminar(self, ids):
+        _, actuales = self._filas.vista()
+        self._filas.conservar(~np.isin(actuales, np.asarray(ids, dtype=np.int64)))
+
+    def reindexar(self, mapa):
+        _, actuales = self._filas.vista()
+        nuevos = np.asarray(mapa, dtype=np.int64)[actuales]
+        self._filas.ids[:self._filas.n] = nuevos
+        self._filas.conservar(nuevos >= 0)
+
+    def buscar(self, consultas, k=1):
+        q = _normalizar(consultas)
+        vectores, ids = self._filas.vista()
+        if len(ids) == 0:
+            return np.empty((q.shape[0], 0), dtype=np.int64), np.empty((q.shape[0], 0), dtype=np.float32)
+        similitudes = q @ vectores.T
+        mejores = _top_k(similitudes, k)
+        distancias = 1.0 - np.take_along_axis(similitudes, mejores, axis=1)
+        return ids[mejores], distancias.astype(np.float32)
+
+    def guardar(self, ruta):
+        vectores, ids = self._filas.vista()
+        np.savez(ruta, tipo=self.nombre, vectores=vectores, ids=ids)
+
+    @classmethod
+    def cargar(cls, ruta):
+        datos = np.load(ruta, allow_pickle=False)
+        indice = cls()
+        indice.construir(datos["vectores"], datos["ids"])
+        return indice
+
+
+class IndiceIVF(IndiceVectores):
+    """
+    Índice de archivo invertido (IVF): k-means esférico sobre los vectores normalizados
+    como cuantizador grueso; cada consulta sólo compara contra las listas de los n_sondeo
+    centroides más cercanos. Implementado sólo con NumPy, funciona sin conexión.
+    """
+
+    nombre = "ivf"
+
+    def __init__(self, n_listas=None, n_sondeo=8, iteraciones=12, semilla=0):
+        self.n_listas = n_listas
+        self.n_sondeo = n_sondeo
+        self.iteraciones = iteraciones
+        self.semilla = semilla
+        self.centroides = None
+        self._filas = _AlmacenFilas()
+        self._asignacion = np.empty(0, dtype=np.int64)
+        # Filas ordenadas por lista (estilo CSR); se recalculan tras agregar/eliminar
+        self._orden = None
+        self._inicios = None
+
+    def __len__(self):
+        return self._filas.n
+
+    # --------------------
+    # Entrenamiento
+    # --------------------
+    def _kmeans(self, datos, k):
+        rng = np.random.default_rng(self.semilla)
+        # Inicialización k-means++ sobre una muestra para acotar el coste
+        muestra = datos if len(datos) <= 50 * k else datos[rng.choice(len(datos), 50 * k, replace=False)]
+        centroides = np.empty((k, datos.shape[1]), dtype=np.float32)
+        centroides[0] = muestra[rng.integers(len(muestra))]
+        mejor_dist = 1.0 - muestra @ centroides[0]
+        for c in range(1, k):
+            pesos = np.clip(mejor_dist, 0, None)
+            total = pesos.sum()
+            idx = rng.choice(len(muestra), p=pesos / total) if total > 0 else rng.integers(len(muestra))
+            centroides[c] = muestra[idx]
+            mejor_dist = np.minimum(mejor_dist, 1.0 - muestra @ centroides[c])
+
+        for _ in range(self.iteraciones):
+            asignacion = np.argmax(datos @ centroides.T, axis=1)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, datos)
+            conteos = np.bincount(asignacion, minlength=k)
+            vacios = conteos == 0
+            if np.any(vacios):
+                # Reubicar centroides vacíos en puntos aleatorios
+                sumas[vacios] = datos[rng.choice(len(datos), int(vacios.sum()))]
+            centroides = _normalizar(sumas)
+        return centroides
+
+    def construir(self, vectores, ids):
+        vectores = _normalizar(vectores)
+        n = len(vectores)
+        k = self.n_listas or max(1, int(round(4 * np.sqrt(n))))
+        k = max(1, min(k, n))
+        self.centroides = self._kmeans(vectores, k) if n else None
+        self._filas = _AlmacenFilas()
+        self._asignacion = np.empty(0, dtype=np.int64)
+        self._orden = None
+        if n:
+            self.agregar(vectores, ids)
+
+    @property
+    def entrenado(self):
+        return self.centroides is not None
+
+    # --------------------
+    # Actualización
+    # --------------------
+    def agregar(self, vectores, ids):
+        vectores = _normalizar(vectores)
+        self._filas.agregar(vectores, ids)
+        if self.entrenado:
+            nuevas = np.argmax(vectores @ self.centroides.T, axis=1)
+        else:
+            nuevas = np.zeros(len(vectores), dtype=np.int64)
+        self._asignacion = np.concatenate([self._asignacion[:self._filas.n - len(vectores)], nuevas])
+        self._orden = None
+
+    def _conservar(self, mascara):
+        self._filas.conservar(mascara)
+        self._asignacion = self._asignacion[mascara]
+        self._orden = None
+
+    def eliminar(self, ids):
+        _, actuales = self._filas.vista()
+        self._conservar(~np.isin(actuales, np.asarray(ids, dtype=np.int64)))
+
+    def reindexar(self, mapa):
+        _, actuales = self._filas.vista()
+        nuevos = np.asarray(mapa, dtype=np.int64)[actuales]
+        self._filas.ids[:self._filas.n] = nuevos
+        self._conservar(nuevos >= 0)
+
+    def _listas(self):
+        if self._orden is None:
+            self._orden = np.argsort(self._asignacion, kind="stable")
+            k = len(self.centroides) if self.entrenado else 1
+            self._inicios = np.searchsorted(self._asignacion[self._orden], np.arange(k + 1))
+        return self._orden, self._inicios
+
+    # --------------------
+    # Búsqueda
+    # --------------------
+    def buscar(self, consultas, k=1):
+        q = _normalizar(consultas)
+        vectores, ids = self._filas.vista()
+        vacio_ids = np.empty((q.shape[0], 0), dtype=np.int64)
+        if len(ids) == 0:
+            return vacio_ids, np.empty((q.shape[0], 0), dtype=np.float32)
+        if not self.entrenado:
+            similitudes = q @ vectores.T
+            mejores = _top_k(similitudes, k)
+            return ids[mejores], (1.0 - np.take_along_axis(similitudes, mejores, axis=1)).astype(np.float32)
+
+        orden, inicios = self._listas()
+        n_sondeo = min(self.n_sondeo, len(self.centroides))
+        listas = _top_k(q @ self.centroides.T, n_sondeo)
+
+        k_real = min(k, len(ids))
+        salida_ids = np.full((q.shape[0], k_real), -1, dtype=np.int64)
+        salida_dist = np.full((q.shape[0], k_real), np.inf, dtype=np.float32)
+        for i in range(q.shape[0]):
+            filas = np.concatenate([orden[inicios[c]:inicios[c + 1]] for c in listas[i]])
+            if len(filas) == 0:
+                continue
+            similitudes = vectores[filas] @ q[i]
+            mejores = _top_k(similitudes[np.newaxis, :], k_real)[0]
+            salida_ids[i, :len(mejores)] = ids[filas[mejores]]
+            salida_dist[i, :len(mejores)] = 1.0 - similitudes[mejores]
+        return salida_ids, salida_dist
+
+    # --------------------
+    # Persistencia
+    # --------------------
+    def guardar(self, ruta):
+        vectores, ids = self._filas.vista()
+        np.savez(
+            ruta, tipo=self.nombre, vectores=vectores, ids=ids, asignacion=self._asignacion,
+            centroides=self.centroides if self.entrenado else np.empty((0, 0), dtype=np.float32),
+            parametros=np.array([self.n_listas or 0, self.n_sondeo, self.iteraciones, self.semilla]),
+        )
+
+    @classmethod
+    def cargar(cls, ruta):
+        datos = np.load(ruta, allow_pickle=False)
+        n_listas, n_sondeo, iteraciones, semilla = (int(x) for x in datos["parametros"])
+        indice = cls(n_listas or None, n_sondeo, iteraciones, semilla)
+        if datos["centroides"].size:
+            indice.centroides = datos["centroides"]
+        if len(datos["ids"]):
+            indice._filas.agregar(datos["vectores"], datos["ids"])
+            indice._asignacion = datos["asignacion"].astype(np.int64)
+        return indice
+
+
+def _kmeans_esferico(datos, k, iteraciones, rng):
+    """k-means sobre vectores normalizados (similitud coseno). Devuelve (sumas (k, D), asignación)."""
+    centroides = datos[rng.choice(len(datos), k, replace=False)]
+    for _ in range(iteraciones):
+        asignacion = np.argmax(datos @ centroides.T, axis=1)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignacion, datos)
+        vacios = np.bincount(asignacion, minlength=k) == 0
+        if np.any(vacios):
+            sumas[vacios] = centroides[vacios]
+        centroides = _normalizar(sumas)
+    asignacion = np.argmax(datos @ centroides.T, axis=1)
+    sumas = np.zeros_like(centroides)
+    np.add.at(sumas, asignacion, datos)
+    return sumas, asignacion
+
+
+class _Identidad:
+    """Resumen de las plantillas de una persona: suma total (centroide) y prototipos por suma."""
+
+    __slots__ = ("suma", "sumas", "cuentas", "filas_repr")
+
+    def __init__(self, suma, sumas, cuentas, filas_repr):
+        self.suma = suma                # (D,)
+        self.sumas = sumas              # (P, D) suma de los miembros de cada prototipo
+        self.cuentas = cuentas          # (P,)
+        self.filas_repr = filas_repr    # (P,) fila de la galería que representa a cada prototipo
+
+
+class IndicePrototipos(IndiceVectores):
+    """
+    Índice por identidad: cada persona se resume en un centroide y hasta max_prototipos
+    prototipos (k-means esférico sobre sus plantillas). La búsqueda es jerárquica: primero
+    contra todos los centroides, luego sólo contra los prototipos de los `candidatos`
+    mejores. Una persona con 20 fotos cuesta 1 + max_prototipos comparaciones en lugar de 20.
+
+    Las altas se asignan al prototipo más cercano (k-means en línea) o abren uno nuevo si
+    quedan a más de distancia_nuevo de todos.
+    Los prototipos con menos de min_miembros plantillas no participan (salvo que la persona
+    no tenga otros), así una foto atípica no basta para ganar la identidad.
+
+    Necesita la etiqueta (id de usuario) de cada fila: GaleriaVectores la pasa cuando el
+    índice declara por_identidad. buscar() devuelve, por identidad, la fila representativa
+    del prototipo ganador y la distancia coseno a ese prototipo. Las bajas parciales de una
+    persona no recalculan sus prototipos hasta reconstruir_indice().
+    """
+
+    nombre = "prototipos"
+    por_identidad = True
+
+    def __init__(self, max_prototipos=3, candidatos=5, min_miembros=2, distancia_nuevo=0.3, iteraciones=8,
+                 semilla=0):
+        self.max_prototipos = max(1, int(max_prototipos))
+        self.candidatos = max(1, int(candidatos))
+        self.min_miembros = max(1, int(min_miembros))
+        # Alta a más de esta distancia coseno de todos sus prototipos: abre uno nuevo (si caben)
+        self.distancia_nuevo = distancia_nuevo
+        self.iteraciones = iteraciones
+        self.semilla = semilla
+        self._identidades = {}     # etiqueta -> _Identidad
+        self._filas = {}           # fila de la galería -> (etiqueta, prototipo)
+        self._compilado = None
+
+    def __len__(self):
+        return len(self._filas)
+
+    # --------------------
+    # Construcción y actualización
+    # --------------------
+    def _resumir(self, vectores, filas, rng):
+        k = min(self.max_prototipos, len(vectores))
+        if k == 1:
+            sumas, asignacion = vectores.sum(axis=0, keepdims=True), np.zeros(len(vectores), dtype=np.int64)
+        else:
+            sumas, asignacion = _kmeans_esferico(vectores, k, self.iteraciones, rng)
+        cuentas = np.bincount(asignacion, minlength=k)
+        # Representante: el miembro más parecido a su prototipo
+        similitudes = np.sum(vectores * _normalizar(sumas)[asignacion], axis=1)
+        filas_repr = np.zeros(k, dtype=np.int64)
+        for p in range(k):
+            miembros = np.flatnonzero(asignacion == p)
+            if len(miembros):
+                filas_repr[p] = filas[miembros[np.argmax(similitudes[miembros])]]
+        return _Identidad(vectores.sum(axis=0), sumas, cuentas, filas_repr), asignacion
+
+    def construir(self, vectores, ids, etiquetas=None):
+        vectores = _normalizar(vectores) if len(ids) else np.empty((0, 0), dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        etiquetas = list(ids) if etiquetas is None else list(etiquetas)
+        rng = np.random.default_rng(self.semilla)
+        self._identidades = {}
+        self._filas = {}
+        self._compilado = None
+        # Agrupar las filas por etiqueta en una pasada (código por etiqueta + orden estable)
+        codigos = {}
+        codigo_fila = np.fromiter((codigos.setdefault(e, len(codigos)) for e in etiquetas), dtype=np.int64,
+                                  count=len(etiquetas))
+        orden = np.argsort(codigo_fila, kind="stable")
+        limites = np.searchsorted(codigo_fila[orden], np.arange(len(codigos) + 1))
+        for etiqueta, c in codigos.items():
+            miembros = orden[limites[c]:limites[c + 1]]
+            identidad, asignacion = self._resumir(vectores[miembros], ids[miembros], rng)
+            self._identidades[etiqueta] = identidad
+            for fila, p in zip(ids[miembros], asignacion):
+                self._filas[int(fila)] = (etiqueta, int(p))
+
+    def agregar(self, vectores, ids, etiquetas=None):
+        vectores = _normalizar(vectores)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        etiquetas = list(ids) if etiquetas is None else list(etiquetas)
+        for v, fila, etiqueta in zip(vectores, ids, etiquetas):
+            identidad = self._identidades.get(etiqueta)
+            if identidad is None:
+                identidad = _Identidad(v.copy(), v[np.newaxis, :].copy(), np.ones(1, dtype=np.int64),
+                                       np.array([fila], dtype=np.int64))
+                self._identidades[etiqueta] = identidad
+                self._filas[int(fila)] = (etiqueta, 0)
+                continue
+
+            similitudes = _normalizar(identidad.sumas) @ v
+            p = int(np.argmax(similitudes))
+            identidad.suma += v
+            if len(identidad.cuentas) < self.max_prototipos and 1.0 - similitudes[p] > self.distancia_nuevo:
+                # Plantilla alejada de los prototipos existentes: abre uno nuevo
+                identidad.sumas = np.vstack([identidad.sumas, v])
+                identidad.cuentas = np.append(identidad.cuentas, 1)
+                identidad.filas_repr = np.append(identidad.filas_repr, fila)
+                p = len(identidad.cuentas) - 1
+            else:
+                identidad.sumas[p] += v
+                identidad.cuentas[p] += 1
+            self._filas[int(fila)] = (etiqueta, p)
+        self._compilado = None
+
+    def eliminar(self, ids):
+        mapa_ids = set(int(i) for i in np.asarray(ids, dtype=np.int64).reshape(-1))
+        self._renumerar(lambda fila: -1 if fila in mapa_ids else fila)
+
+    def reindexar(self, mapa):
+        mapa = np.asarray(mapa, dtype=np.int64)
+        self._renumerar(lambda fila: int(mapa[fila]))
+
+    def _renumerar(self, nueva_fila):
+        filas = {}
+        restantes = {}
+        for fila, (etiqueta, p) in self._filas.items():
+            nueva = nueva_fila(fila)
+            if nueva >= 0:
+                filas[nueva] = (etiqueta, p)
+                restantes.setdefault(etiqueta, {}).setdefault(p, nueva)
+        for etiqueta in list(self._identidades):
+            if etiqueta not in restantes:
+                del self._identidades[etiqueta]
+                continue
+            identidad = self._identidades[etiqueta]
+            cualquiera = next(iter(restantes[etiqueta].values()))
+            for p in range(len(identidad.filas_repr)):
+                viejo = int(identidad.filas_repr[p])
+                nuevo = nueva_fila(viejo)
+                # Si el representante desapareció, otro miembro (del prototipo o de la persona) lo sustituye
+                identidad.filas_repr[p] = nuevo if nuevo >= 0 else restantes[etiqueta].get(p, cualquiera)
+        self._filas = filas
+        self._compilado = None
+
+    # --------------------
+    # Búsqueda
+    # --------------------
+    def _compilar(self):
+        """Matrices contiguas de centroides y prototipos activos (prototipos agrupados por identidad)."""
+        if self._compilado is None:
+            centroides, prototipos, filas_repr, inicios = [], [], [], [0]
+            for identidad in self._identidades.values():
+                activos = identidad.cuentas >= self.min_miembros
+                if not np.any(activos):
+                    activos = identidad.cuentas > 0
+                centroides.append(identidad.suma)
+                prototipos.append(identidad.sumas[activos])
+                filas_repr.append(identidad.filas_repr[activos])
+                inicios.append(inicios[-1] + int(np.count_nonzero(activos)))
+            if centroides:
+                self._compilado = (_normalizar(np.stack(centroides)), _normalizar(np.concatenate(prototipos)),
+                                   np.concatenate(filas_repr), np.asarray(inicios, dtype=np.int64))
+            else:
+                self._compilado = ()
+        return self._compilado
+
+    def buscar(self, consultas, k=1):
+        q = _normalizar(consultas)
+        compilado = self._compilar()
+        if not compilado:
+            return np.empty((q.shape[0], 0), dtype=np.int64), np.empty((q.shape[0], 0), dtype=np.float32)
+        centroides, prototipos, filas_repr, inicios = compilado
+
+        n_candidatos = min(max(self.candidatos, k), len(centroides))
+        candidatos = _top_k(q @ centroides.T, n_candidatos)
+        k_real = min(k, n_candidatos)
+        salida_ids = np.full((q.shape[0], k_real), -1, dtype=np.int64)
+        salida_dist = np.full((q.shape[0], k_real), np.inf, dtype=np.float32)
+        for i in range(q.shape[0]):
+            segmentos = [np.arange(inicios[c], inicios[c + 1]) for c in candidatos[i]]
+            filas = np.concatenate(segmentos)
+            similitudes = prototipos[filas] @ q[i]
+            # Mejor prototipo de cada identidad candidata
+            tramos = np.cumsum([0] + [len(s) for s in segmentos[:-1]])
+            mejor_local = [int(np.argmax(similitudes[a:a + len(s)])) + a for a, s in zip(tramos, segmentos)]
+            mejores = np.asarray(mejor_local)[np.argsort(-similitudes[mejor_local])][:k_real]
+            salida_ids[i, :len(mejores)] = filas_repr[filas[mejores]]
+            salida_dist[i, :len(mejores)] = 1.0 - similitudes[mejores]
+        return salida_ids, salida_dist
+
+    # --------------------
+    # Persistencia
+    # --------------------
+    def guardar(self, ruta):
+        etiquetas = list(self._identidades)
+        posicion = {e: i for i, e in enumerate(etiquetas)}
+        identidades = [self._identidades[e] for e in etiquetas]
+        dimension = len(identidades[0].suma) if identidades else 0
+        np.savez(
+            ruta, tipo=self.nombre,
+            etiquetas=np.array([str(e) for e in etiquetas]),
+            ids=np.fromiter(self._filas.keys(), dtype=np.int64, count=len(self._filas)),
+            pertenencia=np.array([[posicion[e], p] for e, p in self._filas.values()], dtype=np.int64).reshape(-1, 2),
+            sumas_centro=np.stack([d.suma for d in identidades]) if identidades else np.empty((0, dimension)),
+            n_prototipos=np.array([len(d.cuentas) for d in identidades], dtype=np.int64),
+            sumas=np.concatenate([d.sumas for d in identidades]) if identidades else np.empty((0, dimension)),
+            cuentas=np.concatenate([d.cuentas for d in identidades]) if identidades else np.empty(0, dtype=np.int64),
+            filas_repr=np.concatenate([d.filas_repr for d in identidades]) if identidades else np.empty(0, dtype=np.int64),
+            parametros=np.array([self.max_prototipos, self.candidatos, self.min_miembros, self.distancia_nuevo,
+                                 self.iteraciones, self.semilla], dtype=np.float64),
+        )
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Las etiquetas se recuperan como texto (los ids de usuario de la galería lo son)."""
+        datos = np.load(ruta, allow_pickle=False)
+        max_prototipos, candidatos, min_miembros, distancia_nuevo, iteraciones, semilla = datos["parametros"]
+        indice = cls(int(max_prototipos), int(candidatos), int(min_miembros), float(distancia_nuevo),
+                     int(iteraciones), int(semilla))
+        etiquetas = [str(e) for e in datos["etiquetas"]]
+        inicio = 0
+        for i, etiqueta in enumerate(etiquetas):
+            fin = inicio + int(datos["n_prototipos"][i])
+            indice._identidades[etiqueta] = _Identidad(
+                datos["sumas_centro"][i].astype(np.float32), datos["sumas"][inicio:fin].astype(np.float32),
+                datos["cuentas"][inicio:fin].astype(np.int64), datos["filas_repr"][inicio:fin].astype(np.int64),
+            )
+            inicio = fin
+        for fila, (i, p) in zip(datos["ids"], datos["pertenencia"]):
+            indice._filas[int(fila)] = (etiquetas[i], int(p))
+        return indice
+
+
+class IndiceCuantizado(IndiceVectores):
+    """
+    Búsqueda exhaustiva sobre una copia int8 de los vectores: un cuarto de memoria; cada
+    vector se escala por su máximo absoluto a [-127, 127] y se guarda su escala.
+
+    La consulta no se cuantiza. Los códigos se recorren por bloques que caben en la caché
+    L2: cada bloque se expande a float32 en un búfer reutilizado y se multiplica con la
+    matmul (BLAS) del índice exacto. De memoria principal sólo se leen los códigos, así que
+    con galerías que no caben en la caché el recorrido es más rápido que el exacto; si la
+    matriz float32 cabe entera en la caché, la conversión lo hace algo más lento (ver
+    Benchmarks/bench_cuantizacion.py). numpy no tiene matmul entera con BLAS (acumular en
+    int32 es varias veces más lento) ni conversión vectorizada de float16, por eso no hay
+    aritmética entera ni modo float16.
+
+    Devuelve los `reordenar` mejores candidatos aproximados y declara filas_bajo_demanda:
+    GaleriaVectores no guarda entonces copia float32 y reordena leyendo sólo esas filas de
+    la matriz adoptada (el np.memmap del repositorio). En RAM quedan los códigos.
+    """
+
+    nombre = "cuantizado"
+    MODOS = ("int8",)
+    filas_bajo_demanda = True
+    BYTES_BLOQUE = 512 * 1024   # búfer float32 de cada bloque (cabe en la caché L2)
+
+    def __init__(self, modo="int8", reordenar=32, bloque=None):
+        if modo not in self.MODOS:
+            raise ValueError(f"Modo desconocido: {modo}. Opciones: {', '.join(self.MODOS)}")
+        self.modo = modo
+        self.reordenar = int(reordenar)
+        # Filas por bloque; None = las que caben en BYTES_BLOQUE según la dimensión
+        self.bloque = max(1, int(bloque)) if bloque else None
+        self._n = 0
+        self._codigos = None
+        self._escalas = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def bytes_por_vector(self):
+        if self._codigos is None:
+            return 0
+        return self._codigos.shape[1] * self._codigos.itemsize + 4
+
+    @property
+    def bytes_residentes(self):
+        """Memoria reservada por el índice: códigos, escalas e ids (con su capacidad libre)."""
+        total = self._escalas.nbytes + self._ids.nbytes
+        return total + (0 if self._codigos is None else self._codigos.nbytes)
+
+    def _codificar(self, vectores):
+        """Devuelve (códigos, escalas) de vectores ya normalizados."""
+        escalas = np.maximum(np.max(np.abs(vectores), axis=1), 1e-10) / 127.0
+        codigos = np.clip(np.rint(vectores / escalas[:, np.newaxis]), -127, 127).astype(np.int8)
+        return codigos, escalas.astype(np.float32)
+
+    # --------------------
+    # Actualización
+    # --------------------
+    def construir(self, vectores, ids):
+        self._n = 0
+        self._codigos = None
+        self._escalas = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        if len(ids):
+            self.agregar(vectores, ids)
+
+    def agregar(self, vectores, ids):
+        codigos, escalas = self._codificar(_normalizar(vectores))
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        requerido = self._n + len(ids)
+        if self._codigos is None or requerido > self._codigos.shape[0]:
+            capacidad = max(64, requerido, 2 * (0 if self._codigos is None else self._codigos.shape[0]))
+            nuevos = np.empty((capacidad, codigos.shape[1]), dtype=codigos.dtype)
+            nuevas_escalas = np.empty(capacidad, dtype=np.float32)
+            nuevos_ids = np.empty(capacidad, dtype=np.int64)
+            if self._n:
+                nuevos[:self._n] = self._codigos[:self._n]
+                nuevas_escalas[:self._n] = self._escalas[:self._n]
+                nuevos_ids[:self._n] = self._ids[:self._n]
+            self._codigos, self._escalas, self._ids = nuevos, nuevas_escalas, nuevos_ids
+        self._codigos[self._n:requerido] = codigos
+        self._escalas[self._n:requerido] = escalas
+        self._ids[self._n:requerido] = ids
+        self._n = requerido
+
+    def _conservar(self, mascara):
+        n = int(np.count_nonzero(mascara))
+        self._codigos[:n] = self._codigos[:self._n][mascara]
+        self._escalas[:n] = self._escalas[:self._n][mascara]
+        self._ids[:n] = self._ids[:self._n][mascara]
+        self._n = n
+
+    def eliminar(self, ids):
+        self._conservar(~np.isin(self._ids[:self._n], np.asarray(ids, dtype=np.int64)))
+
+    def reindexar(self, mapa):
+        nuevos = np.asarray(mapa, dtype=np.int64)[self._ids[:self._n]]
+        self._ids[:self._n] = nuevos
+        self._conservar(nuevos >= 0)
+
+    # --------------------
+    # Búsqueda
+    # --------------------
+    def buscar(self, consultas, k=1):
+        """Distancias aproximadas (a partir de los códigos); ver GaleriaVectores.buscar para el reordenado."""
+        q = _normalizar(consultas)
+        if self._n == 0:
+            return np.empty((q.shape[0], 0), dtype=np.int64), np.empty((q.shape[0], 0), dtype=np.float32)
+        dimension = self._codigos.shape[1]
+        filas = self.bloque or max(16, self.BYTES_BLOQUE // (4 * dimension))
+        # Búfer por llamada (buscar puede ejecutarse a la vez en varios hilos)
+        bufer = np.empty((filas, dimension), dtype=np.float32)
+
+        # Similitudes como (N, Q): bloque @ q.T escribe filas contiguas, bastante más rápido
+        # que escribir columnas sueltas de una matriz (Q, N)
+        por_fila = np.empty((self._n, q.shape[0]), dtype=np.float32)
+        for inicio in range(0, self._n, filas):
+            fin = min(self._n, inicio + filas)
+            bloque = bufer[:fin - inicio]
+            np.copyto(bloque, self._codigos[inicio:fin], casting="unsafe")
+            np.matmul(bloque, q.T, out=por_fila[inicio:fin])
+        por_fila *= self._escalas[:self._n, np.newaxis]
+        similitudes = por_fila.T
+
+        mejores = _top_k(similitudes, k)
+        distancias = 1.0 - np.take_along_axis(similitudes, mejores, axis=1)
+        return self._ids[mejores], distancias.astype(np.float32)
+
+    # --------------------
+    # Persistencia
+    # --------------------
+    def guardar(self, ruta):
+        codigos = self._codigos[:self._n] if self._codigos is not None else np.empty((0, 0), dtype=np.int8)
+        np.savez(ruta, tipo=self.nombre, modo=self.modo, codigos=codigos, escalas=self._escalas[:self._n],
+                 ids=self._ids[:self._n], parametros=np.array([self.reordenar, self.bloque or 0]))
+
+    @classmethod
+    def cargar(cls, ruta):
+        datos = np.load(ruta, allow_pickle=False)
+        reordenar, bloque = (int(x) for x in datos["parametros"])
+        indice = cls(str(datos["modo"]), reordenar, bloque)
+        n = len(datos["ids"])
+        if n:
+            indice._codigos = np.array(datos["codigos"])
+            indice._escalas = np.array(datos["escalas"], dtype=np.float32)
+            indice._ids = np.array(datos["ids"], dtype=np.int64)
+            indice._n = n
+        return indice
+
+
+INDICES = {
+    IndiceExacto.nombre: IndiceExacto,
+    IndiceIVF.nombre: IndiceIVF,
+    IndicePrototipos.nombre: IndicePrototipos,
+    IndiceCuantizado.nombre: IndiceCuantizado,
+}
+
+
+def crear_indice(nombre="exacto", **opciones):
+    """Crea un índice por nombre ("exacto", "ivf", "prototipos" o "cuantizado")."""
+    if nombre not in INDICES:
+        raise ValueError(f"Índice desconocido: {nombre}. Opciones: {', '.join(INDICES)}")
+    return INDICES[nombre](**opciones)
+
+
+def cargar_indice(ruta):
+    """Carga un índice guardado con guardar(), sea del tipo que sea."""
+    tipo = str(np.load(ruta, allow_pickle=False)["tipo"])
+    return INDICES[tipo].cargar(ruta)
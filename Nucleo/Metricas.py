@@ -0,0 +1,272 @@
+# Nucleo/Metricas.py
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Límites (segundos) de las cubetas acumuladas del formato de texto de Prometheus
+LIMITES_CUBETAS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Desde 3.12 cProfile usa sys.monitoring: un solo perfil activo cubre todos los hilos y un
+# segundo enable() falla. Antes, cada hilo necesita su propio perfil.
+PERFIL_GLOBAL = sys.version_info >= (3, 12)
+
+
+class Histograma:
+    """
+    Duraciones de una etapa: ventana deslizante de las últimas `ventana` muestras (para
+    percentiles y ritmo recientes) más cubetas acumuladas desde el inicio (para Prometheus).
+    """
+
+    def __init__(self, ventana=512):
+        self._muestras = deque(maxlen=ventana)   # (instante, duración)
+        self._cubetas = [0] * (len(LIMITES_CUBETAS) + 1)
+        self.cuenta = 0
+        self.suma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, segundos):
+        with self._lock:
+            self._muestras.append((time.perf_counter(), segundos))
+            self._cubetas[bisect.bisect_left(LIMITES_CUBETAS, segundos)] += 1
+            self.cuenta += 1
+            self.suma += segundos
+
+    def resumen(self):
+        """p50/p95/p99 en ms y eventos por segundo sobre la ventana reciente."""
+        with self._lock:
+            muestras = list(self._muestras)
+        if not muestras:
+            return {"cuenta": self.cuenta, "p50_ms": None, "p95_ms": None, "p99_ms": None, "por_segundo": 0.0}
+        duraciones = sorted(d for _, d in muestras)
+
+        def percentil(p):
+            return 1000.0 * duraciones[min(len(duraciones) - 1, int(p / 100.0 * len(duraciones)))]
+
+        lapso = muestras[-1][0] - muestras[0][0]
+        return {
+            "cuenta": self.cuenta,
+            "p50_ms": percentil(50),
+            "p95_ms": percentil(95),
+            "p99_ms": percentil(99),
+            "por_segundo": (len(muestras) - 1) / lapso if lapso > 0 else 0.0,
+        }
+
+    def cubetas(self):
+        with self._lock:
+            return list(self._cubetas), self.cuenta, self.suma
+
+
+class _TramoNulo:
+    """Tramo que no mide nada: lo que devuelve tramo() con las métricas desactivadas."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _TramoNulo()
+
+
+class _Tramo:
+    __slots__ = ("_metricas", "_histograma", "_inicio")
+
+    def __init__(self, metricas, histograma):
+        self._metricas = metricas
+        self._histograma = histograma
+
+    def __enter__(self):
+        self._metricas._perfilar_hilo()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histograma.observar(time.perf_counter() - self._inicio)
+        return False
+
+
+class Metricas:
+    """
+    Tiempos del camino caliente por etapa (cámara, detección, representación, matching,
+    pintado). Uso:
+
+        with metricas.tramo("deteccion"):
+            ...
+
+    Desactivadas, tramo() devuelve un objeto vacío compartido: el coste es una llamada y
+    una comprobación. Se activan con RECONOCIMIENTO_METRICAS=1 o con metricas.habilitado.
+
+    Perfilado opcional (iniciar_perfil / detener_perfil): cProfile de todo el proceso
+    (en Python < 3.12, uno en cada hilo que pase por un tramo) mientras dura la captura, y
+    tracemalloc si se pide memoria.
+    """
+
+    def __init__(self, habilitado=False, ventana=512):
+        self.habilitado = habilitado
+        self.ventana = ventana
+        self._histogramas = {}
+        self._lock = threading.Lock()
+        # Perfilado
+        self._perfilando = False
+        self._perfiles = {}          # id de hilo (0 con PERFIL_GLOBAL) -> cProfile.Profile
+        self._local = threading.local()
+        self._memoria = False
+
+    # --------------------
+    # Medición
+    # --------------------
+    def histograma(self, nombre):
+        histograma = self._histogramas.get(nombre)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(nombre, Histograma(self.ventana))
+        return histograma
+
+    def tramo(self, nombre):
+        if not self.habilitado:
+            return _NULO
+        return _Tramo(self, self.histograma(nombre))
+
+    def observar(self, nombre, segundos):
+        """Registra una duración medida por el llamador (p. ej. la latencia de extremo a extremo)."""
+        if self.habilitado:
+            self.histograma(nombre).observar(segundos)
+
+    def reiniciar(self):
+        with self._lock:
+            self._histogramas = {}
+
+    def resumen(self):
+        return {nombre: h.resumen() for nombre, h in sorted(self._histogramas.items())}
+
+    # --------------------
+    # Exportación
+    # --------------------
+    def texto_prometheus(self, prefijo="reconocimiento"):
+        """Histogramas en el formato de texto de Prometheus (una serie por etapa)."""
+        nombre_metrica = f"{prefijo}_duracion_segundos"
+        lineas = [
+            f"# HELP {nombre_metrica} Duración de cada etapa del reconocimiento.",
+            f"# TYPE {nombre_metrica} histogram",
+        ]
+        for etapa, histograma in sorted(self._histogramas.items()):
+            cubetas, cuenta, suma = histograma.cubetas()
+            acumulado = 0
+            for limite, n in zip(LIMITES_CUBETAS, cubetas):
+                acumulado += n
+                lineas.append(f'{nombre_metrica}_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+            lineas.append(f'{nombre_metrica}_bucket{{etapa="{etapa}",le="+Inf"}} {cuenta}')
+            lineas.append(f'{nombre_metrica}_sum{{etapa="{etapa}"}} {suma:.6f}')
+            lineas.append(f'{nombre_metrica}_count{{etapa="{etapa}"}} {cuenta}')
+        return "\n".join(lineas) + "\n"
+
+    def volcar(self, ruta):
+        """Escribe texto_prometheus() en un archivo (reemplazo atómico, apto para node_exporter)."""
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporal, ruta)
+
+    # --------------------
+    # Perfilado
+    # --------------------
+    @property
+    def perfilando(self):
+        return self._perfilando
+
+    def iniciar_perfil(self, memoria=False):
+        """Empieza a perfilar: cProfile en los hilos instrumentados y, con memoria=True, tracemalloc."""
+        if self._perfilando:
+            return
+        self.habilitado = True
+        self._memoria = memoria
+        if memoria:
+            import tracemalloc
+            tracemalloc.start(10)
+        with self._lock:
+            self._perfiles = {}
+            if PERFIL_GLOBAL:
+                import cProfile
+                perfil = cProfile.Profile()
+                perfil.enable()
+                self._perfiles[0] = perfil
+        self._perfilando = True
+
+    def _perfilar_hilo(self):
+        """Desde un tramo: activa o desactiva el perfil del hilo actual según el estado global."""
+        if PERFIL_GLOBAL:
+            return
+        perfil = getattr(self._local, "perfil", None)
+        if self._perfilando and perfil is None:
+            import cProfile
+            perfil = cProfile.Profile()
+            with self._lock:
+                self._perfiles[threading.get_ident()] = perfil
+            self._local.perfil = perfil
+            perfil.enable()
+        elif not self._perfilando and perfil is not None:
+            perfil.disable()
+            self._local.perfil = None
+
+    def detener_perfil(self, carpeta, espera=0.25):
+        """
+        Termina la captura y escribe en carpeta perfil_<fecha>.prof (abrir con pstats o snakeviz)
+        y, si se pidió memoria, memoria_<fecha>.txt con las 30 líneas que más reservaron.
+        Devuelve las rutas escritas.
+        """
+        if not self._perfilando:
+            return []
+        self._perfilando = False
+        if PERFIL_GLOBAL:
+            with self._lock:
+                for perfil in self._perfiles.values():
+                    perfil.disable()
+        else:
+            # Cada hilo desactiva su perfil en su siguiente tramo
+            time.sleep(espera)
+        os.makedirs(carpeta, exist_ok=True)
+        marca = time.strftime("%Y%m%d_%H%M%S")
+        rutas = []
+
+        with self._lock:
+            perfiles = list(self._perfiles.values())
+            self._perfiles = {}
+        estadisticas = None
+        if perfiles:
+            import pstats
+            for perfil in perfiles:
+                try:
+                    parcial = pstats.Stats(perfil)
+                except TypeError:
+                    continue  # perfil sin ninguna llamada registrada
+                if estadisticas is None:
+                    estadisticas = parcial
+                else:
+                    estadisticas.add(parcial)
+        if estadisticas is not None:
+            ruta = os.path.join(carpeta, f"perfil_{marca}.prof")
+            estadisticas.dump_stats(ruta)
+            rutas.append(ruta)
+
+        if self._memoria:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                captura = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                ruta = os.path.join(carpeta, f"memoria_{marca}.txt")
+                with open(ruta, "w", encoding="utf-8") as f:
+                    for estadistica in captura.statistics("lineno")[:30]:
+                        f.write(f"{estadistica}\n")
+                rutas.append(ruta)
+        return rutas
+
+
+metricas = Metricas(habilitado=os.environ.get("RECONOCIMIENTO_METRICAS", "") not in ("", "0"))
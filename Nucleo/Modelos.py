@@ -0,0 +1,148 @@
+# Nucleo/Modelos.py
+
+import threading
+import time
+
+import numpy as np
+
+RUTA_HAAR = "haarcascade_frontalface_default.xml"
+
+
+class RegistroModelos:
+    """
+    Registro de modelos del proceso: cada backend (red de embeddings de DeepFace o
+    detector de rostros) se construye una sola vez y se comparte entre ventanas e hilos.
+
+    calentar() construye los modelos y les pasa un lote ficticio, de modo que el primer
+    rostro real no paga ni la carga ni la inicialización perezosa del grafo. tiempos guarda
+    los segundos de carga y de calentamiento de cada modelo.
+    """
+
+    def __init__(self):
+        self._modelos = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.tiempos = {}
+        self._calentamiento = None
+        self._error_calentamiento = None
+
+    def _lock_de(self, clave):
+        with self._lock:
+            return self._locks.setdefault(clave, threading.Lock())
+
+    def _obtener(self, clave, construir):
+        modelo = self._modelos.get(clave)
+        if modelo is not None:
+            return modelo
+        # Un lock por modelo: construir uno no bloquea a quien pide otro ya cargado
+        with self._lock_de(clave):
+            modelo = self._modelos.get(clave)
+            if modelo is None:
+                inicio = time.perf_counter()
+                modelo = construir()
+                self.tiempos.setdefault(clave, {})["carga"] = time.perf_counter() - inicio
+                self._modelos[clave] = modelo
+        return modelo
+
+    # --------------------
+    # Backends
+    # --------------------
+    def modelo_embeddings(self, nombre="Facenet"):
+        """
+        Devuelve (red, tam_entrada) del modelo de DeepFace. DeepFace guarda además el modelo
+        en su propia caché, así que DeepFace.represent reutiliza esta misma instancia.
+        """
+        def construir():
+            # Importar deepface arrastra TensorFlow: se hace aquí, no al importar el módulo
+            inicio = time.perf_counter()
+            from deepface import DeepFace
+            self.tiempos.setdefault("deepface", {}).setdefault("importacion", time.perf_counter() - inicio)
+
+            cliente = DeepFace.build_model(nombre)
+            # DeepFace >= 0.0.80 devuelve un cliente con .model e .input_shape;
+            # versiones anteriores devuelven directamente el modelo de Keras.
+            red = getattr(cliente, "model", cliente)
+            tam = getattr(cliente, "input_shape", None)
+            if tam is None:
+                forma = red.input_shape
+                tam = (forma[1], forma[2])
+            return red, (int(tam[0]), int(tam[1]))
+
+        return self._obtener(nombre, construir)
+
+    def detector_haar(self, archivo=RUTA_HAAR):
+        def construir():
+            import cv2
+
+            return cv2.CascadeClassifier(cv2.data.haarcascades + archivo)
+
+        return self._obtener(f"haar:{archivo}", construir)
+
+    def detector(self, nombre="haar", **opciones):
+        """Detector de rostros de Nucleo/Detectores.py, uno por combinación de nombre y opciones."""
+        def construir():
+            try:
+                from Nucleo.Detectores import crear_detector
+            except ImportError:
+                from Detectores import crear_detector
+
+            return crear_detector(nombre, **opciones)
+
+        clave = f"detector:{nombre}:" + ",".join(f"{k}={opciones[k]}" for k in sorted(opciones))
+        return self._obtener(clave, construir)
+
+    # --------------------
+    # Calentamiento
+    # --------------------
+    def calentar(self, modelos=("Facenet",), detectores=("haar",)):
+        """Construye los modelos y ejecuta un lote ficticio en cada uno. Devuelve self.tiempos."""
+        for nombre in detectores:
+            self.detector(nombre)
+        for nombre in modelos:
+            red, (alto, ancho) = self.modelo_embeddings(nombre)
+            inicio = time.perf_counter()
+            lote = np.zeros((1, alto, ancho, 3), dtype=np.float32)
+            if hasattr(red, "predict_on_batch"):
+                red.predict_on_batch(lote)
+            else:
+                red(lote)
+            self.tiempos[nombre]["calentamiento"] = time.perf_counter() - inicio
+        for nombre, t in self.tiempos.items():
+            partes = ", ".join(f"{k} {v:.2f} s" for k, v in t.items())
+            print(f"🔥 Modelo {nombre}: {partes}")
+        return self.tiempos
+
+    def calentar_en_segundo_plano(self, modelos=("Facenet",), al_terminar=None):
+        """
+        Lanza calentar() en un hilo daemon (una sola vez por proceso). Devuelve el hilo.
+        al_terminar(error) se llama desde un hilo de trabajo cuando el calentamiento acaba
+        (error es None si todo fue bien), también si ya estaba en marcha o terminado.
+        """
+        with self._lock:
+            if self._calentamiento is None:
+                def tarea():
+                    try:
+                        self.calentar(modelos)
+                    except Exception as e:
+                        self._error_calentamiento = e
+                        print(f"⚠️ No se pudo precargar el modelo: {e}")
+
+                self._calentamiento = threading.Thread(target=tarea, name="calentamiento-modelos", daemon=True)
+                self._calentamiento.start()
+            hilo = self._calentamiento
+
+        if al_terminar:
+            def avisar():
+                hilo.join()
+                al_terminar(self._error_calentamiento)
+
+            threading.Thread(target=avisar, name="calentamiento-aviso", daemon=True).start()
+        return hilo
+
+    def listo(self, nombre="Facenet"):
+        """True si el modelo ya está cargado (no bloquea)."""
+        return nombre in self._modelos
+
+
+# Instancia única por proceso
+registro_modelos = RegistroModelos()
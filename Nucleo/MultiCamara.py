@@ -0,0 +1,340 @@
+# Nucleo/MultiCamara.py
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    from Nucleo.Camara import Camara
+    from Nucleo.Detectores import DetectorMultiresolucion, crear_detector
+    from Nucleo.Reconocimiento import SeguidorRostros
+    from Nucleo.Representacion import RepresentadorLotes
+except ImportError:
+    from Camara import Camara
+    from Detectores import DetectorMultiresolucion, crear_detector
+    from Reconocimiento import SeguidorRostros
+    from Representacion import RepresentadorLotes
+
+
+class FlujoCamara:
+    """
+    Estado de una cámara dentro de GestorCamaras: su fuente, su detector (con estado
+    propio si es multiresolución), su seguidor de rostros y sus estadísticas.
+    """
+
+    def __init__(self, id_flujo, camara, detector, fps_max=None, ventana_latencias=256, motor=None):
+        self.id = id_flujo
+        self.camara = camara
+        self.detector = detector
+        self.fps_max = fps_max
+        self.seguidor = SeguidorRostros(motor=motor)
+        self.hilo = None
+
+        # Contadores
+        self.frames = 0
+        self.resultados = 0
+        self.rostros_embebidos = 0
+        self.descartados = 0
+        self.latencias = deque(maxlen=ventana_latencias)
+        self._inicio = None
+
+    def reiniciar(self):
+        self.seguidor.reiniciar()
+        if hasattr(self.detector, "reiniciar"):
+            self.detector.reiniciar()
+        self.frames = self.resultados = self.rostros_embebidos = self.descartados = 0
+        self.latencias.clear()
+        self._inicio = time.perf_counter()
+
+    def estadisticas(self):
+        transcurrido = time.perf_counter() - self._inicio if self._inicio else 0.0
+        latencias = np.asarray(self.latencias, dtype=np.float64) * 1000.0
+        return {
+            "frames": self.frames,
+            "resultados": self.resultados,
+            "fps": self.frames / transcurrido if transcurrido > 0 else 0.0,
+            "rostros_embebidos": self.rostros_embebidos,
+            "descartados": self.descartados,
+            "latencia_ms_p50": float(np.percentile(latencias, 50)) if len(latencias) else None,
+            "latencia_ms_p95": float(np.percentile(latencias, 95)) if len(latencias) else None,
+        }
+
+
+class GestorCamaras:
+    """
+    Varias cámaras en un mismo proceso con un único conjunto de inferencia compartido.
+
+    Cada cámara tiene su hilo de lectura (Camara en_hilo) y su hilo de detección, limitado
+    a fps_max frames por segundo; la detección de OpenCV libera el GIL, así que las cámaras
+    detectan en paralelo en núcleos distintos. Los rostros que el seguidor de cada cámara
+    marca como pendientes pasan a un único punto de inferencia: cada cámara tiene como
+    mucho un trabajo en espera (el más reciente gana) y los hilos de inferencia los reparten
+    por turnos (round-robin) en lotes de hasta max_lote recortes, una llamada al modelo por
+    lote para todas las cámaras.
+
+    al_frame(id_flujo, frame, secuencia, marca) y al_resultado(id_flujo, resultado) se
+    llaman desde los hilos de trabajo, como en PipelineReconocimiento. El frame es un buffer
+    del anillo de la cámara fijado sólo durante al_frame: para retenerlo, fijar/liberar en
+    flujos[id_flujo].camara.
+    """
+
+    def __init__(self, reconocimiento, umbral_coseno=0.45, max_lote=32, hilos_inferencia=1,
+                 al_frame=None, al_resultado=None):
+        self.reconocimiento = reconocimiento
+        self.umbral_coseno = umbral_coseno
+        self.max_lote = max(1, int(max_lote))
+        # Con más de un hilo cada uno usa su propio buffer de lote; la red es la misma
+        self.hilos_inferencia = max(1, int(hilos_inferencia))
+        self.al_frame = al_frame
+        self.al_resultado = al_resultado
+
+        self.flujos = {}
+        self._orden = []          # ids de flujo en orden de turno
+        self._turno = 0
+        self._pendientes = {}     # id_flujo -> trabajo de embedding más reciente
+        self._cond = threading.Condition()
+        self._activo = threading.Event()
+        self._hilos = []
+
+        # Contadores compartidos entre hilos (inferencia, detección y quien pida estadísticas)
+        self._lock_contadores = threading.Lock()
+        self.lotes = 0
+        self.recortes_embebidos = 0
+
+    # --------------------
+    # Cámaras
+    # --------------------
+    def agregar_camara(self, fuente, id_flujo=None, fps_max=None, detector="haar", opciones_detector=None,
+                       multiresolucion=None, **opciones_camara):
+        """
+        Añade una cámara (índice, archivo de video o carpeta de imágenes, como Camara).
+        Cada flujo crea su propio detector: no se comparte estado entre hilos de detección.
+        Devuelve el id del flujo.
+        """
+        id_flujo = str(fuente) if id_flujo is None else id_flujo
+        if id_flujo in self.flujos:
+            raise ValueError(f"Ya existe un flujo con id {id_flujo}")
+        base = crear_detector(detector, **(opciones_detector or {}))
+        if multiresolucion:
+            base = DetectorMultiresolucion(base, **multiresolucion)
+        camara = Camara(fuente, en_hilo=True, **opciones_camara)
+        # El motor de decisión no tiene estado propio: se comparte el del reconocimiento
+        flujo = FlujoCamara(id_flujo, camara, base, fps_max=fps_max, motor=self.reconocimiento.seguidor.motor)
+        with self._cond:
+            self.flujos[id_flujo] = flujo
+            self._orden.append(id_flujo)
+        if self.activo:
+            self._iniciar_flujo(flujo)
+        return id_flujo
+
+    def quitar_camara(self, id_flujo, timeout=2.0):
+        with self._cond:
+            flujo = self.flujos.pop(id_flujo, None)
+            if flujo is None:
+                return False
+            self._orden.remove(id_flujo)
+            self._pendientes.pop(id_flujo, None)
+        self._detener_flujo(flujo, timeout)
+        return True
+
+    # --------------------
+    # Ciclo de vida
+    # --------------------
+    def iniciar(self):
+        if self._activo.is_set():
+            return
+        self._activo.set()
+        for flujo in list(self.flujos.values()):
+            self._iniciar_flujo(flujo)
+        self._hilos = [
+            threading.Thread(target=self._bucle_inferencia, name=f"multicamara-inferencia-{i}", daemon=True)
+            for i in range(self.hilos_inferencia)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self, timeout=2.0):
+        self._activo.clear()
+        with self._cond:
+            self._pendientes.clear()
+            self._cond.notify_all()
+        for flujo in list(self.flujos.values()):
+            self._detener_flujo(flujo, timeout)
+        for hilo in self._hilos:
+            if hilo is not threading.current_thread():
+                hilo.join(timeout)
+        self._hilos = []
+
+    @property
+    def activo(self):
+        return self._activo.is_set()
+
+    def _iniciar_flujo(self, flujo):
+        flujo.reiniciar()
+        if not flujo.camara.iniciar():
+            print(f"❌ No se pudo abrir la cámara {flujo.id}")
+            return
+        flujo.hilo = threading.Thread(target=self._bucle_flujo, args=(flujo,), name=f"multicamara-{flujo.id}",
+                                      daemon=True)
+        flujo.hilo.start()
+
+    def _detener_flujo(self, flujo, timeout):
+        hilo, flujo.hilo = flujo.hilo, None
+        if hilo is not None and hilo is not threading.current_thread():
+            hilo.join(timeout)
+        flujo.camara.detener()
+
+    def estadisticas(self):
+        """Estadísticas por cámara y del conjunto de inferencia compartido."""
+        with self._lock_contadores:
+            return {
+                "lotes": self.lotes,
+                "recortes_embebidos": self.recortes_embebidos,
+                "recortes_por_lote": self.recortes_embebidos / self.lotes if self.lotes else 0.0,
+                "flujos": {id_flujo: flujo.estadisticas() for id_flujo, flujo in list(self.flujos.items())},
+            }
+
+    # --------------------
+    # Captura y detección (un hilo por cámara)
+    # --------------------
+    def _bucle_flujo(self, flujo):
+        periodo = 1.0 / flujo.fps_max if flujo.fps_max else 0.0
+        siguiente = time.perf_counter()
+        while self._activo.is_set() and flujo.hilo is threading.current_thread():
+            # Fijado: un detector lento no ve el buffer sobrescrito por el lector de la cámara
+            frame, marca, secuencia = flujo.camara.obtener_ultimo(timeout=0.1, fijar=True)
+            if frame is None:
+                if flujo.camara.agotada:
+                    break
+                continue
+            flujo.frames += 1
+            if self.al_frame:
+                try:
+                    self.al_frame(flujo.id, frame, secuencia, marca)
+                except Exception as e:
+                    print(f"⚠️ Error entregando frame de {flujo.id}: {e}")
+
+            try:
+                faces, boxes = self.reconocimiento.detectar_rostros(frame, detector=flujo.detector)
+                # Copiar los recortes: el frame vuelve al anillo mientras esperan inferencia
+                faces = [f.copy() for f in faces]
+                pistas, pendientes = flujo.seguidor.asociar(boxes, faces)
+                pendientes = self.reconocimiento.filtrar_calidad(faces, pendientes)
+            except Exception as e:
+                print(f"⚠️ Error en detección de {flujo.id}: {e}")
+                continue
+            finally:
+                flujo.camara.liberar(frame)
+
+            if pendientes and len(self.reconocimiento.galeria) > 0:
+                trabajo = (secuencia, marca, boxes, pistas, pendientes, [faces[i] for i in pendientes])
+                with self._cond:
+                    if flujo.id in self._pendientes:
+                        flujo.descartados += 1
+                    self._pendientes[flujo.id] = trabajo
+                    self._cond.notify()
+            else:
+                if pendientes:
+                    flujo.seguidor.asignar([pistas[i] for i in pendientes], ["Desconocido"] * len(pendientes),
+                                           [None] * len(pendientes))
+                self._publicar(flujo, secuencia, marca, boxes, pistas)
+
+            if periodo:
+                siguiente += periodo
+                espera = siguiente - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                else:
+                    siguiente = time.perf_counter()
+
+    # --------------------
+    # Inferencia compartida
+    # --------------------
+    def _tomar_lote(self, timeout=0.1):
+        """
+        Toma trabajos pendientes por turnos empezando por la cámara siguiente a la última
+        atendida, hasta completar max_lote recortes. Cada cámara aporta como mucho un trabajo
+        por lote, así que una cámara con muchos rostros no acapara el modelo.
+        """
+        with self._cond:
+            if not self._pendientes:
+                self._cond.wait(timeout)
+            if not self._pendientes or not self._orden:
+                return []
+            lote, n = [], 0
+            total = len(self._orden)
+            for paso in range(total):
+                id_flujo = self._orden[(self._turno + paso) % total]
+                trabajo = self._pendientes.get(id_flujo)
+                if trabajo is None:
+                    continue
+                if lote and n + len(trabajo[5]) > self.max_lote:
+                    break
+                del self._pendientes[id_flujo]
+                lote.append((id_flujo, trabajo))
+                n += len(trabajo[5])
+                self._turno = (self._turno + paso + 1) % total
+            return lote
+
+    def _bucle_inferencia(self):
+        representador = RepresentadorLotes(self.reconocimiento.modelo)
+        while self._activo.is_set():
+            lote = self._tomar_lote()
+            if not lote:
+                continue
+            recortes = [r for _, trabajo in lote for r in trabajo[5]]
+            try:
+                try:
+                    embeddings, indices = representador.representar(recortes), list(range(len(recortes)))
+                except Exception:
+                    embeddings, indices = self.reconocimiento.representar_rostros(recortes)
+                nombres, distancias = self.reconocimiento.identificar_embeddings(
+                    embeddings, indices, len(recortes), umbral_coseno=self.umbral_coseno, con_distancias=True
+                )
+            except Exception as e:
+                # Un lote erróneo no puede parar el único hilo de inferencia de todas las cámaras
+                print(f"⚠️ Error en inferencia de un lote de {len(recortes)} rostros: {e}")
+                nombres = distancias = None
+            with self._lock_contadores:
+                self.lotes += 1
+                if nombres is not None:
+                    self.recortes_embebidos += len(recortes)
+
+            inicio = 0
+            for id_flujo, (secuencia, marca, boxes, pistas, pendientes, _) in lote:
+                flujo = self.flujos.get(id_flujo)
+                fin = inicio + len(pendientes)
+                if flujo is not None and nombres is None:
+                    # Sin asignar(): las pistas siguen pendientes y se reintentan en el frame siguiente
+                    self._publicar(flujo, secuencia, marca, boxes, pistas, sin_resultado=pendientes)
+                elif flujo is not None:
+                    flujo.seguidor.asignar([pistas[i] for i in pendientes], nombres[inicio:fin], distancias[inicio:fin])
+                    with self._lock_contadores:
+                        flujo.rostros_embebidos += len(pendientes)
+                    self._publicar(flujo, secuencia, marca, boxes, pistas)
+                inicio = fin
+
+    def _publicar(self, flujo, secuencia, marca, boxes, pistas, sin_resultado=()):
+        """sin_resultado: índices de rostros cuya inferencia falló (se publican como desconocidos)."""
+        latencia = time.perf_counter() - marca
+        with self._lock_contadores:
+            flujo.latencias.append(latencia)
+            flujo.resultados += 1
+        if self.al_resultado:
+            nombres = [p.nombre for p in pistas]
+            decisiones = [p.decision for p in pistas]
+            for i in sin_resultado:
+                nombres[i], decisiones[i] = "Desconocido", None
+            resultado = {
+                "secuencia": secuencia,
+                "boxes": boxes,
+                "names": nombres,
+                "decisiones": decisiones,
+                "latencia": latencia,
+            }
+            try:
+                self.al_resultado(flujo.id, resultado)
+            except Exception as e:
+                print(f"⚠️ Error entregando resultado de {flujo.id}: {e}")
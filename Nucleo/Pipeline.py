@@ -0,0 +1,285 @@
+# Nucleo/Pipeline.py
+
+import threading
+import time
+
+try:
+    from Nucleo.Metricas import metricas
+except ImportError:
+    from Metricas import metricas
+
+
+class ColaUltimo:
+    """
+    Cola acotada de un solo elemento: el más reciente gana.
+    Si llega un elemento nuevo antes de que se consuma el anterior, el anterior se descarta
+    (y se pasa a al_descartar, si se indicó, fuera del lock).
+    """
+
+    def __init__(self, al_descartar=None):
+        self.al_descartar = al_descartar
+        self._cond = threading.Condition()
+        self._item = None
+        self._hay_item = False
+        self._cerrada = False
+        self.descartados = 0
+
+    def poner(self, item):
+        descartado = None
+        with self._cond:
+            if self._hay_item:
+                self.descartados += 1
+                descartado = self._item
+            self._item = item
+            self._hay_item = True
+            self._cond.notify()
+        if descartado is not None and self.al_descartar:
+            self.al_descartar(descartado)
+
+    def tomar(self, timeout=None):
+        """Devuelve el elemento más reciente o None si se agota el tiempo o la cola se cierra."""
+        with self._cond:
+            if not self._hay_item and not self._cerrada:
+                self._cond.wait(timeout)
+            if not self._hay_item:
+                return None
+            item = self._item
+            self._item = None
+            self._hay_item = False
+            return item
+
+    def cerrar(self):
+        with self._cond:
+            self._cerrada = True
+            self._cond.notify_all()
+
+    def abrir(self):
+        with self._cond:
+            self._cerrada = False
+            self._item = None
+            self._hay_item = False
+
+
+class PipelineReconocimiento:
+    """
+    Tubería captura → detección → embedding → matching en hilos de trabajo.
+    Las etapas se comunican con ColaUltimo, de modo que una etapa lenta descarta
+    frames viejos en lugar de acumularlos. La vista previa avanza al ritmo de la cámara
+    y el reconocimiento al ritmo que permita la CPU.
+
+    al_frame(frame, secuencia, marca_tiempo) y al_resultado(resultado) se llaman
+    desde los hilos de trabajo; la interfaz debe reenviarlos a su hilo (p. ej. señales Qt).
+    Con cámara en hilo el frame es un buffer del anillo de la cámara, válido sólo durante
+    al_frame: para retenerlo más allá, fijar_frame(frame) y después liberar_frame(frame).
+
+    Para convivir con otros usuarios del mismo ReconocimientoFacial (p. ej. el servicio
+    HTTP): detector y representador propios evitan compartir el detector y el buffer de
+    lote, y con ejecutor el embedding y el matching se ejecutan en ese ejecutor (el hilo
+    del modelo del servicio) en lugar de en los hilos de la tubería.
+    """
+
+    def __init__(self, reconocimiento, camara, al_frame=None, al_resultado=None, umbral_coseno=0.45,
+                 usar_seguimiento=True, detector=None, representador=None, ejecutor=None):
+        self.reconocimiento = reconocimiento
+        self.camara = camara
+        self.al_frame = al_frame
+        self.al_resultado = al_resultado
+        self.umbral_coseno = umbral_coseno
+        # Con seguimiento sólo se embeben rostros nuevos o que cambiaron (ver SeguidorRostros)
+        self.usar_seguimiento = usar_seguimiento
+        self.detector = detector if detector is not None else reconocimiento.detector_video
+        self.representador = representador
+        self.ejecutor = ejecutor
+
+        # El frame en cola está fijado en el anillo de la cámara: si se descarta, se libera
+        self._cola_deteccion = ColaUltimo(al_descartar=lambda item: self.liberar_frame(item[2]))
+        self._cola_embedding = ColaUltimo()
+        self._cola_matching = ColaUltimo()
+        self._activo = threading.Event()
+        self._hilos = []
+        self._secuencia = 0
+
+    # --------------------
+    # Ciclo de vida
+    # --------------------
+    def iniciar(self):
+        if self._activo.is_set():
+            return
+        for cola in (self._cola_deteccion, self._cola_embedding, self._cola_matching):
+            cola.abrir()
+        if self.usar_seguimiento:
+            self.reconocimiento.seguidor.reiniciar()
+        if hasattr(self.detector, "reiniciar"):
+            self.detector.reiniciar()
+        self._activo.set()
+        etapas = [
+            ("captura", self._bucle_captura),
+            ("deteccion", self._bucle_deteccion),
+            ("embedding", self._bucle_embedding),
+            ("matching", self._bucle_matching),
+        ]
+        self._hilos = [
+            threading.Thread(target=fn, name=f"pipeline-{nombre}", daemon=True)
+            for nombre, fn in etapas
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self, timeout=2.0):
+        self._activo.clear()
+        for cola in (self._cola_deteccion, self._cola_embedding, self._cola_matching):
+            cola.cerrar()
+        for hilo in self._hilos:
+            if hilo is not threading.current_thread():
+                hilo.join(timeout)
+        self._hilos = []
+        item = self._cola_deteccion.tomar(timeout=0)
+        if item is not None:
+            self.liberar_frame(item[2])
+
+    @property
+    def activo(self):
+        return self._activo.is_set()
+
+    def estadisticas(self):
+        """Frames descartados por cada etapa (indicador de qué etapa es el cuello de botella)."""
+        return {
+            "frames": self._secuencia,
+            "descartados_deteccion": self._cola_deteccion.descartados,
+            "descartados_embedding": self._cola_embedding.descartados,
+            "descartados_matching": self._cola_matching.descartados,
+        }
+
+    # --------------------
+    # Frames del anillo de la cámara
+    # --------------------
+    def fijar_frame(self, frame):
+        """Reserva el frame en el anillo de la cámara hasta liberar_frame (no-op sin cámara en hilo)."""
+        if getattr(self.camara, "en_hilo", False):
+            self.camara.fijar(frame)
+
+    def liberar_frame(self, frame):
+        if getattr(self.camara, "en_hilo", False):
+            self.camara.liberar(frame)
+
+    # --------------------
+    # Modelo y galería
+    # --------------------
+    def _en_ejecutor(self, fn, *args, **kwargs):
+        if self.ejecutor is None:
+            return fn(*args, **kwargs)
+        return self.ejecutor.submit(fn, *args, **kwargs).result()
+
+    def _representar(self, recortes):
+        if self.representador is not None:
+            try:
+                with metricas.tramo("representacion"):
+                    return self.representador.representar(recortes), list(range(len(recortes)))
+            except Exception as e:
+                print(f"⚠️ Representación por lotes no disponible: {e}")
+        return self.reconocimiento.representar_rostros(recortes)
+
+    # --------------------
+    # Etapas
+    # --------------------
+    def _bucle_captura(self):
+        en_hilo = getattr(self.camara, "en_hilo", False)
+        while self._activo.is_set():
+            if en_hilo:
+                # La cámara ya lee por adelantado: tomar el frame más reciente y su marca de captura,
+                # fijado hasta que la detección termine con él
+                frame, marca, _ = self.camara.obtener_ultimo(timeout=0.1, fijar=True)
+            else:
+                frame = self.camara.obtener_frame()
+                marca = time.perf_counter()
+            if frame is None:
+                time.sleep(0.005)
+                continue
+            self._secuencia += 1
+            if self.al_frame:
+                # Fijado también durante al_frame: la detección puede liberarlo antes
+                self.fijar_frame(frame)
+            self._cola_deteccion.poner((self._secuencia, marca, frame))
+            if self.al_frame:
+                try:
+                    self.al_frame(frame, self._secuencia, marca)
+                except Exception as e:
+                    print(f"⚠️ Error entregando frame: {e}")
+                finally:
+                    self.liberar_frame(frame)
+
+    def _bucle_deteccion(self):
+        while self._activo.is_set():
+            item = self._cola_deteccion.tomar(timeout=0.1)
+            if item is None:
+                continue
+            secuencia, marca, frame = item
+            try:
+                faces, boxes = self.reconocimiento.detectar_rostros(frame, detector=self.detector)
+                # Los recortes son vistas del buffer de la cámara, que vuelve al lector al
+                # liberarlo: copiarlos (son pequeños)
+                faces = [f.copy() for f in faces]
+                if self.usar_seguimiento:
+                    pistas, pendientes = self.reconocimiento.seguidor.asociar(boxes, faces)
+                else:
+                    pistas, pendientes = None, list(range(len(faces)))
+                # Sólo se embeben los recortes con calidad suficiente (ver Nucleo/Calidad.py)
+                pendientes = self.reconocimiento.filtrar_calidad(faces, pendientes)
+            except Exception as e:
+                print(f"⚠️ Error en detección: {e}")
+                continue
+            finally:
+                self.liberar_frame(frame)
+            self._cola_embedding.poner((secuencia, marca, faces, boxes, pistas, pendientes))
+
+    def _bucle_embedding(self):
+        while self._activo.is_set():
+            item = self._cola_embedding.tomar(timeout=0.1)
+            if item is None:
+                continue
+            secuencia, marca, faces, boxes, pistas, pendientes = item
+            embeddings, indices = None, []
+            if len(pendientes) > 0 and len(self.reconocimiento.galeria) > 0:
+                try:
+                    embeddings, indices = self._en_ejecutor(self._representar, [faces[i] for i in pendientes])
+                except Exception as e:
+                    print(f"⚠️ Error extrayendo embeddings: {e}")
+            self._cola_matching.poner((secuencia, marca, boxes, pistas, pendientes, embeddings, indices))
+
+    def _bucle_matching(self):
+        while self._activo.is_set():
+            item = self._cola_matching.tomar(timeout=0.1)
+            if item is None:
+                continue
+            secuencia, marca, boxes, pistas, pendientes, embeddings, indices = item
+            try:
+                nombres, distancias = self._en_ejecutor(
+                    self.reconocimiento.identificar_embeddings, embeddings, indices, len(pendientes),
+                    umbral_coseno=self.umbral_coseno, con_distancias=True,
+                )
+            except Exception as e:
+                print(f"⚠️ Error en matching: {e}")
+                continue
+            if pistas is not None:
+                self.reconocimiento.seguidor.asignar([pistas[i] for i in pendientes], nombres, distancias)
+                names = [p.nombre for p in pistas]
+                decisiones = [p.decision for p in pistas]
+            else:
+                names = ["Desconocido"] * len(boxes)
+                for i, nombre in zip(pendientes, nombres):
+                    names[i] = nombre
+                # Sin seguimiento no hay evidencia acumulada: se decide por frame
+                decisiones = ["DENEGADO" if n == "Desconocido" else "PERMITIDO" for n in names]
+            resultado = {
+                "secuencia": secuencia,
+                "boxes": boxes,
+                "names": names,
+                "decisiones": decisiones,
+                "latencia": time.perf_counter() - marca,
+            }
+            metricas.observar("latencia_total", resultado["latencia"])
+            if self.al_resultado:
+                try:
+                    self.al_resultado(resultado)
+                except Exception as e:
+                    print(f"⚠️ Error entregando resultado: {e}")
@@ -0,0 +1,227 @@
+# Nucleo/ProcesamientoLotes.py
+
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+try:
+    from Nucleo.Camara import EXTENSIONES_IMAGEN
+    from Nucleo.Detectores import DetectorMultiresolucion, crear_detector
+except ImportError:
+    from Camara import EXTENSIONES_IMAGEN
+    from Detectores import DetectorMultiresolucion, crear_detector
+
+EXTENSIONES_VIDEO = (".mp4", ".avi", ".mkv", ".mov", ".webm", ".m4v")
+CAMPOS_RESULTADO = ("fuente", "frame", "tiempo", "x", "y", "ancho", "alto", "identidad", "distancia")
+
+
+# --------------------
+# Fuentes: generadores de frames
+# --------------------
+def listar_fuentes(rutas):
+    """Expande carpetas a sus imágenes y videos (recursivo, orden estable). Las rutas de archivo se respetan."""
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for raiz, carpetas, archivos in os.walk(ruta):
+                carpetas.sort()
+                for nombre in sorted(archivos):
+                    if nombre.lower().endswith(EXTENSIONES_IMAGEN + EXTENSIONES_VIDEO):
+                        yield os.path.join(raiz, nombre)
+        else:
+            yield ruta
+
+
+def leer_frames(ruta, paso=1):
+    """
+    Genera (fuente, indice, tiempo_seg, frame) de una imagen o un video.
+    En videos sólo se decodifica uno de cada `paso` frames: el resto se salta con grab().
+    tiempo_seg es None para imágenes sueltas.
+    """
+    if ruta.lower().endswith(EXTENSIONES_IMAGEN):
+        # imdecode en lugar de imread: admite rutas con caracteres no ASCII en Windows
+        imagen = cv2.imdecode(np.fromfile(ruta, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if imagen is None:
+            print(f"⚠️ No se pudo leer {ruta}; se omite")
+            return
+        yield ruta, 0, None, imagen
+        return
+
+    captura = cv2.VideoCapture(ruta)
+    if not captura.isOpened():
+        print(f"⚠️ No se pudo abrir {ruta}; se omite")
+        return
+    fps = captura.get(cv2.CAP_PROP_FPS) or 0.0
+    paso = max(1, int(paso))
+    try:
+        indice = 0
+        while True:
+            if not captura.grab():
+                break
+            if indice % paso == 0:
+                ret, frame = captura.retrieve()
+                if ret:
+                    tiempo = indice / fps if fps > 0 else captura.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    yield ruta, indice, tiempo, frame
+            indice += 1
+    finally:
+        captura.release()
+
+
+def frames_de(rutas, paso=1):
+    """Encadena los frames de todas las fuentes."""
+    for ruta in listar_fuentes(rutas):
+        yield from leer_frames(ruta, paso)
+
+
+# --------------------
+# Salida
+# --------------------
+class EscritorResultados:
+    """Escribe una fila por rostro en CSV o JSONL según la extensión (o `formato`)."""
+
+    def __init__(self, ruta, formato=None):
+        self.ruta = ruta
+        self.formato = formato or ("csv" if ruta.lower().endswith(".csv") else "jsonl")
+        if self.formato not in ("csv", "jsonl"):
+            raise ValueError(f"Formato desconocido: {self.formato}. Opciones: csv, jsonl")
+        carpeta = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(carpeta, exist_ok=True)
+        self._archivo = open(ruta, "w", encoding="utf-8", newline="")
+        self._csv = None
+        if self.formato == "csv":
+            self._csv = csv.writer(self._archivo)
+            self._csv.writerow(CAMPOS_RESULTADO)
+        self.filas = 0
+
+    def escribir(self, fila):
+        if self._csv is not None:
+            self._csv.writerow(["" if v is None else v for v in fila])
+        else:
+            self._archivo.write(json.dumps(dict(zip(CAMPOS_RESULTADO, fila)), ensure_ascii=False) + "\n")
+        self.filas += 1
+
+    def cerrar(self):
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+# --------------------
+# Procesamiento
+# --------------------
+class ProcesadorLotes:
+    """
+    Reconocimiento fuera de línea sobre videos y carpetas de imágenes.
+
+    Tubería de generadores con memoria acotada:
+      frames_de() → detección en `hilos` hilos (como mucho 2 * hilos frames en vuelo)
+      → lotes de hasta tam_lote recortes para el modelo → matching contra la galería.
+    Cada hilo de detección tiene su propio detector; el modelo de embeddings se comparte.
+    """
+
+    def __init__(self, reconocimiento, detector="haar", opciones_detector=None, multiresolucion=None,
+                 hilos=None, tam_lote=32, umbral_coseno=0.45):
+        self.reconocimiento = reconocimiento
+        self.detector = detector
+        self.opciones_detector = opciones_detector or {}
+        self.multiresolucion = multiresolucion
+        self.hilos = max(1, int(hilos or os.cpu_count() or 1))
+        self.tam_lote = max(1, int(tam_lote))
+        self.umbral_coseno = umbral_coseno
+        self._local = threading.local()
+
+    def _detector(self):
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = crear_detector(self.detector, **self.opciones_detector)
+            if self.multiresolucion:
+                # Sin región adaptativa: los frames de un hilo no son consecutivos
+                opciones = dict(self.multiresolucion, adaptativo=False)
+                detector = DetectorMultiresolucion(detector, **opciones)
+            self._local.detector = detector
+        return detector
+
+    def _detectar(self, item):
+        fuente, indice, tiempo, frame = item
+        faces, boxes = self.reconocimiento.detectar_rostros(frame, detector=self._detector())
+        # Los recortes se copian para no retener el frame completo mientras esperan al modelo
+        faces = [f.copy() for f in faces]
+        return fuente, indice, tiempo, faces, boxes
+
+    def detecciones(self, frames):
+        """Detecta en paralelo conservando el orden de los frames."""
+        en_vuelo = deque()
+        with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="lotes-deteccion") as ejecutor:
+            for item in frames:
+                en_vuelo.append(ejecutor.submit(self._detectar, item))
+                if len(en_vuelo) >= 2 * self.hilos:
+                    yield en_vuelo.popleft().result()
+            while en_vuelo:
+                yield en_vuelo.popleft().result()
+
+    def lotes(self, detecciones):
+        """Agrupa detecciones hasta reunir tam_lote recortes."""
+        lote, n = [], 0
+        for deteccion in detecciones:
+            lote.append(deteccion)
+            n += len(deteccion[3])
+            if n >= self.tam_lote:
+                yield lote
+                lote, n = [], 0
+        if lote:
+            yield lote
+
+    def resultados(self, frames):
+        """Genera (fuente, indice, tiempo, (x, y, w, h), identidad, distancia) por rostro."""
+        galeria_vacia = len(self.reconocimiento.galeria) == 0
+        for lote in self.lotes(self.detecciones(frames)):
+            recortes = [f for deteccion in lote for f in deteccion[3]]
+            nombres, distancias = ["Desconocido"] * len(recortes), [None] * len(recortes)
+            if recortes and not galeria_vacia:
+                embeddings, indices = self.reconocimiento.representar_rostros(recortes)
+                nombres, distancias = self.reconocimiento.identificar_embeddings(
+                    embeddings, indices, len(recortes), umbral_coseno=self.umbral_coseno, con_distancias=True
+                )
+            i = 0
+            for fuente, indice, tiempo, faces, boxes in lote:
+                for top, right, bottom, left in boxes:
+                    caja = (int(left), int(top), int(right - left), int(bottom - top))
+                    yield fuente, indice, tiempo, caja, nombres[i], distancias[i]
+                    i += 1
+
+    def procesar(self, rutas, escritor, paso=1):
+        """Procesa todas las fuentes y escribe los resultados. Devuelve estadísticas de rendimiento."""
+        contador = {"frames": 0}
+
+        def contados(frames):
+            for item in frames:
+                contador["frames"] += 1
+                yield item
+
+        inicio = time.perf_counter()
+        rostros = 0
+        for fuente, indice, tiempo, (x, y, w, h), nombre, distancia in self.resultados(contados(frames_de(rutas, paso))):
+            escritor.escribir((
+                fuente, indice, None if tiempo is None else round(tiempo, 3), x, y, w, h, nombre,
+                None if distancia is None else round(float(distancia), 4),
+            ))
+            rostros += 1
+        segundos = time.perf_counter() - inicio
+        return {
+            "frames": contador["frames"],
+            "rostros": rostros,
+            "segundos": segundos,
+            "frames_por_segundo": contador["frames"] / segundos if segundos > 0 else 0.0,
+            "rostros_por_segundo": rostros / segundos if segundos > 0 else 0.0,
+        }
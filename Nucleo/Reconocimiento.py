@@ -2,30 +2,281 @@
 
 import os
 import cv2
-import pickle
+import threading
 import numpy as np
-from deepface import DeepFace
 from datetime import datetime
 
-RUTA_DATOS = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "Datos"))
-RUTA_VECTORES = os.path.join(RUTA_DATOS, "vectores_deepface.pkl")
-os.makedirs(RUTA_DATOS, exist_ok=True)
+try:
+    from Nucleo.BaseDatos import obtener_base_datos
+    from Nucleo.Galeria import GaleriaVectores
+    from Nucleo.Indices import crear_indice
+    from Nucleo.Representacion import RepresentadorLotes
+    from Nucleo.RepositorioPlantillas import RUTA_REPOSITORIO, obtener_repositorio
+    from Nucleo.Enrolamiento import EnrolamientoMasivo
+    from Nucleo.CacheEmbeddings import obtener_cache
+    from Nucleo.Modelos import registro_modelos
+    from Nucleo.Detectores import DetectorMultiresolucion
+    from Nucleo.Metricas import metricas
+    from Nucleo.Decision import MotorDecision
+    from Nucleo.Calidad import EvaluadorCalidad
+except ImportError:
+    from BaseDatos import obtener_base_datos
+    from Galeria import GaleriaVectores
+    from Indices import crear_indice
+    from Representacion import RepresentadorLotes
+    from RepositorioPlantillas import RUTA_REPOSITORIO, obtener_repositorio
+    from Enrolamiento import EnrolamientoMasivo
+    from CacheEmbeddings import obtener_cache
+    from Modelos import registro_modelos
+    from Detectores import DetectorMultiresolucion
+    from Metricas import metricas
+    from Decision import MotorDecision
+    from Calidad import EvaluadorCalidad
+
+# --------------------
+# Seguimiento de rostros entre frames
+# --------------------
+def iou_cajas(a, b):
+    """
+    IoU entre dos conjuntos de cajas (top, right, bottom, left).
+    a: (N, 4), b: (M, 4). Devuelve matriz (N, M).
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class Pista:
+    """Estado de un rostro seguido entre frames."""
+
+    def __init__(self, id_pista, caja):
+        self.id = id_pista
+        self.caja = caja
+        self.caja_embedding = None   # caja en el último embedding
+        self.miniatura = None        # apariencia (gris 16x16) en el último embedding
+        self.miniatura_pendiente = None  # apariencia al pedir el embedding en curso
+        self.reabrir = False         # cambio de apariencia tras decidir: reiniciar al llegar el embedding
+        self.nombre = "Desconocido"
+        self.distancia = None
+        self.frames_desde_embedding = 0
+        self.perdidos = 0
+        self.embeddings = 0
+        # Decisión de acceso acumulada (ver Nucleo/Decision.py)
+        self.evidencia = {}          # nombre -> log-razón de verosimilitud acumulada
+        self.evidencia_total = 0.0
+        self.observaciones = 0
+        self.decision = None         # None (abierta), "PERMITIDO" o "DENEGADO"
+        self.identidad = None
+
+
+class SeguidorRostros:
+    """
+    Asocia las detecciones de cada frame a pistas existentes por IoU y decide qué rostros
+    necesitan un embedding nuevo. Una pista conserva su identidad y sólo se re-embebe
+    cada reembeber_cada frames, o antes si su caja o su apariencia cambian de forma notable.
+
+    Con un motor de decisión (MotorDecision) cada embedding suma evidencia a la pista y,
+    una vez decidido el acceso, la pista deja de embeberse: sólo un cambio brusco de
+    apariencia (otra persona bajo la misma caja) reabre la decisión.
+    """
+
+    def __init__(self, umbral_iou=0.3, reembeber_cada=15, umbral_cambio_caja=0.6,
+                 umbral_cambio_apariencia=25.0, max_perdidos=5, motor=None):
+        self.umbral_iou = umbral_iou
+        self.reembeber_cada = reembeber_cada
+        self.umbral_cambio_caja = umbral_cambio_caja
+        self.umbral_cambio_apariencia = umbral_cambio_apariencia
+        self.max_perdidos = max_perdidos
+        self.motor = motor
+        self.pistas = []
+        self._siguiente_id = 1
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def miniatura(recorte):
+        """Huella de apariencia barata: recorte en gris reducido a 16x16."""
+        if recorte.ndim == 3:
+            recorte = cv2.cvtColor(recorte, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(recorte, (16, 16), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def _requiere_embedding(self, pista, caja, mini):
+        if pista.decision is not None:
+            # La decisión se reabre en asignar(), cuando de verdad llega un embedding nuevo: si el
+            # recorte se descarta (calidad, colas) la pista sigue pidiéndolo en los frames siguientes
+            pista.reabrir = (pista.miniatura is not None
+                             and float(np.mean(np.abs(mini - pista.miniatura))) > self.umbral_cambio_apariencia)
+            return pista.reabrir
+        if pista.caja_embedding is None or pista.frames_desde_embedding >= self.reembeber_cada:
+            return True
+        if iou_cajas([caja], [pista.caja_embedding])[0, 0] < self.umbral_cambio_caja:
+            return True
+        if pista.miniatura is not None and float(np.mean(np.abs(mini - pista.miniatura))) > self.umbral_cambio_apariencia:
+            return True
+        return False
+
+    def asociar(self, boxes, faces):
+        """
+        Asocia las cajas del frame con las pistas. Devuelve (pistas, pendientes):
+        pistas: una Pista por caja (mismo orden); pendientes: índices de cajas que deben embeberse.
+        """
+        with self._lock:
+            asignadas = [None] * len(boxes)
+            if self.pistas and boxes:
+                ious = iou_cajas(boxes, [p.caja for p in self.pistas])
+                # Asociación voraz: primero los pares con mayor IoU
+                for idx in np.argsort(-ious, axis=None):
+                    i, j = np.unravel_index(idx, ious.shape)
+                    if ious[i, j] < self.umbral_iou:
+                        break
+                    if asignadas[i] is not None or self.pistas[j] in asignadas:
+                        continue
+                    asignadas[i] = self.pistas[j]
+
+            pendientes = []
+            for i, caja in enumerate(boxes):
+                pista = asignadas[i]
+                if pista is None:
+                    pista = Pista(self._siguiente_id, caja)
+                    self._siguiente_id += 1
+                    self.pistas.append(pista)
+                    asignadas[i] = pista
+                pista.caja = caja
+                pista.perdidos = 0
+                pista.frames_desde_embedding += 1
+                mini = self.miniatura(faces[i])
+                if self._requiere_embedding(pista, caja, mini):
+                    pista.miniatura_pendiente = mini
+                    pendientes.append(i)
+
+            # Envejecer y eliminar las pistas que no aparecieron en este frame
+            vistas = set(id(p) for p in asignadas)
+            for pista in self.pistas:
+                if id(pista) not in vistas:
+                    pista.perdidos += 1
+            self.pistas = [p for p in self.pistas if p.perdidos <= self.max_perdidos]
+            return asignadas, pendientes
+
+    def asignar(self, pistas, nombres, distancias):
+        """
+        Registra en las pistas el resultado de un embedding nuevo. Sólo aquí se actualizan la
+        caja y la apariencia de referencia y se reabre una decisión: un recorte pendiente que
+        no llega a embeberse no gasta el disparador.
+        """
+        with self._lock:
+            for pista, nombre, distancia in zip(pistas, nombres, distancias):
+                if pista.reabrir:
+                    pista.reabrir = False
+                    if self.motor is not None:
+                        self.motor.reiniciar(pista)
+                if pista.miniatura_pendiente is not None:
+                    pista.miniatura = pista.miniatura_pendiente
+                pista.nombre = nombre
+                pista.distancia = None if distancia is None else float(distancia)
+                pista.caja_embedding = pista.caja
+                pista.frames_desde_embedding = 0
+                pista.embeddings += 1
+                if self.motor is not None and self.motor.observar(pista, nombre, distancia) is not None:
+                    pista.nombre = pista.identidad
+
+    def reiniciar(self):
+        with self._lock:
+            self.pistas = []
+
 
 class ReconocimientoFacial:
-    def __init__(self, modelo="Facenet"):
-        # Detector Haar (se deja accesible para código que lo use directamente)
-        self.detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        # Almacenamiento en memoria
-        self.known_face_encodings = []  # lista de np.array embeddings
-        self.known_face_names = []      # lista de nombres (strings)
+    def __init__(self, modelo="Facenet", detector="haar", opciones_detector=None, multiresolucion=None,
+                 indice=None, opciones_indice=None, decision_temporal=True, filtro_calidad=True):
+        # Detector Haar compartido por proceso (se deja accesible para código que lo use directamente)
+        self.detector = registro_modelos.detector_haar()
+        # Detector de rostros configurable: "haar", "lbp", "ssd" o "yunet" (ver Nucleo/Detectores.py)
+        self.detector_rostros = registro_modelos.detector(detector, **(opciones_detector or {}))
+        # Detección en reducido / ROI / región adaptativa, p. ej. {"escala": 0.5, "adaptativo": True}.
+        # Tiene estado por flujo, así que es propio de esta instancia (el detector base se comparte).
+        self.detector_video = self.detector_rostros
+        if multiresolucion:
+            self.detector_video = DetectorMultiresolucion(self.detector_rostros, **multiresolucion)
+        # Almacenamiento en memoria: matriz normalizada + nombres paralelos.
+        # indice: None (exhaustivo), "ivf", "prototipos" (centroide + prototipos por persona) o
+        # "cuantizado" (int8 con reordenado exacto; opciones_indice={"modo": "int8"})
+        self.galeria = GaleriaVectores(indice=crear_indice(indice, **(opciones_indice or {})) if indice else None)
         self.modelo = modelo
+        # Extracción de embeddings por lotes (una llamada al modelo por frame)
+        self.representador = RepresentadorLotes(modelo)
+        # Buffers de conversión reutilizados entre frames (uno por hilo)
+        self._buffers = threading.local()
+        # Seguimiento para no re-embeber el mismo rostro en cada frame; con decision_temporal
+        # el acceso se decide por evidencia acumulada y la pista decidida deja de embeberse
+        self.seguidor = SeguidorRostros(motor=MotorDecision() if decision_temporal else None)
+        # Puntaje de calidad previo al embedding: los recortes borrosos, pequeños, mal
+        # iluminados o de perfil no se embeben (ver Nucleo/Calidad.py)
+        self.calidad = EvaluadorCalidad() if filtro_calidad else None
+        # Persistencia: repositorio de plantillas único, compartido con las ventanas
+        self.ruta_repositorio = RUTA_REPOSITORIO
+
+    @property
+    def repositorio(self):
+        return obtener_repositorio(self.ruta_repositorio)
+
+    @property
+    def cache(self):
+        """Caché en disco de embeddings por contenido de imagen (ver Nucleo/CacheEmbeddings.py)."""
+        return obtener_cache()
+
+    # --------------------
+    # Acceso a la galería
+    # --------------------
+    @property
+    def known_face_encodings(self):
+        """Plantillas (normalizadas) como matriz (N, D). Sólo lectura: usar agregar_rostro()."""
+        return self.galeria.matriz
+
+    @property
+    def known_face_names(self):
+        """Nombres paralelos a known_face_encodings. Sólo lectura."""
+        return list(self.galeria.nombres)
+
+    def agregar_rostro(self, embedding, nombre, id_usuario=None):
+        """Añade una (D,) o varias (N, D) plantillas a la galería (sin persistirlas)."""
+        if isinstance(nombre, str) and np.ndim(embedding) == 2:
+            nombre = [nombre] * len(embedding)
+        self.galeria.agregar(embedding, nombre, id_usuario)
+
+    def eliminar_rostro(self, nombre):
+        """Quita de la galería todas las plantillas de una persona."""
+        return self.galeria.eliminar(nombre)
+
+    def registrar_usuario(self, id_usuario, nombre, embeddings):
+        """Persiste en el repositorio las plantillas de un usuario (sólo anexado) y las añade a la galería."""
+        vectores = self.repositorio.agregar(id_usuario, nombre, embeddings)
+        self.galeria.agregar(vectores, nombre, id_usuario)
+        return len(vectores)
+
+    def eliminar_usuario(self, id_usuario, base_datos=None):
+        """
+        Da de baja a un usuario: sus plantillas del repositorio y de la galería y su fila de
+        la base de datos (la compartida si no se indica otra). Devuelve cuántas plantillas
+        se quitaron de la galería.
+        """
+        self.repositorio.eliminar(id_usuario)
+        eliminadas = self.galeria.eliminar_usuario(id_usuario)
+        (base_datos or obtener_base_datos()).eliminar_usuario(id_usuario)
+        return eliminadas
 
     # --------------------
     # Captura de rostro
     # --------------------
-    def capturar_rostro(self, ruta_destino, mostrar_preview=False, cam_index=0, timeout_sec=7):
+    def capturar_rostro(self, ruta_destino, mostrar_preview=False, cam_index=0, timeout_sec=7, rafaga=10):
         """
-        Abre la cámara, captura el primer frame que contenga un rostro detectado, guarda el recorte (BGR) en ruta_destino.
+        Abre la cámara, observa una ráfaga de hasta `rafaga` frames con rostro y guarda en
+        ruta_destino el recorte (BGR) de mejor calidad (ver Nucleo/Calidad.py), no el primero.
         Devuelve True si se guardó correctamente, False en caso contrario.
         """
         cap = cv2.VideoCapture(cam_index)
@@ -33,54 +284,57 @@ class ReconocimientoFacial:
             print("❌ No se pudo abrir la cámara para captura.")
             return False
 
+        calidad = self.calidad or EvaluadorCalidad()
         inicio = datetime.now()
-        guardado = False
+        mejor, mejor_puntaje = None, 0.0
+        con_rostro = 0
 
-        while (datetime.now() - inicio).total_seconds() < timeout_sec:
+        while (datetime.now() - inicio).total_seconds() < timeout_sec and con_rostro < rafaga:
             ret, frame = cap.read()
             if not ret:
                 continue
 
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(80,80))
+            faces = self.detector_rostros.detectar(frame, tam_minimo=80)
+            if len(faces) > 0:
+                con_rostro += 1
+                recortes = [frame[y:y+h, x:x+w] for (x, y, w, h) in faces]
+                i, puntaje = calidad.mejor(recortes)
+                if i is not None and puntaje > mejor_puntaje:
+                    mejor, mejor_puntaje = recortes[i].copy(), puntaje
 
             # Mostrar previsualización si se pide (no bloqueante)
             if mostrar_preview:
                 try:
                     cv2.imshow("Captura - Alinee su rostro y presione 's' para guardar", frame)
                     k = cv2.waitKey(1) & 0xFF
-                    if k == ord('s') and len(faces) > 0:
-                        # guardar primer rostro detectado
-                        x,y,w,h = faces[0]
-                        rostro = frame[y:y+h, x:x+w]
-                        cv2.imwrite(ruta_destino, rostro)
-                        guardado = True
+                    if k == ord('s') and mejor is not None:
+                        # guardar el mejor rostro visto hasta ahora
                         break
                     elif k == ord('q'):
+                        mejor = None
                         break
                 except Exception:
                     pass
 
-            # Si detectó rostros, guardar el primero automáticamente
-            if len(faces) > 0:
-                x,y,w,h = faces[0]
-                rostro = frame[y:y+h, x:x+w]
-                # Guardar color BGR (para DeepFace)
-                try:
-                    cv2.imwrite(ruta_destino, rostro)
-                    guardado = True
-                except Exception as e:
-                    print(f"❌ Error guardando imagen: {e}")
-                break
-
         cap.release()
         try:
             cv2.destroyAllWindows()
         except Exception:
             pass
 
+        guardado = False
+        if mejor is not None:
+            # Guardar color BGR (para DeepFace)
+            try:
+                cv2.imwrite(ruta_destino, mejor)
+                guardado = True
+            except Exception as e:
+                print(f"❌ Error guardando imagen: {e}")
+
         if guardado:
-            print(f"📸 Rostro guardado en: {ruta_destino}")
+            print(f"📸 Rostro guardado en: {ruta_destino} (calidad {mejor_puntaje:.2f})")
+        elif con_rostro:
+            print("⚠️ Rostro detectado pero con calidad insuficiente (nitidez, luz o pose).")
         else:
             print("⚠️ No se capturó ningún rostro.")
 
@@ -89,89 +343,140 @@ class ReconocimientoFacial:
     # --------------------
     # Entrenamiento desde carpeta (extrae embeddings)
     # --------------------
-    def entrenar_desde_carpeta(self, carpeta_entrenamiento, guardar=True):
+    def entrenar_desde_carpeta(self, carpeta_entrenamiento, guardar=True, procesos=None, tam_bloque=64):
         """
         Carpeta con estructura: carpeta_entrenamiento/nombre_usuario/imagen.jpg
-        Extrae 1 embedding por imagen válida y lo añade a la memoria.
+        Extrae 1 embedding por imagen válida en un pool de `procesos` procesos (ver
+        Nucleo/Enrolamiento.py) y los añade por bloques de tam_bloque. Con guardar=True se
+        anexan al repositorio y el enrolamiento es reanudable: las imágenes cuyo contenido
+        ya se embebió se omiten. Devuelve las estadísticas del enrolamiento.
         """
         carpeta_entrenamiento = os.path.abspath(carpeta_entrenamiento)
         if not os.path.isdir(carpeta_entrenamiento):
             print(f"⚠️ Carpeta de entrenamiento no encontrada: {carpeta_entrenamiento}")
-            return
+            return None
 
-        count = 0
-        for nombre_persona in sorted(os.listdir(carpeta_entrenamiento)):
-            ruta_persona = os.path.join(carpeta_entrenamiento, nombre_persona)
-            if not os.path.isdir(ruta_persona):
-                continue
-            for fname in os.listdir(ruta_persona):
-                if not fname.lower().endswith((".png", ".jpg", ".jpeg")):
-                    continue
-                ruta_img = os.path.join(ruta_persona, fname)
-                try:
-                    # enforce_detection=True para asegurar que haya un rostro claro en las imágenes de entrenamiento
-                    rep = DeepFace.represent(ruta_img, model_name=self.modelo, enforce_detection=True)
-                    if isinstance(rep, list) and len(rep) > 0:
-                        emb = np.array(rep[0]["embedding"], dtype=np.float32)
-                        self.known_face_encodings.append(emb)
-                        self.known_face_names.append(nombre_persona)
-                        count += 1
-                        print(f"✅ Embedding extraído: {nombre_persona} <- {fname}")
-                except Exception as e:
-                    print(f"⚠️ Omitida imagen {ruta_img}: {e}")
-
-        if guardar:
-            self._guardar_vectores()
-
-        print(f"🎯 Entrenamiento completado. Embeddings extraídos: {count}")
+        def al_bloque(ids, nombres, vectores):
+            # El nombre de la carpeta hace de id de usuario; un append por persona del bloque
+            for persona in dict.fromkeys(ids):
+                filas = [i for i, id_ in enumerate(ids) if id_ == persona]
+                if guardar:
+                    # Sólo se anexan las plantillas nuevas; las existentes no se reescriben
+                    self.registrar_usuario(persona, nombres[filas[0]], vectores[filas])
+                else:
+                    self.agregar_rostro(vectores[filas], nombres[filas[0]], persona)
+            print(f"💾 {len(ids)} vectores {'anexados' if guardar else 'añadidos'}")
+
+        enrolamiento = EnrolamientoMasivo(
+            self.modelo, procesos=procesos, tam_bloque=tam_bloque,
+            ruta_registro=os.path.join(self.ruta_repositorio, "enrolados.jsonl") if guardar else None,
+            cache=self.cache,
+        )
+        stats = enrolamiento.ejecutar(carpeta_entrenamiento, al_bloque)
+        print(f"🎯 Entrenamiento completado. Embeddings extraídos: {stats['embebidas']} "
+              f"({stats['omitidas']} ya enrolados, {stats['fallidas']} omitidos, "
+              f"{stats['imagenes_por_segundo']:.1f} img/s)")
+        return stats
 
     # --------------------
     # Cargar vectores desde disco
     # --------------------
     def cargar_vectores(self):
-        if not os.path.exists(RUTA_VECTORES):
-            print("ℹ️ No hay vectores guardados aún.")
-            return
+        """
+        Carga las plantillas del repositorio sin copiarlas (np.memmap); con un índice
+        cuantizado la galería sólo guarda los códigos y lee del memmap las filas a reordenar.
+        La primera apertura del repositorio migra los almacenes anteriores si existen.
+        """
         try:
-            with open(RUTA_VECTORES, "rb") as f:
-                data = pickle.load(f)
-            encs = data.get("encodings", [])
-            names = data.get("names", [])
-            self.known_face_encodings = [np.array(x, dtype=np.float32) for x in encs]
-            self.known_face_names = names
-            print(f"📥 Vectores cargados: {len(self.known_face_encodings)}")
+            matriz, filas, ids, nombres = self.repositorio.fuente()
         except Exception as e:
             print(f"❌ Error cargando vectores: {e}")
+            return
+        if len(ids) == 0:
+            print("ℹ️ No hay vectores guardados aún.")
+            return
+        self.galeria.adoptar(matriz, nombres, ids, filas=filas)
+        print(f"📥 Vectores cargados: {len(self.galeria)}")
+
+    # --------------------
+    # Embeddings de recortes
+    # --------------------
+    def embeber_imagen(self, ruta_imagen):
+        """
+        Embedding (D,) de una foto de registro (con detección obligatoria) o None si no hay rostro.
+        Se consulta antes la caché por contenido: sólo se llama al modelo si la imagen cambió.
+        """
+        def calcular(ruta):
+            from deepface import DeepFace
+
+            rep = DeepFace.represent(ruta, model_name=self.modelo, enforce_detection=True)
+            if isinstance(rep, list) and len(rep) > 0:
+                return np.array(rep[0]["embedding"], dtype=np.float32)
+            return None
+
+        return self.cache.embeber_archivo(ruta_imagen, self.modelo, calcular)
 
-    def _guardar_vectores(self):
-        data = {
-            "encodings": [e.tolist() for e in self.known_face_encodings],
-            "names": self.known_face_names
-        }
+    def representar_rostros(self, recortes):
+        """
+        Devuelve (embeddings (N, D), indices) para los recortes BGR dados.
+        Usa un único lote del modelo; si falla, recurre a DeepFace.represent por recorte.
+        indices indica qué recortes produjeron embedding (mismo orden que las filas).
+        """
+        with metricas.tramo("representacion"):
+            return self._representar_rostros(recortes)
+
+    def _representar_rostros(self, recortes):
         try:
-            with open(RUTA_VECTORES, "wb") as f:
-                pickle.dump(data, f)
-            print(f"💾 Vectores guardados en: {RUTA_VECTORES}")
+            return self.representador.representar(recortes), list(range(len(recortes)))
         except Exception as e:
-            print(f"❌ Error guardando vectores: {e}")
+            print(f"⚠️ Representación por lotes no disponible, se usa DeepFace.represent: {e}")
+
+        from deepface import DeepFace
+
+        embeddings = []
+        indices = []
+        for i, face_img in enumerate(recortes):
+            try:
+                # Represent con enforce_detection=False para aceptar crops
+                rep = DeepFace.represent(face_img, model_name=self.modelo, enforce_detection=False)
+                if isinstance(rep, list) and len(rep) > 0:
+                    embeddings.append(np.array(rep[0]["embedding"], dtype=np.float32))
+                    indices.append(i)
+            except Exception:
+                continue
+        if len(embeddings) == 0:
+            return np.empty((0, 0), dtype=np.float32), []
+        return np.stack(embeddings), indices
 
     # --------------------
     # Reconocer en un frame (BGR)
     # --------------------
-    def reconocer_rostro(self, frame_bgr, umbral_coseno=0.45, usar_detector_haar=True):
+    def _gris(self, frame_bgr):
+        """Conversión a gris en un buffer preasignado por hilo (sin reservar memoria por frame)."""
+        buffer = getattr(self._buffers, "gris", None)
+        if buffer is None or buffer.shape != frame_bgr.shape[:2]:
+            buffer = np.empty(frame_bgr.shape[:2], dtype=np.uint8)
+            self._buffers.gris = buffer
+        return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY, dst=buffer)
+
+    def detectar_rostros(self, frame_bgr, usar_detector_haar=True, detector=None):
         """
-        Recibe frame BGR, devuelve (boxes, names)
-        boxes: lista de tuplas (top, right, bottom, left) — igual formato que face_recognition
-        names: lista de strings (mismos índices que boxes)
+        Detecta rostros en un frame BGR. Devuelve (faces, boxes):
+        faces: recortes BGR; boxes: tuplas (top, right, bottom, left).
+        Con multiresolución la detección corre sobre una imagen reducida, pero las cajas
+        y los recortes son siempre del frame a resolución completa.
+        detector: detector propio del flujo (p. ej. una cámara de GestorCamaras);
+        por defecto self.detector_video.
         """
-        rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-
+        detector = self.detector_video if detector is None else detector
         faces = []
         boxes = []
 
         if usar_detector_haar:
-            rects = self.detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(60,60))
+            with metricas.tramo("deteccion"):
+                # Sólo la conversión que el detector necesita, en un buffer reutilizado
+                gray = self._gris(frame_bgr) if getattr(detector, "usa_gris", False) else None
+                rects = detector.detectar(frame_bgr, gray)
             for (x, y, w, h) in rects:
                 face = frame_bgr[y:y+h, x:x+w]
                 faces.append(face)
@@ -181,34 +486,77 @@ class ReconocimientoFacial:
             faces.append(frame_bgr)
             boxes.append((0, frame_bgr.shape[1], frame_bgr.shape[0], 0))
 
-        names = []
-        for face_img, box in zip(faces, boxes):
-            try:
-                # Represent con enforce_detection=False para aceptar crops
-                rep = DeepFace.represent(face_img, model_name=self.modelo, enforce_detection=False)
-                if not isinstance(rep, list) or len(rep) == 0:
-                    names.append("Desconocido")
-                    continue
-                emb = np.array(rep[0]["embedding"], dtype=np.float32)
-            except Exception:
-                names.append("Desconocido")
-                continue
+        return faces, boxes
 
-            if len(self.known_face_encodings) == 0:
-                names.append("Desconocido")
-                continue
+    def identificar_embeddings(self, embeddings, indices, n_rostros, umbral_coseno=0.45, con_distancias=False):
+        """
+        Asigna nombre a n_rostros a partir de los embeddings de representar_rostros().
+        Los rostros sin embedding o sobre el umbral quedan como "Desconocido".
+        Con con_distancias=True devuelve (names, distancias); None donde no hubo embedding.
+        """
+        names = ["Desconocido"] * n_rostros
+        distancias = [None] * n_rostros
+        if embeddings is not None and len(indices) > 0 and len(self.galeria) > 0:
+            # Distancia coseno de todos los rostros contra toda la galería en un solo producto matricial
+            with metricas.tramo("matching"):
+                encontrados, dists = self.galeria.identificar(embeddings, umbral_coseno=umbral_coseno)
+            for i, nombre, d in zip(indices, encontrados, dists):
+                names[i] = nombre
+                distancias[i] = float(d)
+        if con_distancias:
+            return names, distancias
+        return names
 
-            # Distancia coseno (entre 0 y 2, idealmente 0 para idénticos)
-            def cosine(a, b):
-                return 1 - (np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-10))
+    def filtrar_calidad(self, faces, indices=None):
+        """
+        Índices (de `indices`, por defecto todos los recortes) cuya calidad justifica un
+        embedding. Todos los recortes se puntúan en una sola pasada.
+        """
+        indices = list(range(len(faces))) if indices is None else list(indices)
+        if self.calidad is None or not indices:
+            return indices
+        with metricas.tramo("calidad"):
+            aceptados = self.calidad.aceptables([faces[i] for i in indices])
+        return [i for i, ok in zip(indices, aceptados) if ok]
+
+    def embeber_pendientes(self, faces, pistas, pendientes, umbral_coseno=0.45):
+        """
+        Embebe sólo los rostros pendientes del seguidor que pasan el filtro de calidad y
+        actualiza sus pistas; los descartados se reintentan en el frame siguiente.
+        """
+        pendientes = self.filtrar_calidad(faces, pendientes)
+        if not pendientes:
+            return
+        recortes = [faces[i] for i in pendientes]
+        if len(self.galeria) == 0:
+            nombres, distancias = ["Desconocido"] * len(recortes), [None] * len(recortes)
+        else:
+            embeddings, indices = self.representar_rostros(recortes)
+            nombres, distancias = self.identificar_embeddings(
+                embeddings, indices, len(recortes), umbral_coseno, con_distancias=True
+            )
+        self.seguidor.asignar([pistas[i] for i in pendientes], nombres, distancias)
 
-            distances = [cosine(emb, k) for k in self.known_face_encodings]
-            best_idx = int(np.argmin(distances))
-            best_dist = distances[best_idx]
+    def reconocer_rostro(self, frame_bgr, umbral_coseno=0.45, usar_detector_haar=True, usar_seguimiento=False):
+        """
+        Recibe frame BGR, devuelve (boxes, names)
+        boxes: lista de tuplas (top, right, bottom, left) — igual formato que face_recognition
+        names: lista de strings (mismos índices que boxes)
+        Con usar_seguimiento=True sólo se embeben los rostros nuevos o que cambiaron;
+        el resto reutiliza la identidad de su pista.
+        """
+        faces, boxes = self.detectar_rostros(frame_bgr, usar_detector_haar)
+        if usar_seguimiento:
+            pistas, pendientes = self.seguidor.asociar(boxes, faces)
+            self.embeber_pendientes(faces, pistas, pendientes, umbral_coseno)
+            return boxes, [p.nombre for p in pistas]
 
-            if best_dist <= umbral_coseno:
-                names.append(self.known_face_names[best_idx])
-            else:
-                names.append("Desconocido")
+        names = ["Desconocido"] * len(faces)
+        validos = self.filtrar_calidad(faces)
+        if len(validos) == 0 or len(self.galeria) == 0:
+            return boxes, names
 
-        return boxes, names
\ No newline at end of file
+        embeddings, indices = self.representar_rostros([faces[i] for i in validos])
+        for i, nombre in zip(validos, self.identificar_embeddings(embeddings, indices, len(validos), umbral_coseno)):
+            names[i] = nombre
+        return boxes, names
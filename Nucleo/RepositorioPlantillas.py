@@ -0,0 +1,287 @@
+# Nucleo/RepositorioPlantillas.py
+
+import json
+import os
+import threading
+
+import numpy as np
+
+try:
+    from Nucleo.AlmacenVectores import AlmacenVectores, migrar_legado
+except ImportError:
+    from AlmacenVectores import AlmacenVectores, migrar_legado
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RUTA_DATOS = os.path.join(PROJECT_ROOT, "Datos")
+RUTA_REPOSITORIO = os.path.join(RUTA_DATOS, "plantillas")
+
+# Ubicaciones anteriores (sólo para la migración inicial)
+RUTA_DATOS_ANTIGUA = os.path.abspath(os.path.join(PROJECT_ROOT, "..", "Datos"))
+RUTAS_EMBEDDINGS_ANTIGUAS = [
+    os.path.join(RUTA_DATOS, "embeddings"),
+    os.path.abspath(os.path.join("Datos", "embeddings")),
+]
+
+
+class RepositorioPlantillas:
+    """
+    Repositorio único de plantillas faciales, compartido por reconocimiento, ventana
+    principal y registro.
+
+    Sobre AlmacenVectores añade identificadores de usuario, borrado y consulta por usuario:
+      - agregar(): O(1), anexa filas al almacén actual.
+      - eliminar(): O(1), anexa una marca de borrado; las filas se descartan al compactar.
+      - compactar(): reescribe sólo las filas vivas en una nueva generación y la activa
+        reemplazando atómicamente el archivo "actual". Un corte en cualquier punto deja
+        el repositorio en la generación anterior, íntegra.
+    """
+
+    def __init__(self, directorio=RUTA_REPOSITORIO, umbral_compactacion=0.25):
+        self.directorio = directorio
+        self.ruta_actual = os.path.join(directorio, "actual")
+        self.umbral_compactacion = umbral_compactacion
+        self._lock = threading.RLock()
+        self._generacion = None
+        self.almacen = None
+        self._abierto = False
+
+    # --------------------
+    # Generaciones
+    # --------------------
+    def _base(self, generacion):
+        return os.path.join(self.directorio, f"plantillas-g{generacion}")
+
+    def _ruta_borrados(self):
+        return self._base(self._generacion) + ".borrados.jsonl"
+
+    def _activar(self, generacion):
+        tmp = self.ruta_actual + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(generacion))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ruta_actual)
+
+    def _migrar(self):
+        """Crea la generación 1 a partir de los almacenes anteriores."""
+        almacen = AlmacenVectores(self._base(1))
+        previo = AlmacenVectores(os.path.join(RUTA_DATOS_ANTIGUA, "plantillas"))
+        if previo.existe():
+            matriz, ids, nombres = previo.cargar()
+            almacen.escribir(np.asarray(matriz), ids, nombres)
+            print(f"🔄 Migradas {len(ids)} plantillas desde {previo.ruta_matriz}")
+        else:
+            for ruta_emb in RUTAS_EMBEDDINGS_ANTIGUAS:
+                npy = os.path.join(ruta_emb, "embeddings.npy")
+                if os.path.exists(npy):
+                    break
+            else:
+                npy = None
+            migrar_legado(
+                almacen,
+                ruta_pkl=os.path.join(RUTA_DATOS_ANTIGUA, "vectores_deepface.pkl"),
+                ruta_npy=npy,
+                ruta_nombres=os.path.join(os.path.dirname(npy), "nombres.json") if npy else None,
+            )
+        if not almacen.existe():
+            almacen.escribir(np.empty((0, 0), dtype=np.float32), [], [])
+        self._activar(1)
+
+    def _limpiar_generaciones(self):
+        """Borra archivos de generaciones que no son la actual (restos de una compactación)."""
+        prefijo_actual = os.path.basename(self._base(self._generacion)) + "."
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith("plantillas-g") and not nombre.startswith(prefijo_actual):
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    pass
+
+    # --------------------
+    # Apertura
+    # --------------------
+    def abrir(self):
+        """Carga el repositorio (migrando la primera vez). Idempotente."""
+        with self._lock:
+            if self._abierto:
+                return self
+            os.makedirs(self.directorio, exist_ok=True)
+            if not os.path.exists(self.ruta_actual):
+                self._migrar()
+            with open(self.ruta_actual, "r", encoding="utf-8") as f:
+                self._generacion = int(f.read().strip())
+            self.almacen = AlmacenVectores(self._base(self._generacion))
+            self._limpiar_generaciones()
+
+            matriz, ids, nombres = self.almacen.cargar()
+            self._matriz = matriz
+            self._extra = []               # filas anexadas después de abrir (no están en el memmap)
+            self._ids = list(ids)
+            self._nombres = list(nombres)
+            self._vivas = np.ones(len(ids), dtype=bool)
+            self._filas_usuario = {}
+            for fila, id_ in enumerate(self._ids):
+                self._filas_usuario.setdefault(id_, []).append(fila)
+
+            if os.path.exists(self._ruta_borrados()):
+                with open(self._ruta_borrados(), "r", encoding="utf-8") as f:
+                    for linea in f:
+                        marca = json.loads(linea)
+                        self._aplicar_borrado(marca["id"], marca["hasta"])
+            self._abierto = True
+            return self
+
+    def _aplicar_borrado(self, id_usuario, hasta):
+        filas = self._filas_usuario.get(id_usuario, [])
+        borradas = [f for f in filas if f < hasta]
+        restantes = [f for f in filas if f >= hasta]
+        self._vivas[borradas] = False
+        if restantes:
+            self._filas_usuario[id_usuario] = restantes
+        else:
+            self._filas_usuario.pop(id_usuario, None)
+        return len(borradas)
+
+    # --------------------
+    # Consulta
+    # --------------------
+    def __len__(self):
+        with self._lock:
+            return int(np.count_nonzero(self._vivas)) if self._abierto else 0
+
+    @property
+    def dimension(self):
+        if self._matriz.ndim == 2 and self._matriz.shape[1]:
+            return self._matriz.shape[1]
+        return len(self._extra[0]) if self._extra else None
+
+    def _fila(self, i):
+        n_mapa = len(self._matriz)
+        return self._matriz[i] if i < n_mapa else self._extra[i - n_mapa]
+
+    def usuarios(self):
+        with self._lock:
+            return list(self._filas_usuario)
+
+    def contiene(self, id_usuario):
+        with self._lock:
+            return id_usuario in self._filas_usuario
+
+    def buscar_usuario(self, id_usuario):
+        """Plantillas (k, D) de un usuario; (0, D) si no existe."""
+        with self._lock:
+            filas = self._filas_usuario.get(id_usuario, [])
+            if not filas:
+                return np.empty((0, self.dimension or 0), dtype=np.float32)
+            return np.stack([self._fila(f) for f in filas])
+
+    def activos(self):
+        """
+        Devuelve (matriz, ids, nombres) de las filas vivas. Sin borrados ni altas
+        posteriores a la apertura, la matriz es el propio np.memmap (sin copia).
+        """
+        with self._lock:
+            if not self._extra and bool(self._vivas.all()):
+                return self._matriz, list(self._ids), list(self._nombres)
+            partes = [np.asarray(self._matriz)] if len(self._matriz) else []
+            if self._extra:
+                partes.append(np.stack(self._extra))
+            completa = np.concatenate(partes) if partes else np.empty((0, 0), dtype=np.float32)
+            vivas = np.flatnonzero(self._vivas)
+            return (completa[vivas], [self._ids[i] for i in vivas], [self._nombres[i] for i in vivas])
+
+    def fuente(self):
+        """
+        Como activos(), pero sin copiar aunque haya borrados: devuelve (matriz, filas, ids,
+        nombres), con filas los índices de las filas vivas de matriz (None si lo son todas),
+        para GaleriaVectores.adoptar. Sólo las altas posteriores a la apertura obligan a
+        concatenar (copiar) la matriz.
+        """
+        with self._lock:
+            vivas = np.flatnonzero(self._vivas)
+            if self._extra:
+                partes = [np.asarray(self._matriz)] if len(self._matriz) else []
+                partes.append(np.stack(self._extra))
+                matriz = np.concatenate(partes)
+            else:
+                matriz = self._matriz
+            filas = None if len(vivas) == len(self._vivas) else vivas
+            return matriz, filas, [self._ids[i] for i in vivas], [self._nombres[i] for i in vivas]
+
+    # --------------------
+    # Modificación
+    # --------------------
+    def agregar(self, id_usuario, nombre, vectores):
+        """Anexa una o varias plantillas (normalizadas aquí) de un usuario."""
+        vectores = np.asarray(vectores, dtype=np.float32)
+        if vectores.ndim == 1:
+            vectores = vectores[np.newaxis, :]
+        vectores = vectores / np.maximum(np.linalg.norm(vectores, axis=1, keepdims=True), 1e-10)
+        ids = [id_usuario] * len(vectores)
+        nombres = [nombre] * len(vectores)
+        with self._lock:
+            self.abrir()
+            self.almacen.anexar(vectores, ids, nombres)
+            inicio = len(self._ids)
+            self._extra.extend(vectores)
+            self._ids.extend(ids)
+            self._nombres.extend(nombres)
+            self._vivas = np.concatenate([self._vivas, np.ones(len(vectores), dtype=bool)])
+            self._filas_usuario.setdefault(id_usuario, []).extend(range(inicio, inicio + len(vectores)))
+        return vectores
+
+    def eliminar(self, id_usuario):
+        """Marca como borradas todas las plantillas del usuario. Devuelve cuántas."""
+        with self._lock:
+            self.abrir()
+            if id_usuario not in self._filas_usuario:
+                return 0
+            marca = {"id": id_usuario, "hasta": len(self._ids)}
+            with open(self._ruta_borrados(), "a", encoding="utf-8") as f:
+                f.write(json.dumps(marca, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            borradas = self._aplicar_borrado(id_usuario, marca["hasta"])
+
+            muertas = len(self._vivas) - int(np.count_nonzero(self._vivas))
+            if muertas > self.umbral_compactacion * len(self._vivas):
+                self.compactar()
+            return borradas
+
+    def compactar(self):
+        """Reescribe sólo las filas vivas en una nueva generación y la activa atómicamente."""
+        with self._lock:
+            self.abrir()
+            matriz, ids, nombres = self.activos()
+            anterior = self._generacion
+            nueva = anterior + 1
+            AlmacenVectores(self._base(nueva)).escribir(np.asarray(matriz), ids, nombres)
+            self._activar(nueva)
+
+            # A partir de aquí la generación anterior ya no se usa
+            for sufijo in (".rfv", ".ids.jsonl", ".borrados.jsonl"):
+                try:
+                    os.remove(self._base(anterior) + sufijo)
+                except OSError:
+                    pass
+            self._abierto = False
+            self.abrir()
+            print(f"🧹 Repositorio compactado: {len(ids)} plantillas (generación {nueva})")
+
+
+# --------------------
+# Instancia compartida por proceso
+# --------------------
+_repositorios = {}
+_lock_repositorios = threading.Lock()
+
+
+def obtener_repositorio(directorio=RUTA_REPOSITORIO):
+    """Devuelve (abriéndolo si hace falta) el repositorio compartido para ese directorio."""
+    directorio = os.path.abspath(directorio)
+    with _lock_repositorios:
+        repo = _repositorios.get(directorio)
+        if repo is None:
+            repo = RepositorioPlantillas(directorio)
+            _repositorios[directorio] = repo
+    return repo.abrir()
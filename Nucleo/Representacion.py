@@ -0,0 +1,101 @@
+# Nucleo/Representacion.py
+
+import cv2
+import numpy as np
+
+try:
+    from Nucleo.Modelos import registro_modelos
+except ImportError:
+    from Modelos import registro_modelos
+
+
+class RepresentadorLotes:
+    """
+    Extrae embeddings de varios recortes de rostro con una sola invocación del modelo.
+    Reproduce el preprocesado de DeepFace.represent para recortes ya detectados
+    (detector "skip"): redimensionado con relleno manteniendo proporción, BGR en [0, 1].
+    """
+
+    def __init__(self, modelo="Facenet"):
+        self.modelo = modelo
+        self._red = None
+        self._tam_entrada = None  # (alto, ancho)
+        self._buffer = None       # lote preasignado (B, H, W, 3) float32
+
+    # --------------------
+    # Carga del modelo
+    # --------------------
+    def _cargar(self):
+        if self._red is not None:
+            return
+        # El modelo se construye una sola vez por proceso y se comparte (ver Nucleo/Modelos.py)
+        self._red, self._tam_entrada = registro_modelos.modelo_embeddings(self.modelo)
+
+    @property
+    def tam_entrada(self):
+        self._cargar()
+        return self._tam_entrada
+
+    # --------------------
+    # Preprocesado
+    # --------------------
+    def _preparar(self, recorte, destino):
+        """Escribe en destino (H, W, 3) el recorte redimensionado con relleno y escalado a [0, 1]."""
+        alto_obj, ancho_obj = destino.shape[:2]
+        h, w = recorte.shape[:2]
+        factor = min(alto_obj / h, ancho_obj / w)
+        nuevo_w = max(1, int(w * factor))
+        nuevo_h = max(1, int(h * factor))
+        redim = cv2.resize(recorte, (nuevo_w, nuevo_h))
+
+        destino.fill(0.0)
+        y0 = (alto_obj - nuevo_h) // 2
+        x0 = (ancho_obj - nuevo_w) // 2
+        np.multiply(redim, 1.0 / 255.0, out=destino[y0:y0 + nuevo_h, x0:x0 + nuevo_w])
+
+    def _lote(self, n):
+        alto, ancho = self.tam_entrada
+        if self._buffer is None or self._buffer.shape[0] < n:
+            self._buffer = np.empty((max(n, 8), alto, ancho, 3), dtype=np.float32)
+        return self._buffer[:n]
+
+    # --------------------
+    # Representación
+    # --------------------
+    def representar(self, recortes):
+        """
+        recortes: lista de imágenes BGR (uint8) de cualquier tamaño.
+        Devuelve matriz float32 (N, D) con un embedding por recorte, en el mismo orden.
+        """
+        if len(recortes) == 0:
+            return np.empty((0, 0), dtype=np.float32)
+
+        lote = self._lote(len(recortes))
+        for i, recorte in enumerate(recortes):
+            if recorte.ndim == 2:
+                recorte = cv2.cvtColor(recorte, cv2.COLOR_GRAY2BGR)
+            self._preparar(recorte, lote[i])
+
+        salida = self._red.predict_on_batch(lote) if hasattr(self._red, "predict_on_batch") else self._red(lote)
+        return np.asarray(salida, dtype=np.float32).reshape(len(recortes), -1)
+
+    def representar_frames(self, frames, cajas_por_frame):
+        """
+        Agrupa los recortes de varios frames en un único lote.
+        frames: lista de imágenes BGR; cajas_por_frame: lista (por frame) de cajas (x, y, w, h).
+        Devuelve una lista (por frame) de matrices (n_cajas, D).
+        """
+        recortes = []
+        cuentas = []
+        for frame, cajas in zip(frames, cajas_por_frame):
+            cuentas.append(len(cajas))
+            for (x, y, w, h) in cajas:
+                recortes.append(frame[y:y + h, x:x + w])
+
+        embeddings = self.representar(recortes)
+        resultado = []
+        inicio = 0
+        for n in cuentas:
+            resultado.append(embeddings[inicio:inicio + n])
+            inicio += n
+        return resultado
@@ -0,0 +1,439 @@
+# Nucleo/Servicio.py
+
+import asyncio
+import base64
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+try:
+    from Nucleo.BaseDatos import UsuarioDuplicado, obtener_base_datos
+    from Nucleo.Detectores import crear_detector
+    from Nucleo.Metricas import metricas
+    from Nucleo.Representacion import RepresentadorLotes
+except ImportError:
+    from BaseDatos import UsuarioDuplicado, obtener_base_datos
+    from Detectores import crear_detector
+    from Metricas import metricas
+    from Representacion import RepresentadorLotes
+
+
+class ErrorPeticion(Exception):
+    """Error que se devuelve al cliente con un código HTTP."""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+MENSAJES_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+                 503: "Service Unavailable"}
+
+
+class LotesEmbedding:
+    """
+    Agrupa en una sola llamada al modelo los recortes de varias peticiones concurrentes.
+    Cada petición espera su parte; un lote sale al llegar a max_lote recortes o al pasar
+    max_espera segundos desde el primer recorte del lote.
+    """
+
+    def __init__(self, reconocimiento, ejecutor, max_lote=32, max_espera=0.01):
+        self.reconocimiento = reconocimiento
+        self.ejecutor = ejecutor
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self._cola = asyncio.Queue()
+        self._tarea = None
+        self.lotes = 0
+        self.recortes = 0
+
+    def iniciar(self):
+        self._tarea = asyncio.get_running_loop().create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+
+    async def embeber(self, recortes):
+        """Devuelve (embeddings (N, D), indices) como representar_rostros(), pero por lotes."""
+        if not recortes:
+            return np.empty((0, 0), dtype=np.float32), []
+        futuro = asyncio.get_running_loop().create_future()
+        await self._cola.put((recortes, futuro))
+        return await futuro
+
+    async def _bucle(self):
+        while True:
+            pendientes = [await self._cola.get()]
+            n = len(pendientes[0][0])
+            limite = time.perf_counter() + self.max_espera
+            while n < self.max_lote:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._cola.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                pendientes.append(item)
+                n += len(item[0])
+
+            todos = [r for recortes, _ in pendientes for r in recortes]
+            try:
+                embeddings, indices = await asyncio.get_running_loop().run_in_executor(
+                    self.ejecutor, self.reconocimiento.representar_rostros, todos)
+            except Exception as e:
+                for _, futuro in pendientes:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            self.lotes += 1
+            self.recortes += len(todos)
+
+            # Repartir las filas del lote entre las peticiones (indices es relativo a `todos`)
+            fila_de = {i: fila for fila, i in enumerate(indices)}
+            inicio = 0
+            for recortes, futuro in pendientes:
+                propios = [(i - inicio, fila_de[i]) for i in range(inicio, inicio + len(recortes)) if i in fila_de]
+                inicio += len(recortes)
+                if futuro.done():
+                    continue
+                filas = [f for _, f in propios]
+                futuro.set_result((embeddings[filas] if filas else np.empty((0, 0), dtype=np.float32),
+                                   [i for i, _ in propios]))
+
+
+class ServicioReconocimiento:
+    """
+    Servicio de reconocimiento sin interfaz gráfica, con API HTTP local (asyncio, sólo stdlib):
+
+      POST /enroll    {"id_usuario", "nombre", "imagen": base64}     → plantillas añadidas
+      POST /identify  {"imagen": base64} o cuerpo image/*           → rostros e identidades
+      POST /verify    {"id_usuario", "imagen": base64}               → coincide y distancia
+      GET  /stats                                                    → estado de la galería
+      GET  /ultimo                                                   → último resultado de la cámara
+      GET  /metrics                                                  → tiempos por etapa (texto Prometheus)
+
+    Las llamadas al modelo y los cambios en la galería van por un único hilo (serializados);
+    la detección usa un pool aparte (de un hilo por defecto: los detectores de OpenCV no
+    garantizan llamadas concurrentes sobre la misma instancia). identify agrupa los recortes de peticiones
+    concurrentes en un solo lote. Con más de max_pendientes peticiones en curso se responde
+    503 con Retry-After en lugar de encolar sin límite.
+
+    Con cámara, la tubería tiene su propio detector (detector / opciones_detector) y su propio
+    RepresentadorLotes, y su embedding y matching pasan por el mismo hilo del modelo que las
+    peticiones, así que las garantías anteriores se mantienen.
+    """
+
+    def __init__(self, reconocimiento, camara=None, umbral_coseno=0.45, max_pendientes=64,
+                 max_cuerpo=10 * 1024 * 1024, max_lote=32, max_espera=0.01, hilos_deteccion=1,
+                 detector="haar", opciones_detector=None):
+        self.reconocimiento = reconocimiento
+        self.camara = camara
+        self.detector = detector
+        self.opciones_detector = opciones_detector or {}
+        self.umbral_coseno = umbral_coseno
+        self.max_pendientes = max_pendientes
+        self.max_cuerpo = max_cuerpo
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self._modelo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="servicio-modelo")
+        self._deteccion = ThreadPoolExecutor(max_workers=hilos_deteccion, thread_name_prefix="servicio-deteccion")
+        self.lotes = None
+        self._en_curso = 0
+        self.rechazadas = 0
+        self.atendidas = 0
+        self.pipeline = None
+        self._ultimo = None
+
+    # --------------------
+    # Ciclo de vida
+    # --------------------
+    async def servir(self, host="127.0.0.1", puerto=8765, socket_unix=None):
+        self.lotes = LotesEmbedding(self.reconocimiento, self._modelo, self.max_lote, self.max_espera)
+        self.lotes.iniciar()
+        self._iniciar_camara()
+        if socket_unix:
+            servidor = await asyncio.start_unix_server(self._atender, path=socket_unix)
+            print(f"🛰️ Servicio escuchando en unix:{socket_unix}")
+        else:
+            servidor = await asyncio.start_server(self._atender, host, puerto)
+            print(f"🛰️ Servicio escuchando en http://{host}:{puerto}")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            await self.lotes.detener()
+            if self.pipeline is not None:
+                self.pipeline.detener()
+                self.camara.detener()
+            self._modelo.shutdown(wait=False)
+            self._deteccion.shutdown(wait=False)
+
+    def _iniciar_camara(self):
+        """Con cámara, el pipeline habitual corre en sus hilos y /ultimo expone su resultado."""
+        if self.camara is None:
+            return
+        try:
+            from Nucleo.Pipeline import PipelineReconocimiento
+        except ImportError:
+            from Pipeline import PipelineReconocimiento
+
+        if not self.camara.iniciar():
+            print("❌ No se pudo iniciar la cámara; el servicio sigue sólo con la API")
+            return
+        self.pipeline = PipelineReconocimiento(
+            self.reconocimiento, self.camara, al_resultado=self._guardar_ultimo, umbral_coseno=self.umbral_coseno,
+            detector=crear_detector(self.detector, **self.opciones_detector),
+            representador=RepresentadorLotes(self.reconocimiento.modelo),
+            ejecutor=self._modelo,
+        )
+        self.pipeline.iniciar()
+
+    def _guardar_ultimo(self, resultado):
+        self._ultimo = {
+            "secuencia": resultado["secuencia"],
+            "cajas": [list(map(int, c)) for c in resultado["boxes"]],
+            "nombres": list(resultado["names"]),
+            "latencia": resultado["latencia"],
+        }
+
+    # --------------------
+    # HTTP
+    # --------------------
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                peticion = await self._leer_peticion(lector)
+                if peticion is None:
+                    break
+                metodo, ruta, cabeceras, cuerpo = peticion
+                estado, respuesta, extra = await self._despachar(metodo, ruta, cabeceras, cuerpo)
+                mantener = cabeceras.get("connection", "").lower() != "close"
+                await self._responder(escritor, estado, respuesta, extra, mantener)
+                if not mantener:
+                    break
+        except ErrorPeticion as e:
+            await self._responder(escritor, e.estado, {"error": e.mensaje}, {}, False)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _leer_peticion(self, lector):
+        linea = await lector.readline()
+        if not linea:
+            return None
+        try:
+            metodo, ruta, _ = linea.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ErrorPeticion(400, "Línea de petición inválida")
+        cabeceras = {}
+        while True:
+            linea = await lector.readline()
+            if linea in (b"\r\n", b"\n", b""):
+                break
+            clave, _, valor = linea.decode("latin-1").partition(":")
+            cabeceras[clave.strip().lower()] = valor.strip()
+        try:
+            largo = int(cabeceras.get("content-length", "0") or 0)
+        except ValueError:
+            raise ErrorPeticion(400, "Content-Length inválido")
+        if largo < 0:
+            raise ErrorPeticion(400, "Content-Length negativo")
+        if largo > self.max_cuerpo:
+            raise ErrorPeticion(413, f"Cuerpo mayor que {self.max_cuerpo} bytes")
+        cuerpo = await lector.readexactly(largo) if largo else b""
+        return metodo.upper(), urlsplit(ruta).path, cabeceras, cuerpo
+
+    async def _responder(self, escritor, estado, datos, extra, mantener):
+        if isinstance(datos, str):
+            # Texto plano (p. ej. /metrics en el formato de exposición de Prometheus)
+            cuerpo, tipo = datos.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            cuerpo, tipo = json.dumps(datos, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        cabeceras = [
+            f"HTTP/1.1 {estado} {MENSAJES_HTTP.get(estado, '')}",
+            f"Content-Type: {tipo}",
+            f"Content-Length: {len(cuerpo)}",
+            f"Connection: {'keep-alive' if mantener else 'close'}",
+        ] + [f"{k}: {v}" for k, v in extra.items()]
+        escritor.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode("latin-1") + cuerpo)
+        await escritor.drain()
+
+    async def _despachar(self, metodo, ruta, cabeceras, cuerpo):
+        rutas = {
+            ("POST", "/enroll"): self.enroll,
+            ("POST", "/identify"): self.identify,
+            ("POST", "/verify"): self.verify,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/ultimo"): self.ultimo,
+            ("GET", "/metrics"): self.metrics,
+        }
+        manejador = rutas.get((metodo, ruta))
+        if manejador is None:
+            existe = any(r == ruta for _, r in rutas)
+            return (405 if existe else 404), {"error": f"{metodo} {ruta} no disponible"}, {}
+
+        # Contrapresión: rechazar en lugar de acumular peticiones sin límite
+        if self._en_curso >= self.max_pendientes:
+            self.rechazadas += 1
+            return 503, {"error": "Servicio saturado"}, {"Retry-After": "1"}
+        self._en_curso += 1
+        try:
+            return 200, await manejador(cabeceras, cuerpo), {}
+        except ErrorPeticion as e:
+            return e.estado, {"error": e.mensaje}, {}
+        except Exception as e:
+            print(f"❌ Error atendiendo {ruta}: {e}")
+            return 500, {"error": str(e)}, {}
+        finally:
+            self._en_curso -= 1
+            self.atendidas += 1
+
+    # --------------------
+    # Utilidades
+    # --------------------
+    @staticmethod
+    def _json(cuerpo):
+        try:
+            return json.loads(cuerpo.decode("utf-8")) if cuerpo else {}
+        except ValueError:
+            raise ErrorPeticion(400, "JSON inválido")
+
+    def _imagen(self, cabeceras, cuerpo, datos=None):
+        """Imagen BGR desde un cuerpo image/* o desde el campo "imagen" (base64) del JSON."""
+        if cabeceras.get("content-type", "").startswith("image/"):
+            crudo = cuerpo
+        else:
+            datos = self._json(cuerpo) if datos is None else datos
+            if "imagen" not in datos:
+                raise ErrorPeticion(400, "Falta el campo 'imagen' (base64)")
+            try:
+                crudo = base64.b64decode(datos["imagen"], validate=False)
+            except ValueError:
+                raise ErrorPeticion(400, "Imagen base64 inválida")
+        imagen = cv2.imdecode(np.frombuffer(crudo, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if imagen is None:
+            raise ErrorPeticion(400, "No se pudo decodificar la imagen")
+        return imagen
+
+    def _detectar_imagen(self, imagen):
+        """Como detectar_rostros(), pero con el detector base: las peticiones son imágenes sueltas."""
+        faces, boxes = [], []
+        for (x, y, w, h) in self.reconocimiento.detector_rostros.detectar(imagen):
+            faces.append(imagen[y:y + h, x:x + w])
+            boxes.append((y, x + w, y + h, x))
+        return faces, boxes
+
+    async def _detectar(self, imagen):
+        return await asyncio.get_running_loop().run_in_executor(self._deteccion, self._detectar_imagen, imagen)
+
+    async def _en_modelo(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._modelo, fn, *args)
+
+    async def _embedding_principal(self, imagen):
+        """Embedding (D,) del rostro más grande de la imagen."""
+        faces, boxes = await self._detectar(imagen)
+        if not faces:
+            raise ErrorPeticion(400, "No se detectó ningún rostro")
+        mayor = max(range(len(boxes)), key=lambda i: (boxes[i][1] - boxes[i][3]) * (boxes[i][2] - boxes[i][0]))
+        embeddings, indices = await self.lotes.embeber([faces[mayor]])
+        if not indices:
+            raise ErrorPeticion(400, "No se pudo extraer el embedding del rostro")
+        return embeddings[0]
+
+    # --------------------
+    # Operaciones
+    # --------------------
+    async def identify(self, cabeceras, cuerpo):
+        imagen = self._imagen(cabeceras, cuerpo)
+        faces, boxes = await self._detectar(imagen)
+        embeddings, indices = await self.lotes.embeber(faces)
+        rostros = [{"caja": list(map(int, c)), "id_usuario": None, "nombre": "Desconocido", "distancia": None}
+                   for c in boxes]
+        if indices:
+            def buscar():
+                # Filas, ids y nombres en la misma llamada al ejecutor del modelo: /enroll
+                # modifica la galería en ese hilo y las filas dejarían de corresponder
+                galeria = self.reconocimiento.galeria
+                filas, distancias = galeria.buscar(embeddings, 1)
+                if not filas.shape[1]:
+                    return []
+                ids, nombres = galeria.ids, galeria.nombres
+                return [(ids[fila], nombres[fila], float(d)) for fila, d in zip(filas[:, 0], distancias[:, 0])]
+
+            for i, (id_usuario, nombre, d) in zip(indices, await self._en_modelo(buscar)):
+                rostros[i]["distancia"] = d
+                if d <= self.umbral_coseno:
+                    rostros[i]["id_usuario"] = id_usuario
+                    rostros[i]["nombre"] = nombre
+        return {"rostros": rostros}
+
+    async def verify(self, cabeceras, cuerpo):
+        datos = self._json(cuerpo)
+        id_usuario = datos.get("id_usuario")
+        if not id_usuario:
+            raise ErrorPeticion(400, "Falta 'id_usuario'")
+        plantillas = await self._en_modelo(self.reconocimiento.repositorio.buscar_usuario, id_usuario)
+        if len(plantillas) == 0:
+            raise ErrorPeticion(404, f"Usuario desconocido: {id_usuario}")
+        emb = await self._embedding_principal(self._imagen(cabeceras, cuerpo, datos))
+        emb = emb / max(float(np.linalg.norm(emb)), 1e-10)
+        distancia = float(1.0 - np.max(np.asarray(plantillas) @ emb))
+        return {"id_usuario": id_usuario, "coincide": distancia <= self.umbral_coseno, "distancia": distancia}
+
+    async def enroll(self, cabeceras, cuerpo):
+        datos = self._json(cuerpo)
+        id_usuario = datos.get("id_usuario")
+        if not id_usuario:
+            raise ErrorPeticion(400, "Falta 'id_usuario'")
+        nombre = datos.get("nombre") or id_usuario
+        emb = await self._embedding_principal(self._imagen(cabeceras, cuerpo, datos))
+
+        def registrar():
+            try:
+                obtener_base_datos().agregar_usuario(id_usuario, nombre)
+            except UsuarioDuplicado:
+                pass  # usuario existente: sólo se le añaden plantillas
+            return self.reconocimiento.registrar_usuario(id_usuario, nombre, emb)
+
+        agregadas = await self._en_modelo(registrar)
+        return {"id_usuario": id_usuario, "nombre": nombre, "plantillas_agregadas": agregadas}
+
+    async def stats(self, cabeceras, cuerpo):
+        galeria = self.reconocimiento.galeria
+        repositorio = self.reconocimiento.repositorio
+        return {
+            "plantillas": len(galeria),
+            "usuarios": len(repositorio.usuarios()),
+            "dimension": galeria.dimension,
+            "indice": getattr(galeria.indice, "nombre", "exacto"),
+            "umbral_coseno": self.umbral_coseno,
+            "peticiones_en_curso": self._en_curso,
+            "peticiones_atendidas": self.atendidas,
+            "peticiones_rechazadas": self.rechazadas,
+            "lotes": self.lotes.lotes,
+            "recortes_por_lote": self.lotes.recortes / self.lotes.lotes if self.lotes.lotes else 0.0,
+            "cache_embeddings": self.reconocimiento.cache.estadisticas(),
+            "pipeline": self.pipeline.estadisticas() if self.pipeline is not None else None,
+            "etapas": metricas.resumen() if metricas.habilitado else None,
+        }
+
+    async def metrics(self, cabeceras, cuerpo):
+        return metricas.texto_prometheus()
+
+    async def ultimo(self, cabeceras, cuerpo):
+        if self.pipeline is None:
+            raise ErrorPeticion(404, "El servicio no tiene cámara")
+        return self._ultimo or {}
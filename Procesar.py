@@ -0,0 +1,47 @@
+# Procesar.py
+"""
+Reconocimiento fuera de línea sobre videos grabados y carpetas de fotos (ver Nucleo/ProcesamientoLotes.py).
+Escribe una fila por rostro (fuente, frame, tiempo, caja, identidad, distancia) en CSV o JSONL.
+
+    python Procesar.py grabaciones/entrada.mp4 --salida resultados.csv --paso 5
+    python Procesar.py fotos/ otra_carpeta/ --salida auditoria.jsonl --hilos 4
+"""
+import argparse
+
+from Nucleo.Modelos import registro_modelos
+from Nucleo.ProcesamientoLotes import EscritorResultados, ProcesadorLotes
+from Nucleo.Reconocimiento import ReconocimientoFacial
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rutas", nargs="+", help="Archivos de video, imágenes o carpetas")
+    parser.add_argument("--salida", required=True, help="Archivo de resultados (.csv o .jsonl)")
+    parser.add_argument("--formato", choices=["csv", "jsonl"], help="Por defecto, según la extensión de --salida")
+    parser.add_argument("--paso", type=int, default=1, help="Procesar uno de cada N frames de video")
+    parser.add_argument("--hilos", type=int, help="Hilos de detección (por defecto, uno por núcleo)")
+    parser.add_argument("--tam-lote", type=int, default=32, help="Recortes por llamada al modelo")
+    parser.add_argument("--modelo", default="Facenet")
+    parser.add_argument("--detector", default="haar")
+    parser.add_argument("--escala", type=float, help="Detectar sobre el frame reducido por este factor")
+    parser.add_argument("--umbral", type=float, default=0.45)
+    args = parser.parse_args()
+
+    registro_modelos.calentar([args.modelo], detectores=[args.detector])
+    reconocimiento = ReconocimientoFacial(modelo=args.modelo, detector=args.detector)
+    reconocimiento.cargar_vectores()
+
+    procesador = ProcesadorLotes(
+        reconocimiento, detector=args.detector, hilos=args.hilos, tam_lote=args.tam_lote,
+        umbral_coseno=args.umbral, multiresolucion={"escala": args.escala} if args.escala else None,
+    )
+    with EscritorResultados(args.salida, args.formato) as escritor:
+        stats = procesador.procesar(args.rutas, escritor, paso=args.paso)
+
+    print(f"🎯 {stats['frames']} frames, {stats['rostros']} rostros en {stats['segundos']:.1f} s "
+          f"({stats['frames_por_segundo']:.1f} frames/s, {stats['rostros_por_segundo']:.1f} rostros/s)")
+    print(f"💾 Resultados guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Servidor.py
+"""
+Servicio de reconocimiento sin interfaz gráfica (API HTTP local, ver Nucleo/Servicio.py).
+
+    python Servidor.py --puerto 8765
+    python Servidor.py --socket /tmp/reconocimiento.sock --camara 0
+    python Servidor.py --metricas   # y luego: curl http://127.0.0.1:8765/metrics
+"""
+import argparse
+import asyncio
+
+from Nucleo.Metricas import metricas
+from Nucleo.Modelos import registro_modelos
+from Nucleo.Reconocimiento import ReconocimientoFacial
+from Nucleo.Servicio import ServicioReconocimiento
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--socket", help="Escuchar en un socket Unix en lugar de TCP")
+    parser.add_argument("--modelo", default="Facenet")
+    parser.add_argument("--detector", default="haar")
+    parser.add_argument("--indice", choices=["exacto", "ivf", "prototipos", "int8"], default="exacto",
+                        help="Búsqueda en la galería (prototipos: centroide + prototipos por persona; "
+                             "int8: plantillas cuantizadas con reordenado exacto)")
+    parser.add_argument("--camara", help="Índice o ruta de una cámara a reconocer de forma continua")
+    parser.add_argument("--umbral", type=float, default=0.45)
+    parser.add_argument("--max-pendientes", type=int, default=64)
+    parser.add_argument("--max-lote", type=int, default=32)
+    parser.add_argument("--espera-lote-ms", type=float, default=10.0)
+    parser.add_argument("--metricas", action="store_true", help="Medir tiempos por etapa (GET /metrics)")
+    args = parser.parse_args()
+    if args.metricas:
+        metricas.habilitado = True
+
+    # Sin interfaz no hay nada que mostrar mientras carga: calentar antes de aceptar peticiones
+    registro_modelos.calentar([args.modelo], detectores=[args.detector])
+    indice, opciones_indice = args.indice, None
+    if indice == "int8":
+        indice, opciones_indice = "cuantizado", {"modo": args.indice}
+    reconocimiento = ReconocimientoFacial(
+        modelo=args.modelo, detector=args.detector, indice=None if indice == "exacto" else indice,
+        opciones_indice=opciones_indice)
+    reconocimiento.cargar_vectores()
+
+    camara = None
+    if args.camara is not None:
+        from Nucleo.Camara import Camara
+        camara = Camara(int(args.camara) if args.camara.isdigit() else args.camara, en_hilo=True)
+
+    servicio = ServicioReconocimiento(
+        reconocimiento, camara=camara, umbral_coseno=args.umbral, max_pendientes=args.max_pendientes,
+        max_lote=args.max_lote, max_espera=args.espera_lote_ms / 1000.0, detector=args.detector,
+    )
+    try:
+        asyncio.run(servicio.servir(args.host, args.puerto, args.socket))
+    except KeyboardInterrupt:
+        print("⏹️ Servicio detenido")
+
+
+if __name__ == "__main__":
+    main()